@@ -0,0 +1,47 @@
+"""Point lookup and insert cost of the B+ tree by fanout and size.
+
+Degree 4 is the fanout every index used before tables could choose one.
+
+    python -m benchmarks.bench_b_tree [size ...]
+"""
+import random
+import sys
+import time
+
+from python_sql.b_tree import BTree
+
+DEGREES = (4, 16, 64, 128, 256)
+SIZES = (10000, 100000, 1000000)
+LOOKUPS = 100000
+
+
+def bench(degree, size, rng):
+    keys = list(range(size))
+    rng.shuffle(keys)
+    tree = BTree(degree)
+    start = time.perf_counter()
+    for k in keys:
+        tree[k] = k
+    insert_time = time.perf_counter() - start
+
+    probes = [rng.randrange(size) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for k in probes:
+        tree[k]
+    lookup_time = time.perf_counter() - start
+    return tree.height, insert_time / size, lookup_time / LOOKUPS
+
+
+def main(sizes):
+    rng = random.Random(42)
+    print('{:>9} {:>6} {:>6} {:>12} {:>12}'.format(
+        'rows', 'degree', 'height', 'insert us', 'lookup us'))
+    for size in sizes:
+        for degree in DEGREES:
+            height, insert, lookup = bench(degree, size, rng)
+            print('{:>9} {:>6} {:>6} {:>12.2f} {:>12.2f}'.format(
+                size, degree, height, insert * 1e6, lookup * 1e6))
+
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or SIZES)
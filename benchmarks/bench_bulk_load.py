@@ -0,0 +1,47 @@
+"""Bottom-up bulk loading against one insert per key.
+
+    python -m benchmarks.bench_bulk_load [size ...]
+"""
+import sys
+import time
+
+from python_sql.b_tree import BTree
+
+DEGREES = (64, 128, 256)
+SIZES = (1000000,)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def incremental(size, degree):
+    tree = BTree(degree)
+    for k in range(size):
+        tree[k] = k
+    return tree
+
+
+def main(sizes):
+    print('{:>9} {:>6} {:>12} {:>8} {:>8} {:>8}'.format(
+        'rows', 'degree', 'method', 'seconds', 'krows/s', 'height'))
+    for size in sizes:
+        for degree in DEGREES:
+            runs = [
+                ('insert', lambda: incremental(size, degree)),
+                ('bulk 1.0', lambda: BTree.from_sorted(
+                    ((k, k) for k in range(size)), degree)),
+                ('bulk 0.7', lambda: BTree.from_sorted(
+                    ((k, k) for k in range(size)), degree, 0.7)),
+            ]
+            for name, func in runs:
+                tree, seconds = timed(func)
+                print('{:>9} {:>6} {:>12} {:>8.2f} {:>8.0f} {:>8}'.format(
+                    size, degree, name, seconds, size / seconds / 1000,
+                    tree.height))
+
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or SIZES)
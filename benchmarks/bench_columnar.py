@@ -0,0 +1,71 @@
+"""Memory held and scan times of a wide table stored in rows by the
+MemoryStorageDriver and in columns by the ColumnarStorageDriver.
+
+    python -m benchmarks.bench_columnar [rows]
+"""
+import sys
+import time
+import tracemalloc
+
+from python_sql.columnar import ColumnarStorageDriver
+from python_sql.database import Database, MemoryStorageDriver
+
+ROWS = 100000
+# Columns of each type, besides the primary key
+INTS = 20
+DOUBLES = 10
+VARCHARS = 9
+QUERIES = (
+    'SELECT wide.i3, wide.d2 FROM wide WHERE wide.i7 = 3',
+    'SELECT wide.v1, wide.i0, wide.d0 FROM wide WHERE wide.id < 50000',
+    'SELECT wide.v2 FROM wide ORDER BY wide.d5 LIMIT 10',
+)
+
+
+def load(storage, rows):
+    db = Database(storage)
+    columns = ['i{} int'.format(i) for i in range(INTS)] + \
+        ['d{} double'.format(i) for i in range(DOUBLES)] + \
+        ['v{} varchar(16)'.format(i) for i in range(VARCHARS)]
+    db.execute('CREATE TABLE wide(id int primary key, {})'.format(
+        ', '.join(columns)))
+    table = db.tables['wide']
+    for start in range(0, rows, 10000):
+        table.insert_many(
+            [[i] + [(i * 7 + c) % 1000 for c in range(INTS)] +
+             [i / (c + 1) for c in range(DOUBLES)] +
+             ['city {}'.format((i + c) % 50) for c in range(VARCHARS)]
+             for i in range(start, min(rows, start + 10000))])
+    return db
+
+
+def time_query(db, sql, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.execute(sql)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main(rows):
+    for name, storage in (('rows', MemoryStorageDriver),
+                          ('columns', ColumnarStorageDriver)):
+        tracemalloc.start()
+        db = load(storage(), rows)
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print('{}: {} rows of {} columns in {:.1f} MB'.format(
+            name, rows, 1 + INTS + DOUBLES + VARCHARS, held / 1e6))
+        for sql in QUERIES:
+            print('  {:66} {:.3f}s'.format(sql, time_query(db, sql)))
+        # Every column, the case storing by column does not help
+        sql = 'SELECT {} FROM wide LIMIT 1000'.format(', '.join(
+            map(str, db.tables['wide'].column_references)))
+        print('  {:66} {:.3f}s'.format(
+            'SELECT every column FROM wide LIMIT 1000', time_query(db, sql)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
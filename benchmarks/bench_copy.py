@@ -0,0 +1,73 @@
+"""Rows per second loaded by COPY from CSV, TSV and JSON lines files,
+against one INSERT statement per row.
+
+    python -m benchmarks.bench_copy [rows]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from python_sql.database import Database, MemoryStorageDriver
+
+ROWS = 200000
+# Rows inserted one statement at a time, which takes far longer
+INSERTS = 20000
+CREATE = ('CREATE TABLE main(id int primary key, cola int, colb double, '
+          'colc varchar(16))')
+
+
+def values(rows):
+    for i in range(rows):
+        yield i, i % 100, i // 4, 'name {}'.format(i)
+
+
+def write_files(directory, rows):
+    paths = {}
+    for format, write in (
+            ('csv', lambda row: '{},{},{},{}\n'.format(*row)),
+            ('tsv', lambda row: '{}\t{}\t{}\t{}\n'.format(*row)),
+            ('jsonl', lambda row: json.dumps(dict(zip(
+                ('id', 'cola', 'colb', 'colc'), row))) + '\n')):
+        paths[format] = os.path.join(directory, 'main.' + format)
+        with open(paths[format], 'w') as file:
+            file.writelines(map(write, values(rows)))
+    return paths
+
+
+def new_database():
+    db = Database(MemoryStorageDriver())
+    db.execute(CREATE)
+    db.execute('CREATE INDEX main_cola ON main(cola)')
+    return db
+
+
+def report(name, rows, seconds):
+    print('{:>14}: {:>7} rows in {:.2f}s, {:>8.0f} rows/s'.format(
+        name, rows, seconds, rows / seconds))
+
+
+def main(rows):
+    directory = tempfile.mkdtemp()
+    try:
+        paths = write_files(directory, rows)
+        db = new_database()
+        inserts = min(rows, INSERTS)
+        start = time.perf_counter()
+        for row in values(inserts):
+            db.execute("INSERT INTO main VALUES({}, {}, {}, '{}')".format(
+                *row))
+        report('per statement', inserts, time.perf_counter() - start)
+        for format, path in paths.items():
+            db = new_database()
+            start = time.perf_counter()
+            loaded = db.execute("COPY main FROM '{}'".format(path))
+            report('COPY ' + format, loaded, time.perf_counter() - start)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
@@ -0,0 +1,67 @@
+"""Rows per second and peak memory of exporting a table to CSV, TSV and
+JSON lines files, against writing the list of rows execute returns.
+
+    python -m benchmarks.bench_export [rows]
+"""
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from python_sql.database import Database, MemoryStorageDriver
+
+ROWS = 200000
+SELECT = 'SELECT main.id, main.cola, main.colb, main.colc FROM main'
+
+
+def new_database(rows):
+    db = Database(MemoryStorageDriver())
+    db.execute('CREATE TABLE main(id int primary key, cola int, '
+               'colb double, colc varchar(16))')
+    db.tables['main'].insert_many([[i, i % 100, i / 4, 'name {}'.format(i)]
+                                   for i in range(rows)])
+    return db
+
+
+def write_list(db, path):
+    """Writing the result as a whole, as before export"""
+    rows = db.execute(SELECT)
+    with open(path, 'w', newline='') as file:
+        csv.writer(file).writerows(row.data for row in rows)
+    return len(rows)
+
+
+def measure(name, export):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = export()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Time is measured again without tracemalloc, which slows everything
+    start = time.perf_counter()
+    export()
+    seconds = min(seconds, time.perf_counter() - start)
+    print('{:>12}: {:>7} rows in {:.2f}s, {:>8.0f} rows/s, peak {:>6.1f} '
+          'MB'.format(name, rows, seconds, rows / seconds, peak / 1e6))
+
+
+def main(rows):
+    db = new_database(rows)
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'list.csv')
+        measure('list to csv', lambda: write_list(db, path))
+        for format in ('csv', 'tsv', 'jsonl'):
+            path = os.path.join(directory, 'main.' + format)
+            measure('export ' + format,
+                    lambda: db.export(SELECT, path))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
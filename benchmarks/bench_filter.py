@@ -0,0 +1,38 @@
+"""Filtered scans with compiled predicates against evaluating the
+Operation tree through a Context per row.
+
+    python -m benchmarks.bench_filter [rows]
+"""
+import sys
+import time
+
+from python_sql.logic import ColumnReference, Context
+from python_sql.logic.compiler import compile_predicate
+from python_sql.parser import parse
+
+ROWS = 200000
+WHERE = "t.a > 10 and (t.b = 3 or t.b = 5) and not (t.c = 'x')"
+
+
+def main(rows):
+    columns = [ColumnReference('t', name, None) for name in 'abc']
+    data = [(i, i % 7, 'x' if i % 2 else 'y') for i in range(rows)]
+    op = parse('SELECT t.a FROM t WHERE ' + WHERE).where
+
+    start = time.perf_counter()
+    expected = [row for row in data if op.evaluate(Context(row, columns))]
+    evaluated = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = list(filter(compile_predicate(op, columns), data))
+    compiled = time.perf_counter() - start
+    assert result == expected
+
+    print('{} rows, {} match'.format(rows, len(result)))
+    print('{:>10}: {:.3f}s'.format('evaluate', evaluated))
+    print('{:>10}: {:.3f}s ({:.1f}x)'.format('compiled', compiled,
+                                             evaluated / compiled))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
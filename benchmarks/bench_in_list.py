@@ -0,0 +1,50 @@
+"""Batch fetches by primary key with large IN lists: one root descent per
+value against a single sorted walk of the leaves.
+
+    python -m benchmarks.bench_in_list [rows] [ids]
+"""
+import random
+import sys
+import time
+
+from python_sql.database import Database
+from python_sql.logic import IntegerLiteral
+
+ROWS = 200000
+IDS = 5000
+
+
+def main(rows, ids):
+    db = Database()
+    db.execute('CREATE TABLE t(id int primary key, k int)')
+    table = db.tables['t']
+    for i in range(rows):
+        table.direct_insert([IntegerLiteral(i), IntegerLiteral(i % 100)])
+    values = random.Random(3).sample(range(rows), ids)
+    tree = table._pk_index
+
+    start = time.perf_counter()
+    found = [tree.search(value) for value in values]
+    descents = time.perf_counter() - start
+
+    start = time.perf_counter()
+    walked = [value for _, value in tree.search_many(sorted(values))]
+    walk = time.perf_counter() - start
+    assert sorted(found) == sorted(walked)
+
+    query = 'SELECT t.id, t.k FROM t WHERE t.id in ({})'.format(
+        ', '.join(map(str, values)))
+    start = time.perf_counter()
+    result = db.execute(query)
+    select = time.perf_counter() - start
+    assert len(result) == ids
+
+    print('{} ids out of {} rows'.format(ids, rows))
+    print('{:>14}: {:.2f}ms'.format('descents', descents * 1000))
+    print('{:>14}: {:.2f}ms'.format('sorted walk', walk * 1000))
+    print('{:>14}: {:.2f}ms'.format('SELECT ... IN', select * 1000))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS,
+         int(sys.argv[2]) if len(sys.argv) > 2 else IDS)
@@ -0,0 +1,75 @@
+"""Rows loaded one INSERT statement each, as tests/test_large_db.py does,
+against multi-row INSERT statements, with their values written out or bound
+to parameters, and Table.insert_many batches.
+
+    python -m benchmarks.bench_ingest [rows] [batch]
+"""
+import sys
+import time
+
+from python_sql.database import Database
+
+ROWS = 100000
+BATCH = 1000
+
+
+def new_database():
+    db = Database()
+    db.execute('CREATE TABLE main(id int primary key, cola int, '
+               'colb varchar(16))')
+    db.execute('CREATE INDEX main_cola ON main(cola)')
+    return db
+
+
+def per_statement(db, rows, batch):
+    for i in range(rows):
+        db.execute("INSERT INTO main VALUES({}, {}, '{}')".format(
+            i, i % 100, i))
+
+
+def multi_row(db, rows, batch):
+    for start in range(0, rows, batch):
+        db.execute('INSERT INTO main VALUES{}'.format(', '.join(
+            "({}, {}, '{}')".format(i, i % 100, i)
+            for i in range(start, min(rows, start + batch)))))
+
+
+def prepared_multi_row(db, rows, batch):
+    for start in range(0, rows, batch):
+        stop = min(rows, start + batch)
+        # Prepared once per batch size, so all but the last come cached
+        insert = db.prepare('INSERT INTO main VALUES{}'.format(
+            ', '.join(['(?, ?, ?)'] * (stop - start))))
+        parameters = []
+        for i in range(start, stop):
+            parameters += [i, i % 100, str(i)]
+        insert.execute(parameters)
+
+
+def insert_many(db, rows, batch):
+    table = db.tables['main']
+    for start in range(0, rows, batch):
+        table.insert_many((i, i % 100, str(i))
+                          for i in range(start, min(rows, start + batch)))
+
+
+def main(rows, batch):
+    print('{} rows, batches of {}'.format(rows, batch))
+    baseline = None
+    for name, load in (('per statement', per_statement),
+                       ('multi-row INSERT', multi_row),
+                       ('prepared multi-row', prepared_multi_row),
+                       ('insert_many', insert_many)):
+        db = new_database()
+        start = time.perf_counter()
+        load(db, rows, batch)
+        seconds = time.perf_counter() - start
+        assert len(db.tables['main']) == rows
+        baseline = baseline or seconds
+        print('{:>19}: {:.3f}s, {:>8.0f} rows/s, {:.1f}x'.format(
+            name, seconds, rows / seconds, baseline / seconds))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS,
+         int(sys.argv[2]) if len(sys.argv) > 2 else BATCH)
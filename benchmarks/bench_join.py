@@ -0,0 +1,56 @@
+"""Joins on a non-indexed column: hash join, grace hash join and the
+nested loop scan it replaced.
+
+    python -m benchmarks.bench_join [rows]
+"""
+import random
+import sys
+import time
+
+from python_sql.database import Database
+from python_sql.logic import IntegerLiteral
+
+ROWS = 100000
+NESTED_LOOP_SAMPLE = 20
+QUERY = """
+SELECT left_t.id, right_t.id
+FROM left_t
+  JOIN right_t ON left_t.k = right_t.k"""
+
+
+def load(db, rows):
+    rng = random.Random(9)
+    for name in ('left_t', 'right_t'):
+        db.execute('CREATE TABLE {}(id int primary key, k int)'.format(name))
+        table = db.tables[name]
+        for i in range(rows):
+            table.direct_insert([IntegerLiteral(i),
+                                 IntegerLiteral(rng.randrange(rows))])
+
+
+def main(rows):
+    db = Database()
+    load(db, rows)
+    for name, limit in (('hash join', rows), ('grace hash join', rows // 10)):
+        db.join_memory_limit = limit
+        start = time.perf_counter()
+        result = db.execute(QUERY)
+        seconds = time.perf_counter() - start
+        print('{:>16}: {:>9} x {} rows -> {} rows in {:.2f}s'.format(
+            name, rows, rows, len(result), seconds))
+
+    # The nested loop scanned the whole right table for every left row,
+    # time a few and extrapolate
+    right_table = db.tables['right_t']
+    start = time.perf_counter()
+    for value in range(NESTED_LOOP_SAMPLE):
+        for row in right_table.scan():
+            if row[1] == value:
+                pass
+    seconds = (time.perf_counter() - start) / NESTED_LOOP_SAMPLE * rows
+    print('{:>16}: {:>9} x {} rows, estimated {:.0f}s'.format(
+        'nested loop', rows, rows, seconds))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
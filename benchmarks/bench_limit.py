@@ -0,0 +1,40 @@
+"""First-row latency and LIMIT over growing tables, which should stay flat
+now that results are pulled through the executor a row at a time.
+
+    python -m benchmarks.bench_limit [rows]
+"""
+import sys
+import time
+
+from python_sql.database import Database
+from python_sql.logic import IntegerLiteral
+
+ROWS = 1000000
+QUERIES = (
+    ('first row', 'SELECT t.id, t.k FROM t'),
+    ('limit 10', 'SELECT t.id, t.k FROM t LIMIT 10'),
+    ('offset', 'SELECT t.id, t.k FROM t LIMIT 10 OFFSET {}'),
+    ('where limit 10', 'SELECT t.id, t.k FROM t WHERE t.k = 7 LIMIT 10'),
+)
+
+
+def main(rows):
+    size = 1000
+    while size <= rows:
+        db = Database()
+        db.execute('CREATE TABLE t(id int primary key, k int)')
+        table = db.tables['t']
+        for i in range(size):
+            table.direct_insert([IntegerLiteral(i), IntegerLiteral(i % 100)])
+        for name, query in QUERIES:
+            query = query.format(size // 2)
+            start = time.perf_counter()
+            next(db.stream(query))
+            seconds = time.perf_counter() - start
+            print('{:>9} rows {:>15}: {:.1f}us'.format(size, name,
+                                                       seconds * 1e6))
+        size *= 10
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
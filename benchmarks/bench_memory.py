@@ -0,0 +1,34 @@
+"""Bytes per key of an int -> int primary key index.
+
+    python -m benchmarks.bench_memory [size ...]
+"""
+import sys
+
+from python_sql.b_tree import BTree
+
+SIZES = (100000, 1000000)
+LAYOUTS = (
+    ('degree 4, lists', 4, None),
+    ('degree 128, lists', 128, None),
+    ('degree 128, arrays', 128, 'q'),
+    ('degree 256, arrays', 256, 'q'),
+)
+
+
+def main(sizes):
+    print('{:>9} {:>20} {:>8} {:>12} {:>10}'.format(
+        'rows', 'layout', 'nodes', 'MB', 'bytes/key'))
+    for size in sizes:
+        for name, degree, typecode in LAYOUTS:
+            tree = BTree(degree, typecode, typecode)
+            # Offset keys past the small int cache, as row ids quickly are
+            for k in range(size):
+                tree[k + 1000] = k + 1000
+            usage = tree.memory_usage()
+            print('{:>9} {:>20} {:>8} {:>12.1f} {:>10.1f}'.format(
+                size, name, usage.nodes, usage.bytes / 1e6,
+                usage.bytes_per_key))
+
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or SIZES)
@@ -0,0 +1,68 @@
+"""Loading, reopening and scanning a table stored in a memory mapped file
+of fixed-width records, against the same table held in memory.
+
+    python -m benchmarks.bench_mmap [rows]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from python_sql.database import Database, MemoryStorageDriver
+from python_sql.mmap_storage import MmapStorageDriver
+
+ROWS = 200000
+QUERIES = (
+    'SELECT main.cola FROM main WHERE main.colb < 100',
+    'SELECT main.id, main.colc FROM main WHERE main.id < 20000',
+    'SELECT main.id, main.cola, main.colb, main.colc FROM main',
+)
+
+
+def load(db, rows):
+    db.execute('CREATE TABLE main(id int primary key, cola int, '
+               'colb double, colc varchar(16))')
+    table = db.tables['main']
+    for start in range(0, rows, 10000):
+        table.insert_many([[i, i % 100, i / 4, 'name {}'.format(i % 1000)]
+                           for i in range(start, min(rows, start + 10000))])
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def time_queries(db):
+    for sql in QUERIES:
+        rows, seconds = timed(lambda: db.execute(sql))
+        print('  {:62} {:>7} rows {:.3f}s'.format(sql, len(rows), seconds))
+
+
+def main(rows):
+    directory = tempfile.mkdtemp()
+    try:
+        memory = Database(MemoryStorageDriver())
+        _, seconds = timed(lambda: load(memory, rows))
+        print('memory: loaded {} rows in {:.2f}s'.format(rows, seconds))
+        time_queries(memory)
+
+        db = Database(MmapStorageDriver(directory))
+        _, seconds = timed(lambda: load(db, rows))
+        db.storage.close()
+        size = os.path.getsize(os.path.join(directory, 'main.table'))
+        print('mmap: loaded {} rows in {:.2f}s, {:.1f} MB file'.format(
+            rows, seconds, size / 1e6))
+        db, seconds = timed(lambda: Database(MmapStorageDriver(directory)))
+        print('  reopened, primary key built again, in {:.2f}s'.format(
+            seconds))
+        time_queries(db)
+        db.storage.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
@@ -0,0 +1,28 @@
+"""Parse time of INSERT statements with growing numbers of values, which
+should grow linearly with their length.
+
+    python -m benchmarks.bench_parse [values]
+"""
+import sys
+import time
+
+from python_sql.parser import parse
+
+VALUES = 100000
+
+
+def main(values):
+    size = 10
+    while size <= values:
+        query = 'INSERT INTO t VALUES({})'.format(', '.join(
+            "{}, 'value {}'".format(i, i) for i in range(size // 2)))
+        start = time.perf_counter()
+        parse(query)
+        seconds = time.perf_counter() - start
+        print('{:>7} values, {:>8} chars: {:.4f}s, {:.2f}us per value'.format(
+            size, len(query), seconds, seconds / size * 1e6))
+        size *= 10
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else VALUES)
@@ -0,0 +1,55 @@
+"""Statements run as SQL with their values formatted in, parsed and planned
+every time, against the same statements prepared once with ? parameters.
+
+    python -m benchmarks.bench_prepared [rows]
+"""
+import sys
+import time
+
+from python_sql.database import Database
+
+ROWS = 20000
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def formatted(rows):
+    db = Database(statement_cache_size=0)
+    db.execute('CREATE TABLE t(id int primary key, k int, s varchar(16))')
+
+    def insert():
+        for i in range(rows):
+            db.execute("INSERT INTO t VALUES({}, {}, '{}')".format(
+                i, i % 100, i))
+
+    def select():
+        for i in range(rows):
+            db.execute('SELECT t.k, t.s FROM t WHERE t.id = {}'.format(i))
+
+    return timed(insert), timed(select)
+
+
+def prepared(rows):
+    db = Database()
+    db.execute('CREATE TABLE t(id int primary key, k int, s varchar(16))')
+    insert = db.prepare('INSERT INTO t VALUES(?, ?, ?)')
+    select = db.prepare('SELECT t.k, t.s FROM t WHERE t.id = ?')
+    return (timed(lambda: [insert.execute((i, i % 100, str(i)))
+                           for i in range(rows)]),
+            timed(lambda: [select.execute((i,)) for i in range(rows)]))
+
+
+def main(rows):
+    print('{} inserts then {} primary key lookups'.format(rows, rows))
+    for name, run in (('formatted', formatted), ('prepared', prepared)):
+        insert, select = run(rows)
+        print('{:>10}: insert {:.3f}s, select {:.3f}s'.format(name, insert,
+                                                               select))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
@@ -0,0 +1,50 @@
+"""Full scans and primary key lookups untraced, where nothing is counted,
+against the same statements traced.
+
+    python -m benchmarks.bench_tracing [rows]
+"""
+import sys
+import time
+
+from python_sql.database import Database
+from python_sql.logic import IntegerLiteral
+from python_sql.tracing import RingBuffer, Tracer
+
+ROWS = 200000
+LOOKUPS = 2000
+
+
+def run(db, rows):
+    start = time.perf_counter()
+    db.execute('SELECT t.id, t.k FROM t WHERE t.k = 7')
+    scan = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(0, rows, max(1, rows // LOOKUPS)):
+        db.execute('SELECT t.k FROM t WHERE t.id = {}'.format(i))
+    lookups = time.perf_counter() - start
+    return scan, lookups
+
+
+def main(rows):
+    db = Database()
+    db.execute('CREATE TABLE t(id int primary key, k int)')
+    table = db.tables['t']
+    for i in range(rows):
+        table.direct_insert([IntegerLiteral(i), IntegerLiteral(i % 100)])
+
+    untraced = run(db, rows)
+    traces = RingBuffer()
+    db.tracer = Tracer(traces)
+    traced = run(db, rows)
+
+    print('{} rows'.format(rows))
+    for name, before, after in zip(('scan', 'lookups'), untraced, traced):
+        print('{:>8}: untraced {:.3f}s, traced {:.3f}s'.format(name, before,
+                                                               after))
+    print('totals: {}'.format(db.tracer.counters))
+    print('phases: {}'.format({name: round(seconds, 3) for name, seconds
+                               in db.tracer.phases.items()}))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
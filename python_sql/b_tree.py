@@ -1,6 +1,17 @@
-from collections import MutableMapping
+import itertools
+import operator
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from collections.abc import MutableMapping
 from functools import total_ordering
 
+# Number of children per interior node (and one more than the number of keys
+# per leaf). Large fanouts keep the tree shallow, which matters far more than
+# the per-node bisect cost.
+DEFAULT_DEGREE = 128
+
 
 def set_siblings_pair(left, right):
     left.next_sibling = right
@@ -12,6 +23,50 @@ def set_siblings(children):
         set_siblings_pair(children[i - 1], children[i])
 
 
+def container(typecode, items=()):
+    """A typed array for typecode, otherwise a list"""
+    if typecode is None:
+        return list(items)
+    return array(typecode, items)
+
+
+def container_size(items):
+    """Bytes held by a node's keys or values, including the element objects
+    of a list"""
+    size = sys.getsizeof(items)
+    if isinstance(items, list):
+        size += sum(map(sys.getsizeof, items))
+    return size
+
+
+class MemoryUsage(namedtuple('MemoryUsage', ['nodes', 'leaves', 'keys', 'bytes'])):
+    # nodes: int
+    # leaves: int
+    # keys: int
+    # bytes: int
+
+    @property
+    def bytes_per_key(self):
+        return self.bytes / self.keys if self.keys else 0.0
+
+
+def pack_ranges(count, per_node, minimum, maximum):
+    """Split count entries into consecutive (start, end) node ranges of
+    per_node entries. The last node is merged into or evened out with its
+    neighbour if it would be left with fewer than minimum entries."""
+    bounds = list(range(0, count, per_node)) + [count]
+    ranges = list(zip(bounds, bounds[1:]))
+    if len(ranges) > 1 and ranges[-1][1] - ranges[-1][0] < minimum:
+        start = ranges[-2][0]
+        end = ranges[-1][1]
+        if end - start <= maximum:
+            ranges[-2:] = [(start, end)]
+        else:
+            middle = (start + end) // 2
+            ranges[-2:] = [(start, middle), (middle, end)]
+    return ranges
+
+
 # https://www.cs.usfca.edu/~galles/visualization/BPlusTree.html
 # http://www.cburch.com/cs/340/reading/btree/
 # B+-tree maintains the following invariants:
@@ -26,6 +81,11 @@ def set_siblings(children):
 
 @total_ordering
 class Node:
+    # Nodes are the bulk of an index's memory, so keep them free of a
+    # per-instance __dict__
+    __slots__ = ('degree', 'keys')
+    is_leaf = False
+
     def has_key_space(self):
         return len(self.keys) < self.degree - 1
 
@@ -38,205 +98,498 @@ class Node:
     def print(self, level):
         strs = []
         pad = ''.ljust(level * 3, ' ')
-        strs.append('{}{}:{}={}'.format(pad, level, type(self).__name__, self.keys))
-        for child in self.children:
-            strs.extend(child.print(level + 1))
+        strs.append('{}{}:{}={}'.format(pad, level, type(self).__name__,
+                                        list(self.keys)))
+        if not self.is_leaf:
+            for child in self.children:
+                strs.extend(child.print(level + 1))
         return strs
 
 
 class InteriorNode(Node):
-    def __init__(self, degree, parent=None):
+    __slots__ = ('children', 'counts', 'size')
+
+    def __init__(self, degree, keys=None, children=None):
         self.degree = degree
-        self.parent = parent
-        self.keys = []
-        self.children = []
+        self.keys = keys if keys is not None else []
+        self.children = children if children is not None else []
+        # Number of keys under each child, and their total
+        self.counts = array('q', (child.size for child in self.children))
+        self.size = sum(self.counts)
 
     def search(self, key):
-        for i, k in enumerate(self.keys):
-            if key < k:
-                return self.children[i].search(key)
-        return self.children[-1].search(key)
+        return self.search_for_node(key).search(key)
 
     def search_for_node(self, key):
-        for i, k in enumerate(self.keys):
-            if key < k:
-                return self.children[i].search_for_node(key)
-        return self.children[-1].search_for_node(key)
+        node = self
+        while not node.is_leaf:
+            node = node.children[bisect_right(node.keys, key)]
+        return node
 
     def insert(self, key, value):
-        child = None
-        index = 0
-        for i, k in enumerate(self.keys):
-            if key < k:
-                child = self.children[i]
-                index = i
-                break
-        if child is None:
-            child = self.children[-1]
-            index = len(self.children) - 1
-
-        split_key, result = child.insert(key, value)
-        self.children[index:index + 1] = result
-        if index > 0:
-            set_siblings_pair(self.children[index - 1], self.children[index])
-        if index < len(self.children) - 2:
-            set_siblings_pair(self.children[index + 1], self.children[index + 2])
-
-        if len(result) > 1:
-            # Two new children
-            self.keys[index:index] = [split_key]
-        if not self.has_value_space():
-            left = InteriorNode(self.degree, self.parent)
-            right = InteriorNode(self.degree, self.parent)
-            new_keys = self.keys
-            half = len(new_keys) // 2
-            left.keys = new_keys[:half]
-            left.children = self.children[:half + 1]
-            right.keys = new_keys[half + 1:]
-            right.children = self.children[half + 1:]
-            return new_keys[half], [left, right]
-
-        return None, [self]
+        index = bisect_right(self.keys, key)
+        child = self.children[index]
+        before = child.size
+        split = child.insert(key, value)
+        if split is None:
+            if child.size != before:
+                self.counts[index] += 1
+                self.size += 1
+            return None
 
-    def delete(self, key):
-        for i, k in enumerate(self.keys):
-            if key < k:
-                child = self.children[i]
-                index = i
-                break
-        if child is None:
-            child = self.children[-1]
-            index = len(self.children) - 1
+        # Child split in two, the new right half goes next to it
+        split_key, new_child = split
+        self.keys.insert(index, split_key)
+        self.children.insert(index + 1, new_child)
+        self.counts[index] = child.size
+        self.counts.insert(index + 1, new_child.size)
+        self.size += child.size + new_child.size - before
+        if self.has_value_space():
+            return None
 
-        new_child = child.delete(key)
-        self.children[i] = new_child
-        # if len(self.children[i].keys)==0:
+        # Split in place, this node keeps the lower half
+        half = len(self.keys) // 2
+        right = InteriorNode(self.degree, self.keys[half + 1:],
+                             self.children[half + 1:])
+        split_key = self.keys[half]
+        del self.keys[half:]
+        del self.children[half + 1:]
+        del self.counts[half + 1:]
+        self.size -= right.size
+        return split_key, right
+
+    def insert_sorted(self, keys, values):
+        """Insert the sorted keys and their values, each child taking those
+        within its range, and return the (low key, node) pairs of any new
+        right siblings this node was split into"""
+        inserted = []
+        start = 0
+        while start < len(keys):
+            index = bisect_right(self.keys, keys[start])
+            end = len(keys) if index == len(self.keys) else \
+                bisect_left(keys, self.keys[index], start)
+            child = self.children[index]
+            inserted.append((index, child, child.insert_sorted(
+                keys[start:end], values[start:end])))
+            start = end
+        # From the right, so the indexes of those left to do stay valid
+        for index, child, splits in reversed(inserted):
+            if splits:
+                self.keys[index:index] = container(
+                    getattr(self.keys, 'typecode', None),
+                    (key for key, _ in splits))
+                self.children[index + 1:index + 1] = [
+                    node for _, node in splits]
+            self.counts[index:index + 1] = array(
+                'q', [child.size] + [node.size for _, node in splits])
+        self.size = sum(self.counts)
+        return self.split_overfull()
+
+    def split_overfull(self):
+        """Split the children past the first degree off into new right
+        siblings, returning their (low key, node) pairs"""
+        if len(self.children) <= self.degree:
+            return []
+        ranges = pack_ranges(len(self.children), self.degree,
+                             (self.degree + 1) // 2, self.degree)
+        splits = [(self.keys[start - 1],
+                   InteriorNode(self.degree, self.keys[start:end - 1],
+                                self.children[start:end]))
+                  for start, end in ranges[1:]]
+        end = ranges[0][1]
+        del self.keys[end - 1:]
+        del self.children[end:]
+        del self.counts[end:]
+        self.size = sum(self.counts)
+        return splits
+
+    def is_underfull(self):
+        return len(self.children) < (self.degree + 1) // 2
+
+    def can_lend(self):
+        return len(self.children) > (self.degree + 1) // 2
+
+    def delete(self, key):
+        index = bisect_right(self.keys, key)
+        child = self.children[index]
+        child.delete(key)
+        self.counts[index] -= 1
+        self.size -= 1
+        if child.is_underfull():
+            self._rebalance(index)
+
+    def _rebalance(self, index):
+        # Borrow from a sibling which has entries to spare, otherwise merge
+        # with one, which takes a key (and child) away from this node
+        child = self.children[index]
+        if index > 0 and self.children[index - 1].can_lend():
+            left = self.children[index - 1]
+            self.keys[index - 1] = child.take_from_left(left,
+                                                        self.keys[index - 1])
+            self.counts[index - 1] = left.size
+            self.counts[index] = child.size
+        elif index < len(self.keys) and self.children[index + 1].can_lend():
+            right = self.children[index + 1]
+            self.keys[index] = child.take_from_right(right, self.keys[index])
+            self.counts[index] = child.size
+            self.counts[index + 1] = right.size
+        else:
+            if index > 0:
+                index -= 1
+            left = self.children[index]
+            left.merge(self.children[index + 1], self.keys[index])
+            del self.keys[index]
+            del self.children[index + 1]
+            del self.counts[index + 1]
+            self.counts[index] = left.size
+
+    def take_from_left(self, left, separator):
+        self.keys.insert(0, separator)
+        self.children.insert(0, left.children.pop())
+        count = left.counts.pop()
+        self.counts.insert(0, count)
+        self.size += count
+        left.size -= count
+        return left.keys.pop()
+
+    def take_from_right(self, right, separator):
+        self.keys.append(separator)
+        self.children.append(right.children.pop(0))
+        count = right.counts.pop(0)
+        self.counts.append(count)
+        self.size += count
+        right.size -= count
+        return right.keys.pop(0)
+
+    def merge(self, right, separator):
+        self.keys.append(separator)
+        self.keys.extend(right.keys)
+        self.children.extend(right.children)
+        self.counts.extend(right.counts)
+        self.size += right.size
 
     def __repr__(self):
         return '{}: {}'.format(type(self).__name__, self.keys)
 
 
 class LeafNode(Node):
-    def __init__(self, degree, parent=None, prev_sibling=None, next_sibling=None):
+    __slots__ = ('values', 'prev_sibling', 'next_sibling')
+    is_leaf = True
+
+    def __init__(self, degree, keys=None, values=None, prev_sibling=None,
+                 next_sibling=None):
         self.degree = degree
-        self.parent = parent
+        self.keys = keys if keys is not None else []
+        self.values = values if values is not None else []
         self.prev_sibling = prev_sibling
         self.next_sibling = next_sibling
-        self.keys = []
-        self.values = []
-        self.children = []
+
+    @property
+    def size(self):
+        return len(self.keys)
 
     def search(self, key):
-        for i, k in enumerate(self.keys):
-            if k == key:
-                return self.values[i]
-        raise KeyError
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return self.values[i]
+        raise KeyError(key)
 
     def search_for_node(self, key):
         return self
 
-    def _set_key_value(self, key, value):
-        for i, k in enumerate(self.keys):
-            if k == key:
-                self.values[i] = value
-                return True
-        return False
-
     def insert(self, key, value):
-        if self._set_key_value(key, value):
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
             # Replacing existing key-value
-            return None, [self]
-
-        if self.has_key_space():
-            # Leaf node is not full
-            for i, k in enumerate(self.keys):
-                if key < k:
-                    self.keys[i:i] = [key]
-                    self.values[i:i] = [value]
-                    return None, [self]
-            self.keys.append(key)
-            self.values.append(value)
-            return None, [self]
-        else:
-            found = False
-            for i, k in enumerate(self.keys):
-                if key < k:
-                    self.keys[i:i] = [key]
-                    self.values[i:i] = [value]
-                    found = True
-                    break
-            if not found:
-                self.keys.append(key)
-                self.values.append(value)
-            left = LeafNode(self.degree, self.parent)
-            right = LeafNode(self.degree, self.parent)
-            set_siblings_pair(left, right)
-            half = len(self.keys) // 2
-            left.keys = self.keys[:half]
-            left.values = self.values[:half]
-            right.keys = self.keys[half:]
-            right.values = self.values[half:]
-            return right.keys[0], [left, right]
+            self.values[i] = value
+            return None
+
+        keys.insert(i, key)
+        self.values.insert(i, value)
+        if self.has_value_space():
+            return None
+
+        # Split in place, this node keeps the lower half so siblings in
+        # other subtrees which point at it stay valid
+        half = len(keys) // 2
+        right = LeafNode(self.degree, keys[half:], self.values[half:], self,
+                         self.next_sibling)
+        del keys[half:]
+        del self.values[half:]
+        if self.next_sibling is not None:
+            self.next_sibling.prev_sibling = right
+        self.next_sibling = right
+        return right.keys[0], right
+
+    def insert_sorted(self, keys, values):
+        own_keys = self.keys
+        own_values = self.values
+        # Keys up to the last held are inserted among the others, the rest
+        # go after them
+        tail = bisect_right(keys, own_keys[-1]) if own_keys else 0
+        i = 0
+        for key, value in zip(keys[:tail], values[:tail]):
+            i = bisect_left(own_keys, key, i)
+            if own_keys[i] == key:
+                own_values[i] = value
+            else:
+                own_keys.insert(i, key)
+                own_values.insert(i, value)
+            i += 1
+        own_keys.extend(keys[tail:])
+        own_values.extend(values[tail:])
+        if len(own_keys) < self.degree:
+            return []
+
+        # Split into full leaves, this one keeping the first
+        ranges = pack_ranges(len(own_keys), self.degree - 1,
+                             self.degree // 2, self.degree - 1)
+        leaves = [LeafNode(self.degree, own_keys[start:end],
+                           own_values[start:end])
+                  for start, end in ranges[1:]]
+        end = ranges[0][1]
+        del own_keys[end:]
+        del own_values[end:]
+        next_sibling = self.next_sibling
+        set_siblings([self] + leaves)
+        leaves[-1].next_sibling = next_sibling
+        if next_sibling is not None:
+            next_sibling.prev_sibling = leaves[-1]
+        return [(leaf.keys[0], leaf) for leaf in leaves]
+
+    def is_underfull(self):
+        return len(self.keys) < self.degree // 2
+
+    def can_lend(self):
+        return len(self.keys) > self.degree // 2
 
     def delete(self, key):
-        for i, k in enumerate(self.keys):
-            if k == key:
-                del self.keys[i]
-                del self.values[i]
-                break
-        return self
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            raise KeyError(key)
+        del keys[i]
+        del self.values[i]
+
+    def take_from_left(self, left, separator):
+        self.keys.insert(0, left.keys.pop())
+        self.values.insert(0, left.values.pop())
+        return self.keys[0]
+
+    def take_from_right(self, right, separator):
+        self.keys.append(right.keys.pop(0))
+        self.values.append(right.values.pop(0))
+        return right.keys[0]
+
+    def merge(self, right, separator):
+        self.keys.extend(right.keys)
+        self.values.extend(right.values)
+        self.next_sibling = right.next_sibling
+        if right.next_sibling is not None:
+            right.next_sibling.prev_sibling = self
 
     def __repr__(self):
         return '{}: {}'.format(type(self).__name__, self.keys)
 
 
 class BTree(MutableMapping):
-    def __init__(self, degree=4):
-        self.root = LeafNode(degree, None)
+    """B+ tree mapping.
 
-    def __len__(self):
+    key_typecode and value_typecode are optional array module typecodes,
+    such as 'q' for 64-bit ints. When given, node keys or leaf values are
+    stored unboxed in typed arrays instead of lists.
+    """
+
+    def __init__(self, degree=DEFAULT_DEGREE, key_typecode=None,
+                 value_typecode=None):
+        if degree < 3:
+            raise Exception('B+ tree degree must be at least 3')
+        self.degree = degree
+        self.key_typecode = key_typecode
+        self.value_typecode = value_typecode
+        self.root = LeafNode(degree, container(key_typecode),
+                             container(value_typecode))
+
+    @classmethod
+    def from_sorted(cls, items, degree=DEFAULT_DEGREE, fill_factor=1.0,
+                    key_typecode=None, value_typecode=None):
+        """Build a tree bottom-up from (key, value) pairs in strictly
+        increasing key order.
+
+        Nodes are packed left to right, each filled to fill_factor of its
+        capacity (but never below the minimum occupancy) to leave room for
+        later inserts.
+        """
+        if not 0 < fill_factor <= 1:
+            raise Exception('Fill factor must be in (0, 1]')
+        tree = cls(degree, key_typecode, value_typecode)
+        leaf_size = max(degree // 2, int((degree - 1) * fill_factor))
+        node_size = max((degree + 1) // 2, int(degree * fill_factor))
+
+        # Leaves are filled straight from the stream, items are never held
+        # outside the leaves themselves
+        leaves = []
+        items = iter(items)
+        while True:
+            chunk = list(itertools.islice(items, leaf_size))
+            if not chunk:
+                break
+            leaf = LeafNode(degree,
+                            container(key_typecode, (k for k, _ in chunk)),
+                            container(value_typecode, (v for _, v in chunk)))
+            if not all(map(operator.lt, leaf.keys, leaf.keys[1:])) or (
+                    leaves and not leaves[-1].keys[-1] < leaf.keys[0]):
+                raise Exception('Keys must be unique and in sorted order')
+            leaves.append(leaf)
+        if not leaves:
+            return tree
+
+        if len(leaves) > 1 and len(leaves[-1].keys) < degree // 2:
+            # Too few items were left for the last leaf, share them with
+            # its neighbour
+            last = leaves.pop()
+            left = leaves[-1]
+            keys = left.keys + last.keys
+            values = left.values + last.values
+            if len(keys) <= degree - 1:
+                left.keys, left.values = keys, values
+            else:
+                half = len(keys) // 2
+                left.keys, left.values = keys[:half], values[:half]
+                last.keys, last.values = keys[half:], values[half:]
+                leaves.append(last)
+        set_siblings(leaves)
+
+        level = leaves
+        low_keys = [leaf.keys[0] for leaf in leaves]
+        while len(level) > 1:
+            parents = []
+            parent_low_keys = []
+            for start, end in pack_ranges(len(level), node_size,
+                                          (degree + 1) // 2, degree):
+                node = InteriorNode(degree, container(
+                    key_typecode, low_keys[start + 1:end]), level[start:end])
+                parents.append(node)
+                parent_low_keys.append(low_keys[start])
+            level = parents
+            low_keys = parent_low_keys
+        tree.root = level[0]
+        return tree
+
+    @property
+    def height(self):
         node = self.root
-        size = 0
-        while type(node) != LeafNode:
+        height = 1
+        while not node.is_leaf:
             node = node.children[0]
-        while node is not None:
-            size += len(node.keys)
-            node = node.next_sibling
-        return size
+            height += 1
+        return height
+
+    def _first_leaf(self):
+        node = self.root
+        while not node.is_leaf:
+            node = node.children[0]
+        return node
+
+    def _last_leaf(self):
+        node = self.root
+        while not node.is_leaf:
+            node = node.children[-1]
+        return node
+
+    def __len__(self):
+        return self.root.size
+
+    def memory_usage(self):
+        """Approximate bytes held by the tree's nodes and their contents"""
+        nodes = 0
+        leaves = 0
+        size = sys.getsizeof(self)
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            nodes += 1
+            size += sys.getsizeof(node) + container_size(node.keys)
+            if node.is_leaf:
+                leaves += 1
+                size += container_size(node.values)
+            else:
+                size += sys.getsizeof(node.children)
+                size += sys.getsizeof(node.counts)
+                stack.extend(node.children)
+        return MemoryUsage(nodes, leaves, len(self), size)
+
+    def rank(self, key, inclusive=False):
+        """Number of keys in the tree less than key, or less than or equal
+        to key if inclusive"""
+        node = self.root
+        rank = 0
+        while not node.is_leaf:
+            index = bisect_right(node.keys, key)
+            rank += sum(node.counts[:index])
+            node = node.children[index]
+        find = bisect_right if inclusive else bisect_left
+        return rank + find(node.keys, key)
+
+    def count_range(self, start=None, stop=None, include_start=True,
+                    include_stop=False):
+        """Number of keys range() would yield, in O(log n)"""
+        high = len(self) if stop is None else self.rank(stop, include_stop)
+        low = 0 if start is None else self.rank(start, not include_start)
+        return max(0, high - low)
+
+    def _locate(self, index):
+        """Leaf holding the index-th smallest key and its offset in it"""
+        node = self.root
+        while not node.is_leaf:
+            for i, count in enumerate(node.counts):
+                if index < count:
+                    break
+                index -= count
+            node = node.children[i]
+        return node, index
+
+    def select(self, index):
+        """(key, value) pair of the index-th smallest key"""
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('B+ tree index out of range')
+        node, offset = self._locate(index)
+        return node.keys[offset], node.values[offset]
+
+    def cursor(self):
+        return Cursor(self)
+
+    def range(self, start=None, stop=None, include_start=True,
+              include_stop=False, reverse=False, visited=None):
+        """(key, value) pairs with keys between start and stop, either of
+        which may be None for an open end. Pairs are in ascending key order,
+        or descending from stop down to start when reverse is set.
+
+        visited, if given, is called with 1 for each leaf walked to past
+        the first, as by Cursor.forward."""
+        cursor = self.cursor()
+        if reverse:
+            if stop is None:
+                cursor.seek_last()
+            else:
+                cursor.seek_before(stop, include_stop)
+            return cursor.backward(start, include_start, visited)
+        if start is None:
+            cursor.seek_first()
+        else:
+            cursor.seek(start, include_start)
+        return cursor.forward(stop, include_stop, visited)
 
     def _slice(self, sp):
         if sp.step is not None:
             raise Exception('Cannot slice with step')
-        start = sp.start
-        end = sp.stop
-        if start is not None:
-            node = self.root.search_for_node(start)
-            while node is not None:
-                for i, k in enumerate(node.keys):
-                    if k >= start:
-                        if end is not None and k < end:
-                            yield node.values[i]
-                        elif end is not None:
-                            break
-                        else:
-                            yield node.values[i]
-                node = node.next_sibling
-        elif end is not None:
-            node = self.root.search_for_node(end)
-            while node is not None:
-                for i, k in enumerate(reversed(node.keys)):
-                    if k < end:
-                        index = len(node.keys) - 1 - i
-                        yield node.values[index]
-                node = node.prev_sibling
-        else:
-            node = self.root
-            while type(node) != LeafNode:
-                node = node.children[0]
-            while node is not None:
-                for v in node.values:
-                    yield v
-                node = node.next_sibling
+        for _, value in self.range(sp.start, sp.stop):
+            yield value
 
     def __getitem__(self, key):
         if isinstance(key, slice):
@@ -256,40 +609,217 @@ class BTree(MutableMapping):
         except KeyError:
             return None
 
+    def search_many(self, keys, visited=None):
+        """(key, value) pairs of the keys found, keys being in ascending
+        order. Keys in the same or the next leaf as the previous one are
+        found by walking the leaf chain rather than from the root.
+
+        visited, if given, is called with the number of nodes visited each
+        time the search moves to another leaf."""
+        leaf = None
+        start = 0
+        for key in keys:
+            if leaf is None or not leaf.keys or key > leaf.keys[-1]:
+                next_leaf = leaf.next_sibling if leaf is not None else None
+                if leaf is not None and next_leaf is None:
+                    # Past the last key held, as are all the keys after
+                    return
+                if next_leaf is not None and key <= next_leaf.keys[-1]:
+                    leaf = next_leaf
+                    if visited is not None:
+                        visited(1)
+                else:
+                    leaf = self.root.search_for_node(key)
+                    if visited is not None:
+                        visited(self.height)
+                start = 0
+            start = bisect_left(leaf.keys, key, start)
+            if start < len(leaf.keys) and leaf.keys[start] == key:
+                yield key, leaf.values[start]
+
     def __setitem__(self, key, value):
-        split_key, r = self.root.insert(key, value)
-        if len(r) > 1:
-            self.root = InteriorNode(self.root.degree)
-            self.root.children = r
-            self.root.keys = [split_key]
-        else:
-            self.root = r[0]
+        split = self.root.insert(key, value)
+        if split is not None:
+            split_key, right = split
+            self.root = InteriorNode(
+                self.degree, container(self.key_typecode, [split_key]),
+                [self.root, right])
+
+    def update_sorted(self, items):
+        """Add (key, value) pairs in strictly increasing key order, replacing
+        the values of keys already held.
+
+        The whole batch goes down the tree at once, each node visited once
+        however many of the keys it takes, and overflowing nodes are split
+        into as many full ones as needed.
+        """
+        keys = []
+        values = []
+        for key, value in items:
+            keys.append(key)
+            values.append(value)
+        if not keys:
+            return
+        if not all(map(operator.lt, keys, keys[1:])):
+            raise Exception('Keys must be unique and in sorted order')
+        splits = self.root.insert_sorted(keys, values)
+        while splits:
+            root = InteriorNode(
+                self.degree,
+                container(self.key_typecode, [key for key, _ in splits]),
+                [self.root] + [node for _, node in splits])
+            splits = root.split_overfull()
+            self.root = root
 
     def __delitem__(self, key):
-        pass
+        self.root.delete(key)
+        if not self.root.is_leaf and len(self.root.children) == 1:
+            self.root = self.root.children[0]
+
+    def items(self):
+        node = self._first_leaf()
+        while node is not None:
+            yield from zip(node.keys, node.values)
+            node = node.next_sibling
 
     def __iter__(self):
-        node = self.root
-        while type(node) != LeafNode:
-            node = node.children[0]
+        node = self._first_leaf()
         while node is not None:
-            for k in node.keys:
-                yield k
+            yield from node.keys
             node = node.next_sibling
 
     def __reversed__(self):
-        node = self.root
-        while type(node) != LeafNode:
-            node = node.children[-1]
+        node = self._last_leaf()
         while node is not None:
-            for k in reversed(node.keys):
-                yield k
+            yield from reversed(node.keys)
             node = node.prev_sibling
 
     def __repr__(self):
         return '\n'.join(self.root.print(0))
 
 
+class Cursor:
+    """Position on an entry in the leaf chain of a BTree.
+
+    A new cursor is unpositioned until one of the seek methods is called.
+    Iterating with forward or backward does not move the cursor, and the
+    tree must not be modified while a cursor or its iterators are in use.
+    """
+    __slots__ = ('tree', 'leaf', 'index')
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.leaf = None
+        self.index = 0
+
+    @property
+    def valid(self):
+        return self.leaf is not None
+
+    @property
+    def key(self):
+        return self.leaf.keys[self.index]
+
+    @property
+    def value(self):
+        return self.leaf.values[self.index]
+
+    def _settle_forward(self):
+        while self.leaf is not None and self.index >= len(self.leaf.keys):
+            self.leaf = self.leaf.next_sibling
+            self.index = 0
+        return self.leaf is not None
+
+    def _settle_backward(self):
+        while self.leaf is not None and self.index < 0:
+            self.leaf = self.leaf.prev_sibling
+            if self.leaf is not None:
+                self.index = len(self.leaf.keys) - 1
+        return self.leaf is not None
+
+    def seek(self, key, inclusive=True):
+        """Move to the first entry with a key >= key, or > key if not
+        inclusive"""
+        self.leaf = self.tree.root.search_for_node(key)
+        find = bisect_left if inclusive else bisect_right
+        self.index = find(self.leaf.keys, key)
+        return self._settle_forward()
+
+    def seek_before(self, key, inclusive=True):
+        """Move to the last entry with a key <= key, or < key if not
+        inclusive"""
+        self.leaf = self.tree.root.search_for_node(key)
+        find = bisect_right if inclusive else bisect_left
+        self.index = find(self.leaf.keys, key) - 1
+        return self._settle_backward()
+
+    def seek_first(self):
+        self.leaf = self.tree._first_leaf()
+        self.index = 0
+        return self._settle_forward()
+
+    def seek_last(self):
+        self.leaf = self.tree._last_leaf()
+        self.index = len(self.leaf.keys) - 1
+        return self._settle_backward()
+
+    def seek_position(self, position):
+        """Move to the entry with position smaller keys before it"""
+        if not 0 <= position < len(self.tree):
+            self.leaf = None
+            return False
+        self.leaf, self.index = self.tree._locate(position)
+        return True
+
+    def next(self):
+        self.index += 1
+        return self._settle_forward()
+
+    def prev(self):
+        self.index -= 1
+        return self._settle_backward()
+
+    def forward(self, stop=None, include_stop=False, visited=None):
+        """(key, value) pairs from the current entry up to stop, calling
+        visited, if given, with 1 for each leaf walked to"""
+        find = bisect_right if include_stop else bisect_left
+        leaf = self.leaf
+        index = self.index
+        while leaf is not None:
+            keys = leaf.keys
+            end = len(keys)
+            if stop is not None:
+                end = find(keys, stop, index)
+            yield from zip(keys[index:end], leaf.values[index:end])
+            if end < len(keys):
+                return
+            leaf = leaf.next_sibling
+            index = 0
+            if visited is not None and leaf is not None:
+                visited(1)
+
+    def backward(self, stop=None, include_stop=False, visited=None):
+        """(key, value) pairs from the current entry down to stop, calling
+        visited, if given, with 1 for each leaf walked to"""
+        find = bisect_left if include_stop else bisect_right
+        leaf = self.leaf
+        end = self.index + 1
+        while leaf is not None:
+            keys = leaf.keys
+            start = 0
+            if stop is not None:
+                start = find(keys, stop, 0, end)
+            yield from zip(reversed(keys[start:end]),
+                           reversed(leaf.values[start:end]))
+            if start > 0:
+                return
+            leaf = leaf.prev_sibling
+            if leaf is not None:
+                end = len(leaf.keys)
+                if visited is not None:
+                    visited(1)
+
+
 def insert(tree, key):
     tree[key] = 'v{}'.format(key)
     print(tree)
@@ -298,7 +828,7 @@ def insert(tree, key):
 
 
 if __name__ == '__main__':
-    tree = BTree()
+    tree = BTree(4)
 
     print(len(tree))
     insert(tree, 4)
@@ -0,0 +1,191 @@
+"""Storage of tables by column rather than by row.
+
+Each int or double column is an array of machine values and each varchar
+column an array of codes into a dictionary of its distinct values, so a
+table takes a fraction of the memory of one held as row tuples, and a scan
+reading a few of its columns never touches the others:
+
+    db = Database(ColumnarStorageDriver())
+"""
+from array import array
+
+from python_sql.database import StorageDriver, scan_batches
+
+TYPECODES = {'int': 'q', 'double': 'd'}
+# Codes of dictionary encoded columns, widened as their dictionaries grow
+# past the most distinct values each holds
+CODE_TYPECODES = (('B', 1 << 8), ('H', 1 << 16), ('I', 1 << 32))
+
+
+class NumberColumn:
+    """Values of an int or double column in an array, NULL values as 0 with
+    their data indexes in nulls"""
+
+    def __init__(self, name, typecode):
+        self.name = name
+        self.typecode = typecode
+        self.values = array(typecode)
+        self.nulls = set()
+
+    def encode(self, values):
+        """values as an array to store, and the positions of the NULLs"""
+        nulls = [i for i, value in enumerate(values) if value is None]
+        if nulls:
+            values = [0 if value is None else value for value in values]
+        try:
+            return array(self.typecode, values), nulls
+        except (OverflowError, TypeError) as e:
+            raise Exception('Cannot store value in column {}: {}'.format(
+                self.name, e))
+
+    def extend(self, encoded):
+        values, nulls = encoded
+        start = len(self.values)
+        self.values.extend(values)
+        self.nulls.update(start + i for i in nulls)
+
+    def put(self, data_index, encoded):
+        values, nulls = encoded
+        self.values[data_index] = values[0]
+        if nulls:
+            self.nulls.add(data_index)
+        else:
+            self.nulls.discard(data_index)
+
+    def get(self, data_index):
+        if data_index in self.nulls:
+            return None
+        return self.values[data_index]
+
+    def take(self, data_indexes):
+        """Values at each of data_indexes"""
+        values = self.values
+        if not self.nulls:
+            return [values[i] for i in data_indexes]
+        nulls = self.nulls
+        return [None if i in nulls else values[i] for i in data_indexes]
+
+
+class DictionaryColumn:
+    """Values of a varchar column as codes into a dictionary of the
+    distinct values, NULL being code 0"""
+
+    def __init__(self, name):
+        self.name = name
+        self.dictionary = [None]
+        self.codes = {None: 0}
+        self.values = array(CODE_TYPECODES[0][0])
+
+    def _code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        return code
+
+    def _widen(self):
+        for typecode, size in CODE_TYPECODES:
+            if len(self.dictionary) <= size:
+                if typecode != self.values.typecode:
+                    self.values = array(typecode, self.values)
+                return
+
+    def encode(self, values):
+        try:
+            codes = [self._code(value) for value in values]
+        except TypeError as e:
+            raise Exception('Cannot store value in column {}: {}'.format(
+                self.name, e))
+        self._widen()
+        return codes
+
+    def extend(self, encoded):
+        self.values.extend(encoded)
+
+    def put(self, data_index, encoded):
+        self.values[data_index] = encoded[0]
+
+    def get(self, data_index):
+        return self.dictionary[self.values[data_index]]
+
+    def take(self, data_indexes):
+        dictionary = self.dictionary
+        values = self.values
+        return [dictionary[values[i]] for i in data_indexes]
+
+
+def new_column(column_def):
+    if column_def.type == 'varchar':
+        return DictionaryColumn(column_def.name)
+    return NumberColumn(column_def.name, TYPECODES[column_def.type])
+
+
+class ColumnarStorageDriver(StorageDriver):
+    """Stores every column of a table apart, reading only the columns a
+    scan asks for"""
+
+    def __init__(self):
+        super().__init__()
+        self._columns = {}
+        # Data indexes of the rows deleted from each table
+        self._deleted = {}
+
+    def add_table(self, table):
+        super().add_table(table)
+        self._columns[table.name] = [new_column(column_def)
+                                     for column_def in table.column_defs]
+        self._deleted[table.name] = set()
+
+    def _encode(self, table_name, rows):
+        """Values of rows encoded column by column, checking every value can
+        be stored before any is"""
+        columns = self._columns[table_name]
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        if len(values) != len(columns):
+            raise Exception('Expected {} values in each row of {}'.format(
+                len(columns), table_name))
+        return [column.encode(column_values)
+                for column, column_values in zip(columns, values)]
+
+    def write_row(self, table_name, pk, row_data):
+        encoded = self._encode(table_name, [row_data])
+        for column, column_encoded in zip(self._columns[table_name],
+                                          encoded):
+            column.put(pk, column_encoded)
+        self._deleted[table_name].discard(pk)
+
+    def append_row(self, table_name, row_data):
+        self.append_rows(table_name, [row_data])
+
+    def append_rows(self, table_name, rows):
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return
+        for column, encoded in zip(self._columns[table_name],
+                                   self._encode(table_name, rows)):
+            column.extend(encoded)
+
+    def read_row(self, table_name, pk):
+        if pk in self._deleted[table_name]:
+            return None
+        return tuple(column.get(pk) for column in self._columns[table_name])
+
+    def read_columns(self, table_name, data_indexes, column_indexes):
+        columns = [self._columns[table_name][i] for i in column_indexes]
+        for batch in scan_batches(data_indexes):
+            if columns:
+                yield from zip(*[column.take(batch) for column in columns])
+            else:
+                yield from (() for _ in batch)
+
+    def delete_row(self, table_name, pk):
+        # The values stay, so the data indexes of other rows stay valid
+        self._deleted[table_name].add(pk)
+
+    def scan(self, table_name, start_pk=None, stop_pk=None):
+        columns = self._columns[table_name]
+        rows = len(columns[0].values) if columns else 0
+        for data_index in range(rows)[start_pk:stop_pk]:
+            row = self.read_row(table_name, data_index)
+            if row is not None:
+                yield row
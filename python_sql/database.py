@@ -1,34 +1,49 @@
 import itertools
-import logging
+from array import array
+from operator import itemgetter
 
-from python_sql.b_tree import BTree
+from python_sql.b_tree import BTree, DEFAULT_DEGREE
+from python_sql.index import SecondaryIndex, UniqueIndex
+from python_sql.executor import Row, explain, profile
+from python_sql.join import DEFAULT_JOIN_MEMORY_LIMIT
 from python_sql.logic import *
+from python_sql.logic.compiler import compile_expression, compile_predicate
 from python_sql.parser import parse
-
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s %(message)s')
-logger = logging.getLogger(__name__)
-
-
-class Row():
-
-    def __init__(self, data, columns):
-        self.data = data if isinstance(data, tuple) else tuple(data)
-        self.columns = [x.reference_name for x in columns]
-
-    def __getitem__(self, key):
-        if isinstance(key, int):
-            index = key
-        else:
-            index = self.columns.index(key)
-        return self.data[index]
-
-    def __eq__(self, other):
-        if isinstance(other, Row):
-            return self.data == other.data and self.columns == other.columns
-        elif isinstance(other, tuple):
-            return self.data == other
-        else:
-            raise Exception('Can only compare Row or tuple')
+from python_sql.planner import Planner, access_path
+from python_sql.prepared import DEFAULT_STATEMENT_CACHE_SIZE, \
+    PreparedStatement, StatementCache
+from python_sql.statistics import analyze
+from python_sql.tracing import Tracer, instrumented
+from python_sql.transfer import BATCH_SIZE, copy_from, export, field_names
+
+
+# Rows read at a time by batched scans, growing from the first size to the
+# last so that a scan stopped early reads few of them
+SCAN_BATCHES = (16, 4096)
+
+
+def scan_batches(data_indexes):
+    """Lists of the data indexes taken from data_indexes a batch at a time,
+    sized as by SCAN_BATCHES"""
+    data_indexes = iter(data_indexes)
+    size, most = SCAN_BATCHES
+    while True:
+        batch = list(itertools.islice(data_indexes, size))
+        if not batch:
+            return
+        yield batch
+        size = min(most, size * 2)
+
+
+def column_getter(column_indexes):
+    """Function taking the values at column_indexes out of a row, as a
+    tuple"""
+    if len(column_indexes) == 1:
+        index = column_indexes[0]
+        return lambda row: (row[index],)
+    elif not column_indexes:
+        return lambda row: ()
+    return itemgetter(*column_indexes)
 
 
 class StorageDriver:
@@ -39,15 +54,52 @@ class StorageDriver:
     def add_table(self, table):
         self.tables[table.name] = table.column_defs
 
+    def add_index(self, table_name, name, column_name):
+        pass
+
+    def stored_tables(self):
+        """(CreateTable, [(index name, column name)]) of the tables held
+        when the storage was opened, for a Database to open them again"""
+        return []
+
+    def stored_keys(self, table_name):
+        """(data index, primary key) of every row held of a table stored
+        before, the key None for the rows deleted"""
+        return iter(())
+
     def write_row(self, table_name, pk, row_data):
         pass
 
     def append_row(self, table_name, row_data):
         pass
 
+    def append_rows(self, table_name, rows):
+        for row_data in rows:
+            self.append_row(table_name, row_data)
+
     def read_row(self, table_name, pk):
         pass
 
+    def read_rows(self, table_name, data_indexes):
+        """Rows at data_indexes, for drivers able to read many rows at once
+        to do better than read_row on each"""
+        read_row = self.read_row
+        for data_index in data_indexes:
+            yield read_row(table_name, data_index)
+
+    def read_columns(self, table_name, data_indexes, column_indexes):
+        """Tuples of the values at column_indexes of the rows at
+        data_indexes, for drivers able to read some columns of a row
+        without the others to do better"""
+        get = column_getter(column_indexes)
+        # The class's own read_row, tracing counting the rows returned here
+        read_row = type(self).read_row
+        for data_index in data_indexes:
+            yield get(read_row(self, table_name, data_index))
+
+    def delete_row(self, table_name, pk):
+        pass
+
     def scan(self, table_name, start_pk=None, stop_pk=None):
         pass
 
@@ -68,23 +120,36 @@ class MemoryStorageDriver(StorageDriver):
     def append_row(self, table_name, row_data):
         self._data[table_name].append(row_data)
 
+    def append_rows(self, table_name, rows):
+        self._data[table_name].extend(rows)
+
     def read_row(self, table_name, pk):
         return self._data[table_name][pk]
 
+    def delete_row(self, table_name, pk):
+        # Leave a hole so the data indexes of other rows stay valid
+        self._data[table_name][pk] = None
+
     def scan(self, table_name, start_pk=None, stop_pk=None):
         sp = slice(start_pk, stop_pk)
         for row in self._data[table_name][sp]:
-            yield row
+            if row is not None:
+                yield row
 
 
 class Table():
-    def __init__(self, storage: StorageDriver, create_table: CreateTable):
+    def __init__(self, storage: StorageDriver, create_table: CreateTable,
+                 degree=DEFAULT_DEGREE):
         self.storage=storage
+        self.degree = degree
         self.name = create_table.table.name
         self.column_defs = create_table.columns
         self.pk_def = None
         self.auto_pk = False
         self._unique_indexes = {}
+        self._indexes = {}
+        # Set by ANALYZE
+        self.statistics = None
         for cd in self.column_defs:
             if cd.name == 'rowid' and ColumnConstraint.PRIMARY_KEY not in cd.constraints:
                 raise Exception(
@@ -93,43 +158,216 @@ class Table():
                 if self.pk_def is not None:
                     raise Exception('Multiple Primary keys not supported')
                 self.pk_def = cd
-            if ColumnConstraint.UNIQUE in cd.constraints:
-                self._unique_indexes[cd] = BTree()
         if self.pk_def is None:
             # Create fake PK
             self.pk_def = ColumnDefinition('rowid', 'int', 8,
                                            ColumnConstraint.PRIMARY_KEY)
             self.column_defs.insert(0, self.pk_def)
             self.auto_pk = True
-        self._pk_index = BTree()
+        for i, cd in enumerate(self.column_defs):
+            if ColumnConstraint.UNIQUE in cd.constraints and cd != self.pk_def:
+                index = UniqueIndex('{}_{}_unique'.format(self.name, cd.name),
+                                    cd, i, degree)
+                self._unique_indexes[cd] = index
+                self._indexes[index.name] = index
+        self._pk_index = BTree(degree, 'q', 'q')
+        # Storage slots are never reused, so deleted rows must not free up
+        # their data index or rowid
+        self._data_size = 0
+        self._next_rowid = 0
         self.storage.add_table(self)
 
-    def insert(self, row):
-        row_data = []
+    def _append(self, pk, row_data):
+        self._check_pk(pk)
+        data_index = self._data_size
+        # Stored first, as storage may refuse values it cannot hold
+        self.storage.append_row(self.name, row_data)
+        self._data_size += 1
+        self._pk_index[pk] = data_index
+        added = []
+        try:
+            for index in self._indexes.values():
+                index.add(row_data[index.column_index], data_index)
+                added.append(index)
+        except Exception:
+            # Left as a deleted row, its data index not given again
+            for index in added:
+                index.remove(row_data[index.column_index], data_index)
+            del self._pk_index[pk]
+            self.storage.delete_row(self.name, data_index)
+            raise
+
+    def _check_pk(self, pk):
+        """Raise if pk is not a key the primary key index can hold"""
+        try:
+            array('q', (pk,))
+        except (OverflowError, TypeError):
+            raise Exception('Cannot store primary key {!r} in {}'.format(
+                pk, self.name))
+
+    def create_index(self, name, column_name):
+        if name in self._indexes:
+            raise Exception(
+                'Index {} already exists on {}'.format(name, self.name))
+        column_index = self.column_index(column_name)
+        index = SecondaryIndex(name, self.column_defs[column_index],
+                               column_index, self.degree)
+        index.build((data_index, self.get_row_data(data_index))
+                    for _, data_index in self._pk_index.items())
+        self._indexes[name] = index
+        self.storage.add_index(self.name, name, column_name)
+        return index
+
+    def load(self):
+        """Index the rows the storage held of the table before it was
+        opened"""
+        pairs = []
+        for data_index, pk in self.storage.stored_keys(self.name):
+            self._data_size = data_index + 1
+            if pk is not None:
+                pairs.append((pk, data_index))
+        pairs.sort()
+        self._pk_index = BTree.from_sorted(pairs, self.degree,
+                                           key_typecode='q',
+                                           value_typecode='q')
+        if self.auto_pk and pairs:
+            # Rowids of rows deleted past the last one left are given again
+            self._next_rowid = pairs[-1][0] + 1
+        for index in self._indexes.values():
+            index.build((data_index, self.get_row_data(data_index))
+                        for _, data_index in pairs)
+
+    def index_for(self, column_ref):
+        """An index usable to find rows by the value of column_ref"""
+        if not isinstance(column_ref, ColumnReference) or \
+                column_ref.table != self.name:
+            return None
+        # Unique indexes first, they fetch at most one row per value
+        for index in self._unique_indexes.values():
+            if index.column == column_ref.column:
+                return index
+        for index in self._indexes.values():
+            if index.column == column_ref.column:
+                return index
+        return None
+
+    def _check_unique(self, row_data, data_index=None):
+        for index in self._unique_indexes.values():
+            index.check(row_data[index.column_index], data_index)
+
+    def column_index(self, column_name):
         for i, column_def in enumerate(self.column_defs):
-            row_data.append(row.get(column_def.name, None))
+            if column_def.name == column_name:
+                return i
+        raise Exception(
+            'No column named {} found in {}'.format(column_name, self.name))
+
+    def insert(self, row):
+        row_data = tuple(row.get(column_def.name, None)
+                         for column_def in self.column_defs)
         pk = row_data[0]
         if pk in self._pk_index:
             data_index = self._pk_index[pk]
+            self._check_unique(row_data, data_index)
+            old_row = self.get_row_data(data_index) if self._indexes else None
+            # Stored first, as storage may refuse values it cannot hold
             self.storage.write_row(self.name, data_index, row_data)
+            if old_row is not None:
+                try:
+                    self._move_in_indexes(data_index, old_row, row_data)
+                except Exception:
+                    self.storage.write_row(self.name, data_index, old_row)
+                    raise
         else:
-            self._pk_index[pk] = len(self._pk_index)
-            self.storage.append_row(self.name, row_data)
+            self._check_unique(row_data)
+            self._append(pk, row_data)
+
+    def _move_in_indexes(self, data_index, old_row, row_data):
+        """Index data_index under the values of row_data in place of those
+        of old_row, every index left as it was if one refuses a value"""
+        moved = []
+        try:
+            for index in self._indexes.values():
+                old_value = old_row[index.column_index]
+                new_value = row_data[index.column_index]
+                if old_value != new_value:
+                    index.remove(old_value, data_index)
+                    # Removing None is a no-op, for an index not reached
+                    moved.append((index, old_value, None))
+                    index.add(new_value, data_index)
+                    moved[-1] = (index, old_value, new_value)
+        except Exception:
+            for index, old_value, new_value in reversed(moved):
+                index.remove(new_value, data_index)
+                index.add(old_value, data_index)
+            raise
 
     def direct_insert(self, row):
         if len(row) != len(self.column_defs) and not self.auto_pk:
             raise Exception(
                 'Cannot directly insert row with missing or extra columns.')
-        if self.auto_pk:
-            new_pk = len(self._pk_index)
-            row.insert(0, IntegerLiteral(new_pk))
         row = tuple(x.value for x in row)
+        if self.auto_pk:
+            row = (self._next_rowid,) + row
         pk = row[0]
         if pk in self._pk_index:
             raise Exception(
                 'Cannot insert duplicate row with Primary Key: {}'.format(pk))
-        self._pk_index[pk] = len(self._pk_index)
-        self.storage.append_row(self.name, row)
+        self._check_unique(row)
+        self._append(pk, row)
+        if self.auto_pk:
+            # Only once the row is in, so a refused row takes no rowid
+            self._next_rowid += 1
+
+    def insert_many(self, rows):
+        """Insert rows of values, like direct_insert does rows of literals,
+        as one batch. Every row is checked before any is inserted, then the
+        primary key and each index take their new keys in one sorted
+        batch."""
+        width = len(self.column_defs) - self.auto_pk
+        rows = [tuple(row) for row in rows]
+        for row in rows:
+            if len(row) != width:
+                raise Exception('Cannot directly insert row with missing or '
+                                'extra columns.')
+        if self.auto_pk:
+            first = self._next_rowid
+            rows = [(first + i,) + row for i, row in enumerate(rows)]
+        else:
+            for row in rows:
+                self._check_pk(row[0])
+        pks = sorted(row[0] for row in rows)
+        for pk, next_pk in zip(pks, pks[1:]):
+            if pk == next_pk:
+                raise Exception(
+                    'Cannot insert duplicate row with Primary Key: {}'.format(
+                        pk))
+        for pk, _ in self._pk_index.search_many(pks):
+            raise Exception(
+                'Cannot insert duplicate row with Primary Key: {}'.format(pk))
+        for index in self._indexes.values():
+            index.check_many(row[index.column_index] for row in rows)
+
+        self.storage.append_rows(self.name, rows)
+        if self.auto_pk:
+            self._next_rowid += len(rows)
+        start = self._data_size
+        self._data_size += len(rows)
+        self._pk_index.update_sorted(sorted(
+            (row[0], data_index)
+            for data_index, row in enumerate(rows, start)))
+        for index in self._indexes.values():
+            index.add_many((row[index.column_index], data_index)
+                           for data_index, row in enumerate(rows, start))
+        return len(rows)
+
+    def delete_by_pk(self, pk):
+        data_index = self._pk_index.pop(pk)
+        if self._indexes:
+            row = self.get_row_data(data_index)
+            for index in self._indexes.values():
+                index.remove(row[index.column_index], data_index)
+        self.storage.delete_row(self.name, data_index)
 
     def direct_update(self, row):
         if len(row) != len(self.column_defs):
@@ -145,20 +383,73 @@ class Table():
             new_rows.append(new_row)
         return new_rows
 
+    def __len__(self):
+        return len(self._pk_index)
+
+    def rebuild_indexes(self, fill_factor=1.0):
+        """Repack every index bottom-up"""
+        self._pk_index = BTree.from_sorted(self._pk_index.items(),
+                                           self.degree, fill_factor, 'q', 'q')
+        for index in self._indexes.values():
+            index.build((data_index, self.get_row_data(data_index))
+                        for _, data_index in self._pk_index.items())
+
     def get_row_by_pk(self, pk):
         data_index = self._pk_index.search(pk)
         if data_index is None:
             return None
         return self.get_row_data(data_index)
 
+    def read_rows(self, data_indexes, column_indexes=None):
+        """Rows at data_indexes, only the values at column_indexes if
+        given"""
+        if column_indexes is not None:
+            return self.storage.read_columns(self.name, data_indexes,
+                                             column_indexes)
+        return self.storage.read_rows(self.name, data_indexes)
+
     def get_row_data(self, index):
-        logger.debug('Get Row Data - {}: row {}'.format(self.name, index))
         return self.storage.read_row(self.name, index)
 
-    def scan(self, start=None, stop=None):
-        sp = slice(start, stop)
-        for data_index in self._pk_index[sp]:
-            yield self.get_row_data(data_index)
+    def count_range(self, start=None, stop=None, include_start=True,
+                    include_stop=False):
+        """Number of rows scan() would return for the same primary key range"""
+        return self._pk_index.count_range(start, stop, include_start,
+                                          include_stop)
+
+    def scan(self, start=None, stop=None, include_start=True,
+             include_stop=False, reverse=False, column_indexes=None):
+        return self.read_rows(
+            (data_index for _, data_index in self.pk_range(
+                start, stop, include_start, include_stop, reverse)),
+            column_indexes)
+
+    def scan_from(self, position, column_indexes=None):
+        """Rows in primary key order, skipping the first position rows
+        without reading them"""
+        cursor = self._pk_index.cursor()
+        if not cursor.seek_position(position):
+            return iter(())
+        return self.read_rows((data_index for _, data_index in
+                               cursor.forward()), column_indexes)
+
+    def lookup_pks(self, pks):
+        """Data indexes of the rows with primary keys in pks, which must be
+        sorted and distinct, in primary key order and skipping those not
+        found"""
+        for _, data_index in self._pk_index.search_many(pks):
+            yield data_index
+
+    def pk_range(self, start=None, stop=None, include_start=True,
+                 include_stop=False, reverse=False):
+        """(primary key, data index) pairs of the rows between start and
+        stop, without reading the rows"""
+        return self._pk_index.range(start, stop, include_start, include_stop,
+                                    reverse)
+
+    @property
+    def pk_height(self):
+        return self._pk_index.height
 
     @property
     def primary_key_def(self):
@@ -175,31 +466,188 @@ class Table():
 
 
 class Database:
-    def __init__(self, storage: StorageDriver=MemoryStorageDriver()):
+    def __init__(self, storage: StorageDriver = None,
+                 index_degree=DEFAULT_DEGREE,
+                 join_memory_limit=DEFAULT_JOIN_MEMORY_LIMIT,
+                 tracer: Tracer = None,
+                 statement_cache_size=DEFAULT_STATEMENT_CACHE_SIZE):
         self.tables = {}
-        self.storage=storage
+        # Each database its own storage, unless given one
+        self.storage = MemoryStorageDriver() if storage is None else storage
+        self.index_degree = index_degree
+        # Most rows a hash join may hold in memory before spilling to disk
+        self.join_memory_limit = join_memory_limit
+        self.planner = Planner(self)
+        # Traces every statement when set
+        self.tracer = tracer
+        # Statements prepared from SQL, reused when it is run again
+        self.statements = StatementCache(statement_cache_size)
+        # Changed by every statement changing what plans may use, making
+        # those made before stale
+        self.schema_version = 0
+        for create_table, indexes in self.storage.stored_tables():
+            table = Table(self.storage, create_table, index_degree)
+            table.load()
+            for name, column_name in indexes:
+                table.create_index(name, column_name)
+            self.tables[table.name] = table
+
+    def prepare(self, sql) -> PreparedStatement:
+        """The statement sql, with ? in place of any values, to run any
+        number of times with values bound to them"""
+        return self.statements.get(self, sql)
+
+    def execute(self, command, parameters=()):
+        """Run command, SQL or a prepared or parsed statement, with the
+        values of its ? parameters in parameters"""
+        if self.tracer is not None:
+            return self._traced_execute(command, parameters)
+        statement = self._prepared(command, parameters)
+        if type(statement.command) == Select:
+            return list(statement.plan())
+        return self._execute(statement.command)
+
+    def _prepared(self, command, parameters) -> PreparedStatement:
+        if type(command) == str:
+            statement = self.prepare(command)
+        elif type(command) == PreparedStatement:
+            statement = command
+        else:
+            statement = PreparedStatement(self, command)
+        statement.bind(parameters)
+        return statement
 
-    def execute(self, command):
+    def _execute(self, command):
         cmd_type = type(command)
-        if cmd_type == str:
-            command = parse(command)
-            cmd_type = type(command)
-
         if cmd_type == Select:
-            return self._select(command)
+            return list(self.planner.plan_select(command))
         elif cmd_type == Insert:
             return self._insert(command)
+        elif cmd_type == CreateIndex:
+            self._get_table(command.table).create_index(command.name,
+                                                        command.column)
+            self.schema_version += 1
         elif cmd_type == CreateTable:
             table_name = command.table.name
             if table_name in self.tables:
                 raise Exception(
                     'Cannot create existing table: {}'.format(table_name))
-            self.tables[table_name] = Table(self.storage, command)
+            self.tables[table_name] = Table(self.storage, command,
+                                            self.index_degree)
+            self.schema_version += 1
+        elif cmd_type == Explain:
+            return self._explain(command)
+        elif cmd_type == Analyze:
+            if command.table is None:
+                tables = self.tables.values()
+            else:
+                tables = [self._get_table(command.table)]
+            for table in tables:
+                table.statistics = analyze(table)
+            self.schema_version += 1
+        elif cmd_type == CopyFrom:
+            return self.copy_from(command.table, command.path,
+                                  command.format, command.header)
+        elif cmd_type == CopyTo:
+            return export(iter(self.planner.plan_select(command.select)),
+                          field_names(command.select.columns), command.path,
+                          command.format, command.header)
         elif cmd_type == Update:
             return self._update(command)
+        elif cmd_type == Delete:
+            return self._delete(command)
         else:
             raise Exception('Unsupported type: {}'.format(cmd_type))
 
+    def stream(self, command, parameters=()):
+        """Iterator over the result rows of a SELECT, computed as they are
+        pulled"""
+        if self.tracer is not None:
+            return self._traced_stream(command, parameters)
+        statement = self._prepared(command, parameters)
+        return statement.rows(self._plan_stream(statement))
+
+    @staticmethod
+    def _plan_stream(statement: PreparedStatement):
+        if type(statement.command) != Select:
+            raise Exception('Can only stream SELECT, not {}'.format(
+                type(statement.command)))
+        return statement.plan()
+
+    def _traced_execute(self, command, parameters):
+        trace = self.tracer.start(command, self)
+        try:
+            with trace.phase('parse'):
+                statement = self._prepared(command, parameters)
+            if type(statement.command) == Select:
+                with trace.phase('plan'):
+                    plan = statement.plan()
+                with trace.phase('execute'):
+                    return list(plan)
+            # Planned as part of executing the other statements
+            with trace.phase('execute'):
+                return self._execute(statement.command)
+        finally:
+            trace.finish()
+
+    def _traced_stream(self, command, parameters):
+        trace = self.tracer.start(command, self)
+        try:
+            with trace.phase('parse'):
+                statement = self._prepared(command, parameters)
+            with trace.phase('plan'):
+                rows = statement.rows(self._plan_stream(statement))
+        except BaseException:
+            trace.finish()
+            raise
+        return self._pull(rows, trace)
+
+    @staticmethod
+    def _pull(rows, trace):
+        """Pass on rows, timing each one pulled, until they run out or are
+        no longer wanted"""
+        end = object()
+        try:
+            while True:
+                with trace.phase('execute'):
+                    row = next(rows, end)
+                if row is end:
+                    return
+                yield row
+        finally:
+            trace.finish()
+
+    def copy_from(self, table_name, path, format=None, header=False,
+                  batch_size=BATCH_SIZE):
+        """Load the rows of a CSV, TSV or JSON lines file into a table in
+        batches, without parsing any SQL, returning how many"""
+        return copy_from(self._get_table(table_name), path, format, header,
+                         batch_size)
+
+    def export(self, select, path, format=None, header=False, parameters=(),
+               batch_size=BATCH_SIZE):
+        """Write the result rows of a SELECT to a CSV, TSV or JSON lines
+        file in batches as they are computed, returning how many"""
+        statement = self._prepared(select, parameters)
+        rows = self.stream(statement, parameters)
+        try:
+            return export(rows, field_names(statement.command.columns), path,
+                          format, header, batch_size)
+        finally:
+            # Finishes the stream, and its trace, should writing fail
+            rows.close()
+
+    def _explain(self, command: Explain):
+        """Lines describing the plan of the query, and with ANALYZE what
+        each operator did running it"""
+        plan = self.planner.plan_select(command.select)
+        if command.analyze:
+            plan = profile(plan)
+            with instrumented(self.tables.values(), self.storage):
+                for _ in plan:
+                    pass
+        return explain(plan)
+
     def _get_table(self, table_name, raise_exception=True) -> Table:
         if type(table_name) == TableReference:
             table_name = table_name.name
@@ -211,145 +659,39 @@ class Database:
 
     def _insert(self, insert: Insert):
         table = self._get_table(insert.table)
-        table.direct_insert(insert.values)
-
-    def _sort(self, rows, columns, order_by):
-        if len(order_by.columns) > 0:
-            indexes = [columns.index(c) for c in order_by.columns]
-
-            def create_key(row):
-                return tuple(row[i] for i in indexes)
-
-            rows.sort(key=create_key, reverse=order_by.reverse)
-        return rows
-
-    def _trim_to_select(self, rows, columns, select):
-        to_retain = [columns.index(c) for c in select.columns]
-        results = []
-        for row in rows:
-            result = []
-            for i, e in enumerate(row):
-                if i in to_retain:
-                    result.append(e)
-            results.append(Row(result, select.columns))
-        return results
-
-    def _select_join_rows(self, joined_table: JoinTable, left_table_value):
-        right_table = self._get_table(joined_table.table)
-        right_table_columns = right_table.column_references
-        right_table_column_index = right_table_columns.index(joined_table.right)
-        right_table_column_def = right_table_columns[right_table_column_index]
-        if right_table_column_def.column == right_table.pk_def.name:
-            logger.debug('Using primary key index for join on {}'.format(
-                right_table.name))
-            # Primary key, so we can use the index
-            right_table_row = right_table.get_row_by_pk(left_table_value)
-            if right_table_row is None:
-                yield None
-            else:
-                yield right_table_row
+        if len(insert.rows) == 1:
+            table.direct_insert(insert.rows[0])
         else:
-            for right_table_row in right_table.scan():
-                if right_table_row[
-                    right_table_column_index] == left_table_value:
-                    yield right_table_row
-
-    def _select(self, select: Select):
-        from_clause = select.from_clause
-        main_table = self._get_table(from_clause.table)
-        columns = [ColumnReference(main_table.name, col.name, None) for col in
-                   main_table.column_defs]
-        rows = []
-        for row in self._get_rows(main_table, select.where):
-            skip_row = False
-            temp_rows = [row]
-            for joined_table in from_clause.joins:
-                joined_rows = []
-                right_table = self._get_table(joined_table.table)
-                right_table_columns = right_table.column_references
-                columns += right_table_columns
-                left_table_column_index = columns.index(
-                    joined_table.left) if joined_table.left is not None else None
-                for curr_row in temp_rows:
-                    if left_table_column_index is not None:
-                        left_table_value = curr_row[left_table_column_index]
-                        gen = self._select_join_rows(joined_table,
-                                                     left_table_value)
-                    else:
-                        # cross join
-                        gen = right_table.scan()
-                    for right_table_row in gen:
-                        if right_table_row is not None:
-                            new_row = curr_row + right_table_row
-                            joined_rows.append(new_row)
-                temp_rows = joined_rows
-            for r in temp_rows:
-                rows.append(r)
-
-        if select.where:
-            rows = self._filter(rows, select.where, columns)
-        if select.order_by:
-            rows = self._sort(list(rows), columns, select.order_by)
-        return self._trim_to_select(rows, columns, select)
+            table.insert_many([[value.value for value in row]
+                               for row in insert.rows])
 
     def _filter(self, rows: List, where, columns: List[ColumnReference]):
-        for row in rows:
-            if where is None or where.evaluate(Context(row, columns)):
-                yield row
+        if where is None:
+            return rows
+        return filter(compile_predicate(where, columns), rows)
 
     def _get_rows(self, main_table: Table, where_clause):
-        if issubclass(type(where_clause),
-                      Terminal) and main_table.primary_key_ref in where_clause.columns_used():
-            if type(where_clause) == Equals:
-                logging.debug('Can use primary key index for where Equals')
-                value = where_clause.right.value
-                return [main_table.get_row_by_pk(value)]
-            elif type(where_clause) == InFunc:
-                logging.debug('Can use primary key index for where InFunc')
-                return (main_table.get_row_by_pk(value.value) for value in
-                        where_clause.values)
-            elif type(where_clause) in (
-                    GreaterThan, GreaterThanEquals) and isinstance(
-                where_clause.right,
-                Literal):
-                logging.debug('Can use primary key index for where {}'.format(
-                    type(where_clause).__name__))
-                value = where_clause.right.value
-                # Note, in some cases, for GreaterThan, this will have an extra entry, but that will be filtered during where phase
-                return main_table.scan(start=value)
-            elif type(where_clause) in (
-                    LessThan, LessThanEquals) and isinstance(where_clause.right,
-                                                             Literal):
-                logging.debug('Can use primary key index for where {}'.format(
-                    type(where_clause).__name__))
-                value = where_clause.right.value
-                toRet = iter(main_table.scan(stop=value))
-                if type(where_clause) == LessThanEquals:
-                    row = main_table.get_row_by_pk(value)
-                    if row is not None:
-                        second_it = itertools.repeat(row, 1)
-                        return itertools.chain(second_it, toRet)
-                return toRet
-        return main_table.scan()
+        return iter(access_path(main_table, where_clause))
 
     def _update(self, update: Update):
         table = self._get_table(update.table)
         rows = self._get_rows(table, update.where)
-        rows = self._filter(rows, update.where, table.column_references)
-        columns = [ColumnReference(table.name, col.name, None) for col in
-                   table.column_defs]
+        # Collect first, updates move rows around in the indexes being read
+        rows = list(self._filter(rows, update.where, table.column_references))
+        columns = table.column_references
+        # Compiled once, each column either keeps its value or is set
+        setters = []
+        for i, col_ref in enumerate(columns):
+            if col_ref in update.columns:
+                setters.append(compile_expression(update.columns[col_ref],
+                                                  columns))
+            else:
+                setters.append(itemgetter(i))
+        names = [col_def.name for col_def in table.column_defs]
         count = 0
         for row in rows:
-            row_data = {}
-            for i, col_def in enumerate(table.column_defs):
-                col_ref = ColumnReference(table.name, col_def.name, None)
-                if col_ref in update.columns:
-                    context = Context(row, columns)
-                    new_value = context.evaluate(update.columns[col_ref])
-                    row_data[col_def.name] = new_value
-                else:
-                    row_data[col_def.name] = row[i]
-            table.insert(row_data)
+            table.insert({name: setter(row)
+                          for name, setter in zip(names, setters)})
             count += 1
         return count
 
@@ -378,6 +720,16 @@ class Database:
         #     count += 1
         # return count
 
+    def _delete(self, delete: Delete):
+        table = self._get_table(delete.table)
+        rows = self._get_rows(table, delete.where)
+        rows = self._filter(rows, delete.where, table.column_references)
+        # Collect first, the index cannot change under the scan
+        pks = [row[0] for row in rows]
+        for pk in pks:
+            table.delete_by_pk(pk)
+        return len(pks)
+
 
 if __name__ == '__main__':
     db = Database()
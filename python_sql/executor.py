@@ -0,0 +1,411 @@
+import heapq
+import itertools
+import time
+from abc import ABC, abstractmethod
+from operator import itemgetter
+
+from python_sql.join import hash_join, grace_hash_join, merge_join, \
+    plan_hash_join
+from python_sql.logic.compiler import compile_predicate
+from python_sql.tracing import totals
+
+
+class Row():
+
+    def __init__(self, data, columns):
+        # columns: List[str], the reference names of the values, shared by
+        # every row of a result
+        self.data = data if isinstance(data, tuple) else tuple(data)
+        self.columns = columns
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            index = key
+        else:
+            index = self.columns.index(key)
+        return self.data[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            return self.data == other.data and self.columns == other.columns
+        elif isinstance(other, tuple):
+            return self.data == other
+        else:
+            raise Exception('Can only compare Row or tuple')
+
+
+class Operator(ABC):
+    """A step of a query plan.
+
+    Operators are iterables of row tuples whose values are named by columns.
+    Iterating one pulls rows through its children a row at a time, so a
+    consumer that stops early stops every scan below it too. Each iteration
+    starts over, so a plan can be run more than once.
+    """
+    columns = []
+    # Upper bound on the number of rows produced
+    estimated_rows = 0
+    # Maps columns the rows are in ascending order of to the
+    # (start, stop, include_start, include_stop) range of their values
+    ordering = {}
+    # Names of the attributes holding the operators this one reads from
+    inputs = ()
+
+    @abstractmethod
+    def __iter__(self):
+        pass
+
+    @property
+    def children(self):
+        return [getattr(self, name) for name in self.inputs]
+
+    def describe(self):
+        """What this operator does, for EXPLAIN"""
+        return type(self).__name__
+
+
+class Scan(Operator):
+    """Rows of a table from an access path, rows being a function returning
+    a fresh iterator of them and access a description of the path, or None
+    for a full scan. The rows hold the values of columns if given, otherwise
+    of every column of the table."""
+
+    def __init__(self, table, rows, estimated_rows, ordering=None,
+                 access=None, columns=None):
+        self.table = table
+        self.rows = rows
+        self.columns = table.column_references if columns is None else \
+            columns
+        self.estimated_rows = estimated_rows
+        self.ordering = ordering or {}
+        self.access = access
+
+    def __iter__(self):
+        return iter(self.rows())
+
+    def describe(self):
+        if self.access is None:
+            return 'Scan {}'.format(self.table.name)
+        return 'Scan {} using {}'.format(self.table.name, self.access)
+
+
+class Filter(Operator):
+    inputs = ('child',)
+
+    def __init__(self, child: Operator, where, estimated_rows=None):
+        self.child = child
+        self.where = where
+        self.predicate = compile_predicate(where, child.columns)
+        self.columns = child.columns
+        self.estimated_rows = child.estimated_rows \
+            if estimated_rows is None else estimated_rows
+        self.ordering = child.ordering
+
+    def __iter__(self):
+        return filter(self.predicate, self.child)
+
+    def describe(self):
+        return 'Filter {}'.format(self.where)
+
+
+class _Join(Operator):
+    inputs = ('child',)
+
+    def __init__(self, child: Operator, right_columns, left_column,
+                 right_column):
+        self.child = child
+        self.left_column = left_column
+        self.right_column = right_column
+        self.columns = child.columns + right_columns
+        self.estimated_rows = child.estimated_rows
+        self.ordering = self._keep_ordering()
+
+    def _keep_ordering(self):
+        """Ordering for joins emitting rows in the order of the left rows,
+        where joined values equal the ordered left ones"""
+        ordering = dict(self.child.ordering)
+        if self.left_column in ordering:
+            ordering[self.right_column] = ordering[self.left_column]
+        return ordering
+
+    @property
+    def left_index(self):
+        return self.child.columns.index(self.left_column)
+
+    def _condition(self):
+        return '{} = {}'.format(self.left_column, self.right_column)
+
+
+class _TableJoin(_Join):
+    """Join reading the right rows straight from right_table, keeping only
+    those matching right_filter if given"""
+
+    def __init__(self, child: Operator, right_table, left_column,
+                 right_column, right_filter=None):
+        super().__init__(child, right_table.column_references, left_column,
+                         right_column)
+        self.right_table = right_table
+        self.right_filter = right_filter
+        self.right_predicate = None
+        if right_filter is not None:
+            self.right_predicate = compile_predicate(
+                right_filter, right_table.column_references)
+
+    def _matches(self, right_rows):
+        if self.right_predicate is None:
+            return right_rows
+        return filter(self.right_predicate, right_rows)
+
+    def _describe(self, name, using):
+        text = '{} {} on {} using {}'.format(name, self.right_table.name,
+                                             self._condition(), using)
+        if self.right_filter is not None:
+            text += ' filter {}'.format(self.right_filter)
+        return text
+
+
+class CrossJoin(Operator):
+    inputs = ('child', 'right')
+
+    def __init__(self, child: Operator, right: Operator):
+        self.child = child
+        self.right = right
+        self.columns = child.columns + right.columns
+        self.estimated_rows = child.estimated_rows * right.estimated_rows
+        self.ordering = child.ordering
+
+    def __iter__(self):
+        right_rows = None
+        for row in self.child:
+            if right_rows is None:
+                # Read once, on the first left row
+                right_rows = list(self.right)
+            for right_row in right_rows:
+                yield row + right_row
+
+    def describe(self):
+        return 'Cross join'
+
+
+class IndexJoin(_TableJoin):
+    """Joins each row to the right rows found by looking its value up in the
+    right table's primary key, or in index if given"""
+
+    def __init__(self, child: Operator, right_table, left_column,
+                 right_column, index=None, right_filter=None):
+        super().__init__(child, right_table, left_column, right_column,
+                         right_filter)
+        self.index = index
+
+    def _lookup(self, value):
+        if self.index is None:
+            right_row = self.right_table.get_row_by_pk(value)
+            return () if right_row is None else (right_row,)
+        return self.right_table.read_rows(self.index.lookup(value))
+
+    def __iter__(self):
+        left_index = self.left_index
+        lookup = self._lookup
+        matches = self._matches
+        for row in self.child:
+            for right_row in matches(lookup(row[left_index])):
+                yield row + right_row
+
+    def describe(self):
+        using = 'primary key' if self.index is None else \
+            'index {}'.format(self.index.name)
+        return self._describe('Index join', using)
+
+
+class MergeJoin(_TableJoin):
+    """Joins rows in ascending order of left_column to the right table on
+    its primary key, walking the primary key leaves alongside them and only
+    reading the right rows that match"""
+
+    def __iter__(self):
+        left_index = self.left_index
+        rows = iter(self.child)
+        first = next(rows, None)
+        if first is None:
+            return
+        rows = itertools.chain([first], rows)
+        entries = self.right_table.pk_range(first[left_index])
+        get_row_data = self.right_table.get_row_data
+        matches = self._matches
+        for row in merge_join(rows, left_index, entries, 0):
+            # row ends with the matching (pk, data_index) entry
+            for right_row in matches((get_row_data(row[-1]),)):
+                yield row[:-2] + right_row
+
+    def describe(self):
+        return self._describe('Merge join', 'primary key')
+
+
+class HashJoin(_Join):
+    """Joins the rows of child to those of the right operator, building a
+    hash table on whichever is estimated to be smaller"""
+    inputs = ('child', 'right')
+
+    def __init__(self, child: Operator, right: Operator, left_column,
+                 right_column, memory_limit):
+        super().__init__(child, right.columns, left_column, right_column)
+        self.right = right
+        self.memory_limit = memory_limit
+        self.build_left, self.partitions = plan_hash_join(
+            child.estimated_rows, right.estimated_rows, memory_limit)
+        if self.build_left or self.partitions is not None:
+            self.ordering = {}
+
+    def __iter__(self):
+        right_index = self.right.columns.index(self.right_column)
+        if self.partitions is None:
+            return hash_join(self.child, self.left_index, self.right,
+                             right_index, self.build_left)
+        return grace_hash_join(self.child, self.left_index, self.right,
+                               right_index, self.partitions, self.build_left,
+                               self.memory_limit)
+
+    def describe(self):
+        text = 'Hash join on {} building on the {} rows'.format(
+            self._condition(), 'left' if self.build_left else 'right')
+        if self.partitions is not None:
+            text += ' in {} partitions'.format(self.partitions)
+        return text
+
+
+class Sort(Operator):
+    """Sorts all rows, or keeps only the first limit of them in a heap"""
+    inputs = ('child',)
+
+    def __init__(self, child: Operator, order_by, limit=None):
+        self.child = child
+        self.order_by = order_by
+        self.limit = limit
+        self.columns = child.columns
+        self.estimated_rows = child.estimated_rows if limit is None else \
+            min(limit, child.estimated_rows)
+
+    def __iter__(self):
+        key = itemgetter(*[self.columns.index(c)
+                           for c in self.order_by.columns])
+        reverse = self.order_by.reverse
+        if self.limit is None:
+            return iter(sorted(self.child, key=key, reverse=reverse))
+        pick = heapq.nlargest if reverse else heapq.nsmallest
+        return iter(pick(self.limit, self.child, key=key))
+
+    def describe(self):
+        text = 'Sort by {}{}'.format(
+            ', '.join(map(str, self.order_by.columns)),
+            ' DESC' if self.order_by.reverse else '')
+        if self.limit is not None:
+            text += ' keeping the first {}'.format(self.limit)
+        return text
+
+
+class Limit(Operator):
+    inputs = ('child',)
+
+    def __init__(self, child: Operator, limit=None, offset=0):
+        self.child = child
+        self.limit = limit
+        self.offset = offset
+        self.columns = child.columns
+        self.estimated_rows = max(0, child.estimated_rows - offset)
+        if limit is not None:
+            self.estimated_rows = min(limit, self.estimated_rows)
+        self.ordering = child.ordering
+
+    def __iter__(self):
+        stop = None if self.limit is None else self.offset + self.limit
+        return itertools.islice(self.child, self.offset, stop)
+
+    def describe(self):
+        text = 'Limit'
+        if self.limit is not None:
+            text += ' {}'.format(self.limit)
+        if self.offset:
+            text += ' offset {}'.format(self.offset)
+        return text
+
+
+class Project(Operator):
+    """Keeps the selected columns, in the order they were selected"""
+    inputs = ('child',)
+
+    def __init__(self, child: Operator, columns):
+        self.child = child
+        self.columns = columns
+        self.estimated_rows = child.estimated_rows
+
+    def __iter__(self):
+        indexes = [self.child.columns.index(c) for c in self.columns]
+        columns = [c.reference_name for c in self.columns]
+        for row in self.child:
+            yield Row(tuple(row[i] for i in indexes), columns)
+
+    def describe(self):
+        return 'Project {}'.format(', '.join(map(str, self.columns)))
+
+
+class Profiled(Operator):
+    """Passes on the rows of operator, measuring how many there are and the
+    time, index lookups and storage reads taken to produce them, including
+    those of the operators below. Lookups and reads are only counted while
+    tracing.instrumented."""
+
+    def __init__(self, operator: Operator):
+        self.operator = operator
+        self.columns = operator.columns
+        self.estimated_rows = operator.estimated_rows
+        self.ordering = operator.ordering
+        self.rows = 0
+        self.seconds = 0.0
+        self.lookups = 0
+        self.reads = 0
+
+    def _measure(self, call):
+        lookups, reads = totals.index_probes, totals.rows_scanned
+        start = time.perf_counter()
+        try:
+            return call()
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.lookups += totals.index_probes - lookups
+            self.reads += totals.rows_scanned - reads
+
+    def __iter__(self):
+        rows = self._measure(lambda: iter(self.operator))
+        end = object()
+        while True:
+            row = self._measure(lambda: next(rows, end))
+            if row is end:
+                return
+            self.rows += 1
+            yield row
+
+
+def profile(operator: Operator):
+    """operator with it and every operator below it wrapped in Profiled"""
+    for name in operator.inputs:
+        setattr(operator, name, profile(getattr(operator, name)))
+    return Profiled(operator)
+
+
+def explain(operator: Operator, depth=0):
+    """Lines describing the tree of operators, with what each of them did
+    if profiled"""
+    measured = None
+    if isinstance(operator, Profiled):
+        measured, operator = operator, operator.operator
+    line = '{}{} (estimated rows={})'.format('  ' * depth,
+                                             operator.describe(),
+                                             operator.estimated_rows)
+    if measured is not None:
+        line += ' (actual rows={} time={:.3f}ms lookups={} reads={})'.format(
+            measured.rows, measured.seconds * 1000, measured.lookups,
+            measured.reads)
+    lines = [line]
+    for child in operator.children:
+        lines.extend(explain(child, depth + 1))
+    return lines
@@ -0,0 +1,181 @@
+import itertools
+from bisect import insort
+
+from python_sql.b_tree import BTree, DEFAULT_DEGREE
+from python_sql.logic import ColumnDefinition
+
+
+class SecondaryIndex:
+    """Non-unique index on one column of a table.
+
+    Each key of the B+ tree is a column value and maps to the sorted list of
+    data indexes of the rows holding it. NULLs are not indexed, as no
+    comparison can match them.
+    """
+
+    def __init__(self, name, column_def: ColumnDefinition, column_index,
+                 degree=DEFAULT_DEGREE):
+        self.name = name
+        self.column_def = column_def
+        self.column_index = column_index
+        self.degree = degree
+        self.tree = BTree(degree)
+
+    @property
+    def column(self):
+        return self.column_def.name
+
+    def build(self, rows):
+        """Replace the contents with (data_index, row) pairs in bulk"""
+        pairs = sorted((row[self.column_index], data_index)
+                       for data_index, row in rows
+                       if row[self.column_index] is not None)
+        postings = {}
+        for value, data_index in pairs:
+            postings.setdefault(value, []).append(data_index)
+        self.tree = BTree.from_sorted(postings.items(), self.degree)
+
+    def add(self, value, data_index):
+        if value is None:
+            return
+        postings = self.tree.search(value)
+        if postings is None:
+            self.tree[value] = [data_index]
+        else:
+            insort(postings, data_index)
+
+    def add_many(self, pairs):
+        """Add (value, data_index) pairs in bulk, the values not held yet
+        merged into the tree as one sorted batch"""
+        postings = {}
+        for value, data_index in sorted(pair for pair in pairs
+                                        if pair[0] is not None):
+            postings.setdefault(value, []).append(data_index)
+        for value, existing in self.tree.search_many(list(postings)):
+            existing.extend(postings.pop(value))
+            existing.sort()
+        self.tree.update_sorted(postings.items())
+
+    def check_many(self, values):
+        """Raise if adding values would break a constraint, or if they
+        cannot be ordered together with the values already held"""
+        values = [value for value in values if value is not None]
+        # One held value is enough to compare the batch with the rest
+        values.extend(itertools.islice(self.tree, 1))
+        values.sort()
+
+    def remove(self, value, data_index):
+        if value is None:
+            return
+        postings = self.tree[value]
+        postings.remove(data_index)
+        if not postings:
+            del self.tree[value]
+
+    def lookup(self, value):
+        """Data indexes of the rows equal to value"""
+        if value is None:
+            return []
+        postings = self.tree.search(value)
+        return list(postings) if postings is not None else []
+
+    def lookup_many(self, values):
+        """Sorted data indexes of the rows equal to any of values, which
+        must be sorted and distinct, in a single walk of the leaves"""
+        data_indexes = []
+        for _, postings in self.tree.search_many(values):
+            data_indexes.extend(postings)
+        data_indexes.sort()
+        return data_indexes
+
+    def count(self, value):
+        """Number of rows equal to value"""
+        postings = None if value is None else self.tree.search(value)
+        return len(postings) if postings is not None else 0
+
+    def range(self, start=None, stop=None, include_start=True,
+              include_stop=False):
+        """Data indexes of the rows between start and stop, in value order"""
+        for _, postings in self.tree.range(start, stop, include_start,
+                                           include_stop):
+            yield from postings
+
+    def __repr__(self):
+        return 'INDEX {} ON ({})'.format(self.name, self.column)
+
+
+class UniqueIndex(SecondaryIndex):
+    """Index on a UNIQUE column, each value maps to a single data index"""
+
+    def __init__(self, name, column_def: ColumnDefinition, column_index,
+                 degree=DEFAULT_DEGREE):
+        super().__init__(name, column_def, column_index, degree)
+        self.tree = BTree(degree, value_typecode='q')
+
+    def build(self, rows):
+        pairs = sorted((row[self.column_index], data_index)
+                       for data_index, row in rows
+                       if row[self.column_index] is not None)
+        for (value, _), (next_value, _) in zip(pairs, pairs[1:]):
+            if value == next_value:
+                self._raise_duplicate(value)
+        self.tree = BTree.from_sorted(pairs, self.degree, value_typecode='q')
+
+    def check(self, value, data_index=None):
+        """Raise if value is held by any row other than data_index"""
+        if value is None:
+            return
+        existing = self.tree.search(value)
+        if existing is not None and existing != data_index:
+            self._raise_duplicate(value)
+
+    def _raise_duplicate(self, value):
+        raise Exception('Cannot insert duplicate value {} for unique '
+                        'column {}'.format(value, self.column))
+
+    def add(self, value, data_index):
+        if value is None:
+            return
+        self.check(value, data_index)
+        self.tree[value] = data_index
+
+    def add_many(self, pairs):
+        """Add (value, data_index) pairs in bulk, which check_many must have
+        accepted the values of"""
+        self.tree.update_sorted(sorted(pair for pair in pairs
+                                       if pair[0] is not None))
+
+    def check_many(self, values):
+        values = sorted(value for value in values if value is not None)
+        for value, next_value in zip(values, values[1:]):
+            if value == next_value:
+                self._raise_duplicate(value)
+        for value, _ in self.tree.search_many(values):
+            self._raise_duplicate(value)
+
+    def remove(self, value, data_index):
+        if value is None:
+            return
+        del self.tree[value]
+
+    def lookup(self, value):
+        if value is None:
+            return []
+        data_index = self.tree.search(value)
+        return [data_index] if data_index is not None else []
+
+    def lookup_many(self, values):
+        return sorted(data_index for _, data_index in
+                      self.tree.search_many(values))
+
+    def count(self, value):
+        return int(value is not None and value in self.tree)
+
+    def range(self, start=None, stop=None, include_start=True,
+              include_stop=False):
+        for _, data_index in self.tree.range(start, stop, include_start,
+                                             include_stop):
+            yield data_index
+
+    def __repr__(self):
+        return 'UNIQUE INDEX {} ON ({})'.format(self.name, self.column)
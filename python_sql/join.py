@@ -0,0 +1,174 @@
+import pickle
+import tempfile
+
+# Rows held in memory for the build side of a hash join before it falls back
+# to partitioning both inputs to disk
+DEFAULT_JOIN_MEMORY_LIMIT = 1000000
+# Rows buffered per partition before they are pickled to its file
+SPILL_BATCH_SIZE = 1000
+# Most temporary files a grace hash join opens per input at once; partitions
+# still over the memory limit are partitioned again rather than widening this
+MAX_PARTITIONS = 64
+# Repartitioning passes before a partition is joined in memory regardless,
+# as one heavily repeated key can never be split
+MAX_PARTITION_DEPTH = 3
+
+
+def _build(rows, key):
+    table = {}
+    for row in rows:
+        value = row[key]
+        matches = table.get(value)
+        if matches is None:
+            table[value] = [row]
+        else:
+            matches.append(row)
+    return table
+
+
+def hash_join(left_rows, left_key, right_rows, right_key, build_left=False):
+    """Inner equi-join of left_rows and right_rows on the values at positions
+    left_key and right_key, yielding left + right rows.
+
+    The build side (right unless build_left) is read once into a hash table
+    and the other side streams past it, so output follows the order of the
+    probe side.
+    """
+    if build_left:
+        table = _build(left_rows, left_key)
+        for right in right_rows:
+            matches = table.get(right[right_key])
+            if matches is not None:
+                for left in matches:
+                    yield left + right
+    else:
+        table = _build(right_rows, right_key)
+        for left in left_rows:
+            matches = table.get(left[left_key])
+            if matches is not None:
+                for right in matches:
+                    yield left + right
+
+
+def _partition_of(value, depth, partitions):
+    # Each pass hashes differently so a repartitioned file actually splits
+    if depth:
+        value = (depth, value)
+    return hash(value) % partitions
+
+
+def _partition(rows, key, partitions, depth, files):
+    """Spill rows to one temporary file per hash partition of their key,
+    appending the files to files so the caller closes them even if this
+    fails partway, and return the number of rows in each"""
+    for _ in range(partitions):
+        files.append(tempfile.TemporaryFile())
+    buffers = [[] for _ in range(partitions)]
+    counts = [0] * partitions
+    for row in rows:
+        partition = _partition_of(row[key], depth, partitions)
+        counts[partition] += 1
+        buffer = buffers[partition]
+        buffer.append(row)
+        if len(buffer) >= SPILL_BATCH_SIZE:
+            pickle.dump(buffer, files[partition], pickle.HIGHEST_PROTOCOL)
+            buffer.clear()
+    for file, buffer in zip(files, buffers):
+        if buffer:
+            pickle.dump(buffer, file, pickle.HIGHEST_PROTOCOL)
+        file.seek(0)
+    return counts
+
+
+def _read_partition(file):
+    while True:
+        try:
+            batch = pickle.load(file)
+        except EOFError:
+            return
+        yield from batch
+
+
+def _partition_count(build_size, memory_limit):
+    # Enough partitions for each build partition to fit in half the limit,
+    # leaving room for skew, up to MAX_PARTITIONS
+    return min(-(-build_size * 2 // memory_limit), MAX_PARTITIONS)
+
+
+def grace_hash_join(left_rows, left_key, right_rows, right_key, partitions,
+                    build_left=False, memory_limit=None):
+    """hash_join for inputs too large to hold in memory.
+
+    Both inputs are hash partitioned on their join key into temporary
+    files, then each pair of matching partitions is joined in memory. A
+    build partition with more than memory_limit rows is itself partitioned
+    again. Output is grouped by partition rather than following either
+    input's order.
+    """
+    return _grace_hash_join(left_rows, left_key, right_rows, right_key,
+                            partitions, build_left, memory_limit, 0)
+
+
+def _grace_hash_join(left_rows, left_key, right_rows, right_key, partitions,
+                     build_left, memory_limit, depth):
+    left_files = []
+    right_files = []
+    try:
+        left_counts = _partition(left_rows, left_key, partitions, depth,
+                                 left_files)
+        right_counts = _partition(right_rows, right_key, partitions, depth,
+                                  right_files)
+        build_counts = left_counts if build_left else right_counts
+        for left_file, right_file, build_size in zip(left_files, right_files,
+                                                     build_counts):
+            left_partition = _read_partition(left_file)
+            right_partition = _read_partition(right_file)
+            # Partitioning buffers SPILL_BATCH_SIZE rows per file anyway, so
+            # a partition no bigger than that is not worth splitting further
+            if memory_limit is not None and \
+                    build_size > max(memory_limit, SPILL_BATCH_SIZE) and \
+                    depth < MAX_PARTITION_DEPTH:
+                yield from _grace_hash_join(
+                    left_partition, left_key, right_partition, right_key,
+                    _partition_count(build_size, memory_limit), build_left,
+                    memory_limit, depth + 1)
+            else:
+                yield from hash_join(left_partition, left_key,
+                                     right_partition, right_key, build_left)
+    finally:
+        for file in left_files + right_files:
+            file.close()
+
+
+def merge_join(left_rows, left_key, right_rows, right_key):
+    """Inner equi-join of two inputs already in ascending order of their
+    join keys, walking both in lockstep and yielding left + right rows in
+    the order of the left input."""
+    right_rows = iter(right_rows)
+    right = next(right_rows, None)
+    group = []
+    group_value = None
+    for left in left_rows:
+        value = left[left_key]
+        if not group or value != group_value:
+            while right is not None and right[right_key] < value:
+                right = next(right_rows, None)
+            group = []
+            group_value = value
+            while right is not None and right[right_key] == value:
+                group.append(right)
+                right = next(right_rows, None)
+        for match in group:
+            yield left + match
+
+
+def plan_hash_join(left_size, right_size,
+                   memory_limit=DEFAULT_JOIN_MEMORY_LIMIT):
+    """(build_left, partitions) for a hash join building on the smaller
+    input, with partitions None when the build side fits in memory_limit"""
+    build_left = left_size < right_size
+    build_size = min(left_size, right_size)
+    if build_size <= memory_limit:
+        return build_left, None
+    return build_left, _partition_count(build_size, memory_limit)
+
@@ -50,6 +50,61 @@ class FalseOp(Operation, Literal):
         return False
 
 
+def conjuncts(op):
+    """Flatten the top level And nodes of op into a list of operations"""
+    if type(op) == And:
+        return conjuncts(op.left) + conjuncts(op.right)
+    return [op]
+
+
+def conjoin(ops):
+    """Inverse of conjuncts, an And tree of ops or TrueOp if there are none"""
+    if not ops:
+        return TrueOp()
+    op = ops[0]
+    for right in ops[1:]:
+        op = And(op, right)
+    return op
+
+
+def walk(op):
+    """op and every operation and operand beneath it, parents first"""
+    yield op
+    if type(op) in (And, Or):
+        yield from walk(op.left)
+        yield from walk(op.right)
+    elif type(op) == Not:
+        yield from walk(op.operation)
+    elif type(op) == InFunc:
+        yield from walk(op.left)
+        for value in op.values:
+            yield from walk(value)
+    elif isinstance(op, Terminal):
+        yield from walk(op.left)
+        yield from walk(op.right)
+
+
+def tables_used(op):
+    """Names of the tables whose columns op reads"""
+    return {column.table for column in columns_read(op)}
+
+
+def columns_read(op):
+    """ColumnReferences op reads"""
+    return {node for node in walk(op) if isinstance(node, ColumnReference)}
+
+
+def is_constant_literal(op):
+    """Whether op is a literal whose value is known before the statement
+    runs, unlike a parameter"""
+    return isinstance(op, Literal) and not isinstance(op, Parameter)
+
+
+def uses_parameters(op):
+    """Whether op reads the value bound to a parameter"""
+    return any(isinstance(node, Parameter) for node in walk(op))
+
+
 def collect_values(op):
     if type(op) == Equals:
         return [op.right]
@@ -189,12 +244,11 @@ class Equals(Operation, Terminal):
     def simplify(self):
         self.left = self.left.simplify()
         self.right = self.right.simplify()
-        if issubclass(type(self.left), Literal) and issubclass(type(self.right),
-                                                               Literal):
+        if is_constant_literal(self.left) and is_constant_literal(self.right):
             if self.left.value == self.right.value:
-                return TrueOp
+                return TrueOp()
             else:
-                return FalseOp
+                return FalseOp()
         # if type(self.left) == ColumnReference and type(self.right) == ColumnReference and self.left.table!=self.right.table:
         #     raise Exception('Join in where clauses are not supported: {}'.format(self))
         if issubclass(type(self.left), Literal):
@@ -225,12 +279,11 @@ class NotEquals(Operation, Terminal):
     def simplify(self):
         self.left = self.left.simplify()
         self.right = self.right.simplify()
-        if issubclass(type(self.left), Literal) and issubclass(type(self.right),
-                                                               Literal):
+        if is_constant_literal(self.left) and is_constant_literal(self.right):
             if self.left.value != self.right.value:
-                return TrueOp
+                return TrueOp()
             else:
-                return FalseOp
+                return FalseOp()
         return self
 
     def evaluate(self, context):
@@ -256,15 +309,14 @@ class GreaterThan(Operation, Terminal):
     def simplify(self):
         self.left = self.left.simplify()
         self.right = self.right.simplify()
-        if issubclass(type(self.left), Literal) and issubclass(type(self.right),
-                                                               Literal):
+        if is_constant_literal(self.left) and is_constant_literal(self.right):
             if self.left.value > self.right.value:
-                return TrueOp
+                return TrueOp()
             else:
-                return FalseOp
+                return FalseOp()
         if issubclass(type(self.left), Literal):
-            # Left column should be non-literal
-            self.left, self.right = self.right, self.left
+            # Left column should be non-literal, which flips the comparison
+            return LessThan(self.right, self.left)
         return self
 
     def evaluate(self, context):
@@ -290,15 +342,14 @@ class GreaterThanEquals(Operation, Terminal):
     def simplify(self):
         self.left = self.left.simplify()
         self.right = self.right.simplify()
-        if issubclass(type(self.left), Literal) and issubclass(type(self.right),
-                                                               Literal):
+        if is_constant_literal(self.left) and is_constant_literal(self.right):
             if self.left.value >= self.right.value:
-                return TrueOp
+                return TrueOp()
             else:
-                return FalseOp
+                return FalseOp()
         if issubclass(type(self.left), Literal):
-            # Left column should be non-literal
-            self.left, self.right = self.right, self.left
+            # Left column should be non-literal, which flips the comparison
+            return LessThanEquals(self.right, self.left)
         return self
 
     def evaluate(self, context):
@@ -324,15 +375,14 @@ class LessThan(Operation, Terminal):
     def simplify(self):
         self.left = self.left.simplify()
         self.right = self.right.simplify()
-        if issubclass(type(self.left), Literal) and issubclass(type(self.right),
-                                                               Literal):
+        if is_constant_literal(self.left) and is_constant_literal(self.right):
             if self.left.value < self.right.value:
-                return TrueOp
+                return TrueOp()
             else:
-                return FalseOp
+                return FalseOp()
         if issubclass(type(self.left), Literal):
-            # Left column should be non-literal
-            self.left, self.right = self.right, self.left
+            # Left column should be non-literal, which flips the comparison
+            return GreaterThan(self.right, self.left)
         return self
 
     def evaluate(self, context):
@@ -358,15 +408,14 @@ class LessThanEquals(Operation, Terminal):
     def simplify(self):
         self.left = self.left.simplify()
         self.right = self.right.simplify()
-        if issubclass(type(self.left), Literal) and issubclass(type(self.right),
-                                                               Literal):
+        if is_constant_literal(self.left) and is_constant_literal(self.right):
             if self.left.value <= self.right.value:
-                return TrueOp
+                return TrueOp()
             else:
-                return FalseOp
+                return FalseOp()
         if issubclass(type(self.left), Literal):
-            # Left column should be non-literal
-            self.left, self.right = self.right, self.left
+            # Left column should be non-literal, which flips the comparison
+            return GreaterThanEquals(self.right, self.left)
         return self
 
     def evaluate(self, context):
@@ -391,6 +440,22 @@ class StringLiteral(Literal):
         return "'{}'".format(self.value)
 
 
+class Parameter(Literal):
+    """A ? placeholder, whose value is the one at index of bindings, set
+    each time its prepared statement runs"""
+
+    def __init__(self, index: int, bindings: List):
+        self.index = index
+        self.bindings = bindings
+
+    @property
+    def value(self):
+        return self.bindings[self.index]
+
+    def __repr__(self):
+        return '?'
+
+
 class ColumnReference(
     namedtuple('ColumnReference', ['table', 'column', 'as_name'])):
     # table: str
@@ -491,28 +556,36 @@ class Delete(namedtuple('Delete', ['table', 'where'])):
 
 
 class Select(
-    namedtuple('Select', ['columns', 'from_clause', 'where', 'order_by'])):
+    namedtuple('Select', ['columns', 'from_clause', 'where', 'order_by',
+                          'limit', 'offset'], defaults=(None, None))):
     # columns: List[ColumnReference]
     # from_clause: From
     # where: Operation = TrueOp()
     # order_by: OrderBy = OrderBy()
+    # limit: int = None
+    # offset: int = None
 
     def __repr__(self):
         s = 'SELECT {} {}'.format(','.join(map(str, self.columns)),
                                   self.from_clause)
-        if self.where:
+        if self.where and not isinstance(self.where, TrueOp):
             s += ' WHERE {}'.format(self.where)
-        s += str(self.order_by)
+        if self.order_by:
+            s += str(self.order_by)
+        if self.limit is not None:
+            s += ' LIMIT {}'.format(self.limit)
+        if self.offset:
+            s += ' OFFSET {}'.format(self.offset)
         return s
 
 
-class Insert(namedtuple('Insert', ['table', 'values'])):
+class Insert(namedtuple('Insert', ['table', 'rows'])):
     # table: TableReference
-    # values: List
+    # rows: List[List], the values of each row inserted
 
     def __repr__(self):
-        return 'INSERT INTO {} VALUES({})'.format(self.table, ', '.join(
-            map(str, self.values)))
+        return 'INSERT INTO {} VALUES{}'.format(self.table, ', '.join(
+            '({})'.format(', '.join(map(str, row))) for row in self.rows))
 
 
 class CreateTable(namedtuple('CreateTable', ['table', 'columns'])):
@@ -521,6 +594,63 @@ class CreateTable(namedtuple('CreateTable', ['table', 'columns'])):
     pass
 
 
+class CreateIndex(namedtuple('CreateIndex', ['name', 'table', 'column'])):
+    # name: str
+    # table: TableReference
+    # column: str
+
+    def __repr__(self):
+        return 'CREATE INDEX {} ON {}({})'.format(self.name, self.table,
+                                                 self.column)
+
+
+class Analyze(namedtuple('Analyze', ['table'])):
+    # table: TableReference = None, for every table
+
+    def __repr__(self):
+        if self.table is None:
+            return 'ANALYZE'
+        return 'ANALYZE {}'.format(self.table)
+
+
+class CopyFrom(namedtuple('CopyFrom', ['table', 'path', 'format',
+                                       'header'])):
+    # table: TableReference
+    # path: str, of the file loaded
+    # format: str = None, 'csv', 'tsv' or 'jsonl', otherwise told by the
+    #   extension of path
+    # header: bool, the first line of a CSV or TSV file names its fields
+
+    def __repr__(self):
+        return "COPY {} FROM '{}'{}{}".format(
+            self.table, self.path,
+            '' if self.format is None else ' FORMAT {}'.format(self.format),
+            ' HEADER' if self.header else '')
+
+
+class CopyTo(namedtuple('CopyTo', ['select', 'path', 'format', 'header'])):
+    # select: Select, whose rows are written
+    # path: str, of the file written
+    # format: str = None, 'csv', 'tsv' or 'jsonl', otherwise told by the
+    #   extension of path
+    # header: bool, write a first line naming the fields of a CSV or TSV file
+
+    def __repr__(self):
+        return "COPY ({}) TO '{}'{}{}".format(
+            self.select, self.path,
+            '' if self.format is None else ' FORMAT {}'.format(self.format),
+            ' HEADER' if self.header else '')
+
+
+class Explain(namedtuple('Explain', ['select', 'analyze'])):
+    # select: Select
+    # analyze: bool, run the query and report what each operator did
+
+    def __repr__(self):
+        return 'EXPLAIN {}{}'.format('ANALYZE ' if self.analyze else '',
+                                     self.select)
+
+
 class Context:
     def __init__(self, row, columns: List[ColumnReference]):
         self.values = dict(zip(columns, row))
@@ -0,0 +1,118 @@
+"""Compiles Operation trees into Python functions of a row tuple.
+
+Evaluating a tree walks every node and builds a Context per row. Compiling
+generates the source of a single lambda instead, reading each column
+straight from its position in the row, and folds every part of the tree
+that reads no column or parameter down to a constant.
+"""
+from python_sql.logic import *
+
+COMPARISONS = {Equals: '==',
+               NotEquals: '!=',
+               GreaterThan: '>',
+               GreaterThanEquals: '>=',
+               LessThan: '<',
+               LessThanEquals: '<='}
+
+
+class _Compiler:
+    def __init__(self, columns):
+        self.positions = {column: i for i, column in
+                          reversed(list(enumerate(columns)))}
+        self.constants = {}
+
+    def constant(self, value):
+        name = '_c{}'.format(len(self.constants))
+        self.constants[name] = value
+        return name, True
+
+    def fold(self, source, is_constant):
+        """A constant for source when it reads no column"""
+        if not is_constant or source in self.constants:
+            return source, is_constant
+        return self.constant(eval(source, {}, self.constants))
+
+    def value_of(self, source):
+        return self.constants[source]
+
+    def compile(self, op):
+        """(source, is_constant) of the expression for op"""
+        if op is TrueOp or isinstance(op, TrueOp):
+            return self.constant(True)
+        elif op is FalseOp or isinstance(op, FalseOp):
+            return self.constant(False)
+        elif isinstance(op, ColumnReference):
+            if op not in self.positions:
+                raise Exception('Value not available')
+            return 'row[{}]'.format(self.positions[op]), False
+        elif isinstance(op, Parameter):
+            # Read as the row is, the value bound changes between runs
+            bindings, _ = self.constant(op.bindings)
+            return '{}[{}]'.format(bindings, op.index), False
+        elif isinstance(op, Literal):
+            return self.constant(op.value)
+        elif type(op) in (And, Or):
+            return self._compile_logical(op)
+        elif type(op) == Not:
+            source, is_constant = self.compile(op.operation)
+            return self.fold('(not {})'.format(source), is_constant)
+        elif type(op) == InFunc:
+            left, left_constant = self.compile(op.left)
+            if all(is_constant_literal(value) for value in op.values):
+                try:
+                    # Hashed once here rather than compared one by one
+                    values = frozenset(value.value for value in op.values)
+                except TypeError:
+                    pass
+                else:
+                    values, _ = self.constant(values)
+                    return self.fold('({} in {})'.format(left, values),
+                                     left_constant)
+            values = [self.compile(value) for value in op.values]
+            source = '({} in ({},))'.format(
+                left, ', '.join(source for source, _ in values))
+            return self.fold(source, left_constant and all(
+                is_constant for _, is_constant in values))
+        elif type(op) in COMPARISONS:
+            left, left_constant = self.compile(op.left)
+            right, right_constant = self.compile(op.right)
+            source = '({} {} {})'.format(left, COMPARISONS[type(op)], right)
+            return self.fold(source, left_constant and right_constant)
+        raise Exception('Cannot compile {}'.format(op))
+
+    def _compile_logical(self, op):
+        is_and = type(op) == And
+        left, left_constant = self.compile(op.left)
+        right, right_constant = self.compile(op.right)
+        source = '({} {} {})'.format(left, 'and' if is_and else 'or', right)
+        if left_constant and right_constant:
+            return self.fold(source, True)
+        # A constant side either decides the result or drops out
+        for side, is_constant, other in ((left, left_constant, right),
+                                         (right, right_constant, left)):
+            if is_constant:
+                if bool(self.value_of(side)) != is_and:
+                    return self.constant(not is_and)
+                return other, False
+        return source, False
+
+
+def _function(op, columns):
+    compiler = _Compiler(columns)
+    source, is_constant = compiler.compile(op)
+    if is_constant:
+        value = compiler.value_of(source)
+        return lambda row: value
+    return eval('lambda row: {}'.format(source), compiler.constants)
+
+
+def compile_predicate(op, columns):
+    """Function of a row with values for columns, returning whether the row
+    matches op"""
+    return _function(op, columns)
+
+
+def compile_expression(value, columns):
+    """Function of a row with values for columns, returning value computed
+    for it, value being a Literal or a ColumnReference"""
+    return _function(value, columns)
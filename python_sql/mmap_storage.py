@@ -0,0 +1,356 @@
+"""Storage of tables in files of fixed-width records, memory mapped.
+
+Every column has a fixed width (8 bytes for numbers, 4N for varchar(N),
+room for N characters of UTF-8), so each table is a file of equal sized
+records and the row at a data index is found by arithmetic. Rows are read
+straight out of the mapped file, only the columns asked for being decoded,
+and the operating system caches the pages, so tables may be larger than
+memory:
+
+    db = Database(MmapStorageDriver('data'))
+    ...
+    db.storage.close()
+
+Opening a Database on a directory holding tables brings them back, their
+primary key and indexes built again from the rows.
+"""
+import json
+import mmap
+import os
+import struct
+
+from python_sql.database import StorageDriver, column_getter, \
+    scan_batches
+from python_sql.logic import ColumnConstraint, ColumnDefinition, \
+    CreateTable, TableReference
+
+MAGIC = b'PSQLMMAP'
+VERSION = 2
+# Bytes before the first record: the magic, version, record size, number
+# of records and length of the schema, then the schema as JSON
+HEADER_SIZE = 4096
+HEADER = struct.Struct('<8sHIQI')
+COUNT_OFFSET = 14
+COUNT = struct.Struct('<Q')
+# Records room is first made for in a new file
+INITIAL_CAPACITY = 1024
+EXTENSION = '.table'
+FORMATS = {'int': 'q', 'double': 'd'}
+# Most bytes a character takes in UTF-8
+MAX_CHAR_BYTES = 4
+# First byte of each record
+LIVE = 1
+DELETED = 0
+
+
+def _field_format(column_def):
+    if column_def.type == 'varchar':
+        return '{}s'.format(column_def.size * MAX_CHAR_BYTES)
+    return FORMATS[column_def.type]
+
+
+class TableFile:
+    """The records of one table in a memory mapped file.
+
+    A record is a byte telling whether the row is live, then for each
+    column a byte set when its value is NULL followed by the value.
+    """
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.column_defs = [ColumnDefinition(name, type, size,
+                                             ColumnConstraint(flags))
+                            for name, type, size, flags in schema['columns']]
+        self.varchars = [column_def.type == 'varchar'
+                         for column_def in self.column_defs]
+        self._row_varchars = [i for i, is_varchar in enumerate(self.varchars)
+                              if is_varchar]
+        self.record = struct.Struct('<B' + ''.join(
+            '?' + _field_format(column_def)
+            for column_def in self.column_defs))
+        self.schema = schema
+        self._columns = {}
+        exists = os.path.exists(path)
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        if exists:
+            self._read_header()
+        else:
+            self.count = 0
+            self.file.truncate(HEADER_SIZE +
+                               INITIAL_CAPACITY * self.record.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        if not exists:
+            self._write_header()
+
+    @staticmethod
+    def read_schema(path):
+        with open(path, 'rb') as file:
+            magic, version, _, _, length = HEADER.unpack(
+                file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise Exception('Not a table file: {}'.format(path))
+            return json.loads(file.read(length).decode())
+
+    def _read_header(self):
+        self.file.seek(0)
+        _, _, record_size, self.count, _ = HEADER.unpack(
+            self.file.read(HEADER.size))
+        if record_size != self.record.size:
+            raise Exception('Records of {} are {} bytes, expected {}'.format(
+                self.path, record_size, self.record.size))
+
+    def _write_header(self):
+        schema = json.dumps(self.schema).encode()
+        if HEADER.size + len(schema) > HEADER_SIZE:
+            raise Exception('Schema of {} too large'.format(self.path))
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, self.record.size,
+                         self.count, len(schema))
+        self.map[HEADER.size:HEADER.size + len(schema)] = schema
+
+    @property
+    def capacity(self):
+        return (len(self.map) - HEADER_SIZE) // self.record.size
+
+    def _offset(self, data_index):
+        if not 0 <= data_index < self.count:
+            raise IndexError('No row at data index {}'.format(data_index))
+        return HEADER_SIZE + data_index * self.record.size
+
+    def encode(self, row_data):
+        """row_data as a live record"""
+        if len(row_data) != len(self.column_defs):
+            raise Exception('Expected {} values but got {}'.format(
+                len(self.column_defs), len(row_data)))
+        fields = [LIVE]
+        for column_def, is_varchar, value in zip(self.column_defs,
+                                                 self.varchars, row_data):
+            if value is None:
+                fields += (True, b'' if is_varchar else 0)
+                continue
+            if is_varchar:
+                if not isinstance(value, str) or \
+                        len(value) > column_def.size or value.endswith('\0'):
+                    raise Exception(
+                        'Cannot store {!r} in varchar({}) column {}'.format(
+                            value, column_def.size, column_def.name))
+                value = value.encode()
+            fields += (False, value)
+        try:
+            return self.record.pack(*fields)
+        except struct.error as e:
+            raise Exception('Cannot store row {}: {}'.format(row_data, e))
+
+    def append(self, records):
+        """Write records, bytes of whole records, after the last"""
+        added = len(records) // self.record.size
+        if self.count + added > self.capacity:
+            capacity = max(self.capacity * 2, self.count + added)
+            self.map.resize(HEADER_SIZE + capacity * self.record.size)
+        start = HEADER_SIZE + self.count * self.record.size
+        self.map[start:start + len(records)] = records
+        self.count += added
+        COUNT.pack_into(self.map, COUNT_OFFSET, self.count)
+
+    def write(self, data_index, record):
+        offset = self._offset(data_index)
+        self.map[offset:offset + len(record)] = record
+
+    def delete(self, data_index):
+        self.map[self._offset(data_index)] = DELETED
+
+    def read(self, data_index):
+        offset = self._offset(data_index)
+        if self.map[offset] != LIVE:
+            return None
+        return self._decode(self.record.unpack_from(self.map, offset)[1:],
+                            self._row_varchars)
+
+    @staticmethod
+    def _decode(fields, varchars):
+        """Values of the (is NULL, value) pairs of fields, varchars being
+        the positions of the varchar values"""
+        nulls = fields[0::2]
+        if not varchars and True not in nulls:
+            return fields[1::2]
+        values = list(fields[1::2])
+        for i in varchars:
+            values[i] = values[i].rstrip(b'\0').decode()
+        if True in nulls:
+            for i, is_null in enumerate(nulls):
+                if is_null:
+                    values[i] = None
+        return tuple(values)
+
+    def columns(self, column_indexes):
+        """Struct unpacking only the columns at column_indexes of a record,
+        in table order and skipping the bytes of the others, the positions
+        of the varchar values among them as for _decode, and the positions
+        of the values in the order of column_indexes, or None when it is
+        table order"""
+        key = tuple(column_indexes)
+        if key not in self._columns:
+            ordered = sorted(set(key))
+            # Padding for the live byte, then each column
+            formats = ['x']
+            for i, column_def in enumerate(self.column_defs):
+                field = '?' + _field_format(column_def)
+                formats.append(field if i in ordered else
+                               '{}x'.format(struct.calcsize('<' + field)))
+            varchars = [position for position, i in enumerate(ordered)
+                        if self.varchars[i]]
+            positions = None if list(key) == ordered else \
+                [ordered.index(i) for i in key]
+            self._columns[key] = (struct.Struct('<' + ''.join(formats)),
+                                  varchars, positions)
+        return self._columns[key]
+
+    def unpack(self, record, data_indexes):
+        """Fields of the records at data_indexes unpacked by record, runs of
+        them following each other unpacked in one pass over the map"""
+        record_size = self.record.size
+        for batch in scan_batches(data_indexes):
+            first = batch[0]
+            if batch == list(range(first, first + len(batch))):
+                start = HEADER_SIZE + first * record_size
+                # Released before the fields are passed on, the map not
+                # being resizable while viewed
+                with memoryview(self.map) as view:
+                    fields = list(record.iter_unpack(
+                        view[start:start + len(batch) * record_size]))
+            else:
+                fields = [record.unpack_from(self.map, HEADER_SIZE +
+                                             data_index * record_size)
+                          for data_index in batch]
+            yield from fields
+
+    def rows(self, data_indexes):
+        """Values of the records at data_indexes, None for those deleted,
+        unpacked in runs as by unpack"""
+        decode = self._decode
+        varchars = self._row_varchars
+        for fields in self.unpack(self.record, data_indexes):
+            yield decode(fields[1:], varchars) if fields[0] == LIVE else None
+
+    def keys(self):
+        """(data index, primary key) of every record, None for those
+        deleted"""
+        key = struct.Struct('<B?' + _field_format(self.column_defs[0]))
+        unpack_from = key.unpack_from
+        record_size = self.record.size
+        for data_index in range(self.count):
+            live, _, pk = unpack_from(self.map,
+                                      HEADER_SIZE + data_index * record_size)
+            yield data_index, pk if live == LIVE else None
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+
+class MmapStorageDriver(StorageDriver):
+    """Keeps each table in a file of fixed-width records in directory,
+    mapped into memory"""
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._files = {}
+
+    def _path(self, table_name):
+        return os.path.join(self.directory, table_name + EXTENSION)
+
+    def stored_tables(self):
+        names = sorted(name[:-len(EXTENSION)]
+                       for name in os.listdir(self.directory)
+                       if name.endswith(EXTENSION))
+        stored = []
+        for name in names:
+            schema = TableFile.read_schema(self._path(name))
+            columns = [ColumnDefinition(column_name, type, size,
+                                        ColumnConstraint(flags))
+                       for column_name, type, size, flags in
+                       schema['columns'][1 if schema['auto_pk'] else 0:]]
+            stored.append((CreateTable(TableReference(name), columns),
+                           schema['indexes']))
+        return stored
+
+    def add_table(self, table):
+        super().add_table(table)
+        schema = {'columns': [[column_def.name, column_def.type,
+                               column_def.size, column_def.constraints.value]
+                              for column_def in table.column_defs],
+                  'auto_pk': table.auto_pk,
+                  'indexes': []}
+        path = self._path(table.name)
+        if os.path.exists(path):
+            stored = TableFile.read_schema(path)
+            if (stored['columns'], stored['auto_pk']) != \
+                    (schema['columns'], schema['auto_pk']):
+                raise Exception(
+                    'Table {} is stored with other columns'.format(
+                        table.name))
+            schema['indexes'] = stored['indexes']
+        self._files[table.name] = TableFile(path, schema)
+
+    def add_index(self, table_name, name, column_name):
+        table_file = self._files[table_name]
+        if [name, column_name] not in table_file.schema['indexes']:
+            table_file.schema['indexes'].append([name, column_name])
+            table_file._write_header()
+
+    def stored_keys(self, table_name):
+        return self._files[table_name].keys()
+
+    def write_row(self, table_name, pk, row_data):
+        table_file = self._files[table_name]
+        table_file.write(pk, table_file.encode(row_data))
+
+    def append_row(self, table_name, row_data):
+        table_file = self._files[table_name]
+        table_file.append(table_file.encode(row_data))
+
+    def append_rows(self, table_name, rows):
+        table_file = self._files[table_name]
+        # Every row encoded before any is written
+        table_file.append(b''.join(map(table_file.encode, rows)))
+
+    def read_row(self, table_name, pk):
+        return self._files[table_name].read(pk)
+
+    def read_rows(self, table_name, data_indexes):
+        return self.read_columns(table_name, data_indexes,
+                                 range(len(self.tables[table_name])))
+
+    def read_columns(self, table_name, data_indexes, column_indexes):
+        table_file = self._files[table_name]
+        record, varchars, positions = table_file.columns(column_indexes)
+        decode = table_file._decode
+        rows = (decode(fields, varchars)
+                for fields in table_file.unpack(record, data_indexes))
+        if positions is None:
+            return rows
+        return map(column_getter(positions), rows)
+
+    def delete_row(self, table_name, pk):
+        self._files[table_name].delete(pk)
+
+    def scan(self, table_name, start_pk=None, stop_pk=None):
+        table_file = self._files[table_name]
+        for row in table_file.rows(range(table_file.count)[start_pk:stop_pk]):
+            if row is not None:
+                yield row
+
+    def flush(self):
+        """Write the changes made to every table file to disk"""
+        for table_file in self._files.values():
+            table_file.flush()
+
+    def close(self):
+        for table_file in self._files.values():
+            table_file.close()
+        self._files = {}
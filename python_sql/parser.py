@@ -1,96 +1,95 @@
-import itertools
 import re
+from collections import namedtuple
 
 from python_sql.logic import *
 
-ALPHANUMERIC = re.compile('[A-Za-z]')
-DIGIT = re.compile('[0-9]')
-WORD = re.compile('\w')
-WHITESPACE = re.compile(r'[\s\n\r\t]')
-NOT_WHITESPACE = re.compile('[^\s]')
-COMMA = re.compile(',')
-PERIOD = re.compile('\.')
-NOT_QUOTE = re.compile('[^\']')
-
-
-class ParsedString():
-    def __init__(self, string):
-        self.string = string
-        self.index = 0
-        self.previous_token = None
-        self.tried_start_index = None
-
-    def try_start(self):
-        self.tried_start_index = self.index
-
-    def try_revert(self):
-        self.index = self.tried_start_index
-
-    def is_trying(self):
-        return self.tried_start_index is not None
-
-    def try_end(self):
-        self.tried_start_index = None
-
-    def peek(self, num_chars=1, skip_whitespace=True):
-        if skip_whitespace:
-            self.skip_whitespace()
-        return ''.join(self.string[self.index:self.index + num_chars])
-
-    def consume(self, num_chars=1, skip_whitespace=True):
-        r = self.peek(num_chars, skip_whitespace)
-        self.index += num_chars
-        return r
-
-    def peek_token(self, pattern=ALPHANUMERIC, skip_whitespace=True):
-        if skip_whitespace:
-            self.skip_whitespace()
-        r = itertools.takewhile(lambda x: pattern.match(x),
-                                self.string[self.index:])
-        return ''.join(r)
-
-    def consume_token(self, pattern=ALPHANUMERIC, skip_whitespace=True):
-        if skip_whitespace:
-            self.skip_whitespace()
-        r = itertools.takewhile(lambda x: pattern.match(x),
-                                self.string[self.index:])
-        r = ''.join(r)
-        self.index += len(r)
-        self.previous_token = r
-        if len(r) == 0:
-            return self.raise_exception(expected=pattern)
-        return r
-
-    def consume_expected(self, expected, match_case=False,
-                         skip_whitespace=True):
-        if skip_whitespace:
-            self.skip_whitespace()
-        toRet = self.string[self.index:self.index + len(expected)]
-        if not match_case:
-            expected = expected.lower()
-            actual = toRet.lower()
-        else:
-            actual = toRet
-        if expected != actual:
-            self.raise_exception(expected, actual)
-        else:
-            self.index += len(expected)
-        return toRet
-
-    def skip_whitespace(self):
-        r = itertools.takewhile(lambda x: WHITESPACE.match(x),
-                                self.string[self.index:])
-        r = ''.join(r)
-        self.index += len(r)
-
-    def raise_exception(self, expected, actual=None):
-        if actual is None:
-            actual = self.previous_token if self.previous_token is not None and self.previous_token != '' else self.peek_token(
-                NOT_WHITESPACE)
-            index = self.index - len(self.previous_token)
-        else:
-            index = self.index - len(actual)
-        raise ParseException(expected=expected, actual=actual, index=index)
+# Token kinds
+WORD = 'word'
+INTEGER = 'integer'
+STRING = 'string'
+OPERATOR = 'operator'
+PARAMETER = 'parameter'
+SYMBOL = 'symbol'
+END = 'end'
+
+# Every token of a statement, one alternative per kind tried in order
+TOKEN = re.compile(r"""
+    (?P<whitespace>\s+)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<integer>[0-9]+(?!\w))
+  | (?P<word>\w+)
+  | (?P<operator>!=|>=|<=|=|<|>)
+  | (?P<parameter>\?)
+  | (?P<symbol>.)
+""", re.VERBOSE | re.DOTALL)
+
+
+class Token(namedtuple('Token', ['kind', 'value', 'index'])):
+    # kind: str, one of the token kinds
+    # value: str, the text of the token
+    # index: int, where it starts in the statement
+    pass
+
+
+def tokenize(query):
+    """Tokens of query without the whitespace between them, ending with an
+    END token"""
+    tokens = [Token(match.lastgroup, match.group(), match.start())
+              for match in TOKEN.finditer(query)
+              if match.lastgroup != 'whitespace']
+    tokens.append(Token(END, '', len(query)))
+    return tokens
+
+
+class Tokens():
+    """Position in the tokens of a statement being parsed"""
+
+    def __init__(self, query, bindings=None):
+        self.tokens = tokenize(query)
+        self.position = 0
+        # Where the values of the ? parameters parsed are bound
+        self.bindings = [] if bindings is None else bindings
+
+    def peek(self) -> Token:
+        return self.tokens[self.position]
+
+    def keyword(self):
+        """The next token lower cased if it is a word, otherwise ''"""
+        token = self.tokens[self.position]
+        return token.value.lower() if token.kind == WORD else ''
+
+    def next(self) -> Token:
+        token = self.tokens[self.position]
+        if token.kind != END:
+            self.position += 1
+        return token
+
+    def accept(self, expected):
+        """Consume the next token if it is expected, ignoring case, and
+        return whether it was"""
+        token = self.tokens[self.position]
+        if token.kind != STRING and token.value.lower() == expected:
+            self.position += 1
+            return True
+        return False
+
+    def consume_expected(self, expected):
+        if not self.accept(expected):
+            self.raise_exception(expected)
+
+    def consume_kind(self, kind):
+        """Value of the next token, which must be of kind"""
+        token = self.tokens[self.position]
+        if token.kind != kind:
+            self.raise_exception(kind)
+        self.position += 1
+        return token.value
+
+    def raise_exception(self, expected, token=None):
+        if token is None:
+            token = self.peek()
+        raise ParseException(expected=expected, actual=token.value,
+                             index=token.index)
 
 
 class ParseException(Exception):
@@ -99,195 +98,167 @@ class ParseException(Exception):
             message = 'Expected "{}" but got "{}" at index {}'.format(expected,
                                                                       actual,
                                                                       index)
-        elif type(expected) == tuple or type(expected) == list:
+        else:
             message = 'Expected one of "{}" but got "{}" at index {}'.format(
                 expected, actual, index)
-        else:
-            message = 'Expected matching regex "{}" but got "{}" at index {}'.format(
-                expected.pattern, actual, index)
         super(ParseException, self).__init__(message)
 
 
-QUERY_TYPES = ('select', 'insert', 'create', 'update', 'delete')
+QUERY_TYPES = ('select', 'insert', 'create', 'update', 'delete', 'analyze',
+               'explain', 'copy')
+SELECT_CLAUSES = ('where', 'order by', 'limit', 'offset')
 
 
-def query_type(parsed_string: ParsedString):
-    next_token = parsed_string.consume_token().lower()
+def query_type(tokens: Tokens):
+    next_token = tokens.keyword()
     if next_token in QUERY_TYPES:
+        tokens.next()
         return next_token
     else:
-        parsed_string.raise_exception(QUERY_TYPES)
+        tokens.raise_exception(QUERY_TYPES)
 
 
-def consume_list(parsed_string: ParsedString, consumer):
+def consume_list(tokens: Tokens, consumer):
     results = []
-    results.append(consumer(parsed_string))
-    while parsed_string.peek_token(COMMA) == ',':
-        parsed_string.consume_token(COMMA)
-        results.append(consumer(parsed_string))
+    results.append(consumer(tokens))
+    while tokens.accept(','):
+        results.append(consumer(tokens))
     return results
 
 
-def column_consumer(col: ParsedString):
+def column_consumer(tokens: Tokens):
     # Required to be table.column
-    table = col.consume_token(WORD)
-    col.consume_expected('.')
-    name = col.consume_token(WORD)
-    if col.peek_token() == 'AS':
-        col.consume_expected('AS')
-        as_name = col.consume_token(WORD)
+    table = tokens.consume_kind(WORD)
+    tokens.consume_expected('.')
+    name = tokens.consume_kind(WORD)
+    if tokens.accept('as'):
+        as_name = tokens.consume_kind(WORD)
     else:
         as_name = None
     return ColumnReference(table, name, as_name)
 
 
-def table_consumer(parsed_string: ParsedString):
-    table = parsed_string.consume_token(WORD)
+def table_consumer(tokens: Tokens):
+    table = tokens.consume_kind(WORD)
     return TableReference(table)
 
 
-def string_literal(parsed_string: ParsedString):
-    parsed_string.consume_expected("'")
-    r = parsed_string.consume_token(NOT_QUOTE)
-    parsed_string.consume_expected("'")
-    while parsed_string.peek(1, skip_whitespace=False) == "'":
-        r += "'"
-        parsed_string.consume(1, skip_whitespace=False)
-        r += parsed_string.consume_token(NOT_QUOTE)
-        parsed_string.consume_expected("'")
-    return StringLiteral(r)
+def string_literal(tokens: Tokens):
+    value = tokens.consume_kind(STRING)
+    return StringLiteral(value[1:-1].replace("''", "'"))
 
 
-def integer_literal(parsed_string: ParsedString):
-    r = parsed_string.consume_token(DIGIT)
-    if r is not None:
-        return IntegerLiteral(int(r))
-    return None
+def integer_literal(tokens: Tokens):
+    return IntegerLiteral(int(tokens.consume_kind(INTEGER)))
+
 
+def parameter(tokens: Tokens):
+    tokens.consume_kind(PARAMETER)
+    tokens.bindings.append(None)
+    return Parameter(len(tokens.bindings) - 1, tokens.bindings)
 
-def try_consume(parsed_string: ParsedString, potentials):
-    parsed_string.try_start()
-    try:
-        for p in potentials:
-            try:
-                r = p(parsed_string)
-                if r is not None:
-                    return r
-            except ParseException:
-                parsed_string.try_revert()
-        raise ParseException(expected=potentials, actual=None,
-                             index=parsed_string.index)
-    finally:
-        parsed_string.try_end()
 
+LITERALS = {INTEGER: integer_literal,
+            STRING: string_literal,
+            PARAMETER: parameter,
+            WORD: column_consumer}
 
-LITERALS = [integer_literal,
-            string_literal,
-            column_consumer]
 
+def _where_operand(tokens: Tokens):
+    consumer = LITERALS.get(tokens.peek().kind)
+    if consumer is None:
+        tokens.raise_exception(list(LITERALS))
+    return consumer(tokens)
 
-def _where_operand(parsed_string: ParsedString):
-    return try_consume(parsed_string, LITERALS)
 
+def consume_literal_list(tokens: Tokens):
+    return consume_list(tokens, _where_operand)
 
-def consume_literal_list(parsed_string: ParsedString):
-    def consumer(parsed_string):
-        return try_consume(parsed_string, LITERALS)
 
-    return consume_list(parsed_string, consumer)
+def _values_row(tokens: Tokens):
+    tokens.consume_expected('(')
+    values = consume_literal_list(tokens)
+    tokens.consume_expected(')')
+    return values
 
 
 OPERATIONS = {'=': Equals,
               '<': LessThan,
-              '>': GreaterThan}
-OPERATIONS2 = {'!=': NotEquals,
-               '>=': GreaterThanEquals,
-               '<=': LessThanEquals,
-               'in': None}
-ALL_OPERATIONS = {**OPERATIONS, **OPERATIONS2}
-
-
-def _where_clause(parsed_string: ParsedString) -> Operation:
-    if parsed_string.peek_token() == 'not':
-        parsed_string.consume_expected('not')
-        parsed_string.consume_expected('(')
-        logic = _where(parsed_string)
-        parsed_string.consume_expected(')')
-        return Not(logic)
-    else:
-        left = _where_operand(parsed_string)
-        operation = parsed_string.peek(2)
-        if operation not in OPERATIONS2:
-            operation = parsed_string.peek(1)
-            if operation not in OPERATIONS:
-                parsed_string.raise_exception(
-                    expected=list(ALL_OPERATIONS.keys()), actual=operation)
-        parsed_string.consume_expected(operation)
-        if operation == 'in':
-            parsed_string.consume_expected('(')
-            values = consume_literal_list(parsed_string)
-            parsed_string.consume_expected(')')
-            return InFunc(left, values)
-        else:
-            right = _where_operand(parsed_string)
-
-        op = ALL_OPERATIONS[operation]
-        if op:
-            return op(left, right)
-        else:
-            pass
+              '>': GreaterThan,
+              '!=': NotEquals,
+              '>=': GreaterThanEquals,
+              '<=': LessThanEquals}
 
 
-def _where(parsed_string: ParsedString) -> Operation:
-    parens = parsed_string.peek(1)
-    if parens == '(':
-        parsed_string.consume_expected('(')
-        logic = _where(parsed_string)
-        parsed_string.consume_expected(')')
+def _where_clause(tokens: Tokens) -> Operation:
+    if tokens.accept('not'):
+        tokens.consume_expected('(')
+        logic = _where(tokens)
+        tokens.consume_expected(')')
+        return Not(logic)
+    left = _where_operand(tokens)
+    if tokens.accept('between'):
+        low = _where_operand(tokens)
+        tokens.consume_expected('and')
+        high = _where_operand(tokens)
+        return And(GreaterThanEquals(left, low), LessThanEquals(left, high))
+    if tokens.accept('in'):
+        tokens.consume_expected('(')
+        values = consume_literal_list(tokens)
+        tokens.consume_expected(')')
+        return InFunc(left, values)
+    token = tokens.peek()
+    if token.kind != OPERATOR:
+        tokens.raise_exception(list(OPERATIONS) + ['in'])
+    tokens.next()
+    right = _where_operand(tokens)
+    return OPERATIONS[token.value](left, right)
+
+
+def _where(tokens: Tokens) -> Operation:
+    if tokens.accept('('):
+        logic = _where(tokens)
+        tokens.consume_expected(')')
     else:
-        logic = _where_clause(parsed_string)
-    options = ('and', 'or')
-    while parsed_string.peek_token().lower() in options:
-        op = parsed_string.consume_token().lower()
-        n = _where(parsed_string)
-        if op == 'and':
-            logic = And(logic, n)
-        elif op == 'or':
-            logic = Or(logic, n)
-    return logic
+        logic = _where_clause(tokens)
+    while True:
+        if tokens.accept('and'):
+            logic = And(logic, _where(tokens))
+        elif tokens.accept('or'):
+            logic = Or(logic, _where(tokens))
+        else:
+            return logic
 
 
 COLUMN_TYPES = ('int', 'double', 'varchar')
+COPY_FORMATS = ('csv', 'tsv', 'jsonl')
 
 
-def column_definition_consumer(parsed_string: ParsedString) -> ColumnDefinition:
-    name = parsed_string.consume_token()
-    col_type = parsed_string.consume_token().lower()
+def column_definition_consumer(tokens: Tokens) -> ColumnDefinition:
+    name = tokens.consume_kind(WORD)
+    col_type = tokens.keyword()
     if col_type not in COLUMN_TYPES:
-        parsed_string.raise_exception(COLUMN_TYPES, col_type)
+        tokens.raise_exception(COLUMN_TYPES)
+    tokens.next()
     if col_type == 'varchar':
-        parsed_string.consume_expected('(')
-        size = int(parsed_string.consume_token(pattern=DIGIT))
-        parsed_string.consume_expected(')')
+        tokens.consume_expected('(')
+        size = int(tokens.consume_kind(INTEGER))
+        tokens.consume_expected(')')
     else:
         size = 8
     flags = ColumnConstraint.NONE
     while True:
-        next_token = parsed_string.peek_token().lower()
-        if next_token == 'primary':
-            parsed_string.consume_expected('primary')
-            parsed_string.consume_expected('key')
+        if tokens.accept('primary'):
+            tokens.consume_expected('key')
             flags |= ColumnConstraint.PRIMARY_KEY
             # flags |= ColumnConstraint.UNIQUE
             # flags |= ColumnConstraint.NOT_NULL
             if col_type!='int':
                 raise Exception('Primary key must be an int')
-        elif next_token == 'unique':
-            parsed_string.consume_expected('unique')
+        elif tokens.accept('unique'):
             flags |= ColumnConstraint.UNIQUE
-        elif next_token == 'not':
-            parsed_string.consume_expected('not')
-            parsed_string.consume_expected('null')
+        elif tokens.accept('not'):
+            tokens.consume_expected('null')
             flags |= ColumnConstraint.NOT_NULL
         else:
             break
@@ -295,19 +266,18 @@ def column_definition_consumer(parsed_string: ParsedString) -> ColumnDefinition:
     return ColumnDefinition(name, col_type, size, flags)
 
 
-def _from(parsed_string: ParsedString):
-    parsed_string.consume_expected('from')
-    table = table_consumer(parsed_string)
+def _from(tokens: Tokens):
+    tokens.consume_expected('from')
+    table = table_consumer(tokens)
     joins = []
-    while parsed_string.peek_token().lower() in ('left', 'join'):
+    while tokens.keyword() in ('left', 'join'):
         # Join!
-        parsed_string.consume_token()
-        joined_table_ref = table_consumer(parsed_string)
-        if parsed_string.peek_token().lower() == 'on':
-            parsed_string.consume_expected('on')
-            left = column_consumer(parsed_string)
-            parsed_string.consume_expected('=')
-            right = column_consumer(parsed_string)
+        tokens.next()
+        joined_table_ref = table_consumer(tokens)
+        if tokens.accept('on'):
+            left = column_consumer(tokens)
+            tokens.consume_expected('=')
+            right = column_consumer(tokens)
             if right.table != joined_table_ref.name:
                 # Always order so the joining table is second
                 left, right = right, left
@@ -318,94 +288,142 @@ def _from(parsed_string: ParsedString):
     return From(table, joins)
 
 
-def _order_by(parsed_string: ParsedString):
-    parsed_string.consume_expected('order')
-    parsed_string.consume_expected('by')
-    order_by = consume_list(parsed_string, column_consumer)
-    if parsed_string.peek_token().lower() == 'desc':
-        parsed_string.consume_expected('desc')
-        reverse = True
-    else:
-        reverse = False
+def _order_by(tokens: Tokens):
+    tokens.consume_expected('order')
+    tokens.consume_expected('by')
+    order_by = consume_list(tokens, column_consumer)
+    reverse = tokens.accept('desc')
     return OrderBy(order_by, reverse)
 
 
-def _update_expr_consumer(expr: ParsedString):
-    column = column_consumer(expr)
-    expr.consume_expected('=')
-    value = try_consume(expr, LITERALS)
+def _limit(tokens: Tokens, keyword):
+    tokens.consume_expected(keyword)
+    return int(tokens.consume_kind(INTEGER))
+
+
+def _update_expr_consumer(tokens: Tokens):
+    column = column_consumer(tokens)
+    tokens.consume_expected('=')
+    value = _where_operand(tokens)
     return column, value
 
 
-def parse(query):
-    parsed_string = ParsedString(query)
-    type = query_type(parsed_string)
+def _optional_where(tokens: Tokens):
+    """The WHERE clause ending an UPDATE or DELETE, or None"""
+    if tokens.accept('where'):
+        return _where(tokens).simplify()
+    elif tokens.peek().kind != END:
+        tokens.raise_exception('where')
+    return None
+
+
+def _copy_options(tokens: Tokens):
+    """The path, format and header of the file of a COPY"""
+    path = string_literal(tokens).value
+    format = None
+    header = False
+    while True:
+        if tokens.accept('format'):
+            format = tokens.keyword()
+            if format not in COPY_FORMATS:
+                tokens.raise_exception(COPY_FORMATS)
+            tokens.next()
+        elif tokens.accept('header'):
+            header = True
+        elif tokens.peek().kind != END:
+            tokens.raise_exception(['format', 'header'])
+        else:
+            return path, format, header
+
+
+def _copy(tokens: Tokens):
+    if tokens.accept('('):
+        tokens.consume_expected('select')
+        select = _select(tokens, nested=True)
+        tokens.consume_expected(')')
+        tokens.consume_expected('to')
+        return CopyTo(select, *_copy_options(tokens))
+    table = table_consumer(tokens)
+    tokens.consume_expected('from')
+    return CopyFrom(table, *_copy_options(tokens))
+
+
+def _select(tokens: Tokens, nested=False):
+    """The SELECT after its keyword, up to the end of the query or, when
+    nested, the ) closing it"""
+    columns = consume_list(tokens, column_consumer)
+    tables = _from(tokens)
+    where_clause = TrueOp()
+    got_where = False
+    if tokens.accept('where'):
+        where_clause = _where(tokens).simplify()
+        got_where = True
+    order_by = None
+    if tokens.keyword() == 'order':
+        order_by = _order_by(tokens)
+    limit = offset = None
+    if tokens.keyword() == 'limit':
+        limit = _limit(tokens, 'limit')
+    if tokens.keyword() == 'offset':
+        offset = _limit(tokens, 'offset')
+    token = tokens.peek()
+    if token.kind != END and not (nested and token.value == ')'):
+        # Only clauses after the last one parsed may follow
+        seen = [got_where, order_by is not None, limit is not None,
+                offset is not None]
+        first = max(i + 1 if found else 0 for i, found in enumerate(seen))
+        tokens.raise_exception(list(SELECT_CLAUSES[first:]) or
+                               (')' if nested else 'end of query'))
+    return Select(columns, tables, where_clause, order_by, limit, offset)
+
+
+def parse(query, bindings=None):
+    """The statement query, whose ? parameters read their values from
+    bindings, a list extended with a None for each one"""
+    tokens = Tokens(query, bindings)
+    type = query_type(tokens)
     if type == 'select':
-        columns = consume_list(parsed_string, column_consumer)
-        parsed_string.skip_whitespace()
-        tables = _from(parsed_string)
-        where_clause = TrueOp()
-        got_where = False
-        token = parsed_string.peek_token(NOT_WHITESPACE).lower()
-        if token == 'where':
-            parsed_string.consume_expected('where')
-            where_clause = _where(parsed_string).simplify()
-            token = parsed_string.peek_token(NOT_WHITESPACE).lower()
-            got_where = True
-        order_by = None
-        if token == 'order':
-            order_by = _order_by(parsed_string)
-        elif token is not None and token != '':
-            parsed_string.consume_token(NOT_WHITESPACE)
-            if got_where:
-                expected = 'order by'
-            else:
-                expected = ('where', 'order by')
-            parsed_string.raise_exception(expected)
-        return Select(columns, tables, where_clause, order_by)
+        return _select(tokens)
     elif type == 'insert':
-        parsed_string.consume_expected('into')
-        table = table_consumer(parsed_string)
-        parsed_string.consume_expected('values')
-        parsed_string.consume_expected('(')
-        values = consume_literal_list(parsed_string)
-        parsed_string.consume_expected(')')
-        return Insert(table, values)
+        tokens.consume_expected('into')
+        table = table_consumer(tokens)
+        tokens.consume_expected('values')
+        return Insert(table, consume_list(tokens, _values_row))
     elif type == 'create':
-        parsed_string.consume_expected('table')
-        table = table_consumer(parsed_string)
-        parsed_string.consume_expected('(')
-        column_defs = consume_list(parsed_string, column_definition_consumer)
-        parsed_string.consume_expected(')')
+        if tokens.accept('index'):
+            name = tokens.consume_kind(WORD)
+            tokens.consume_expected('on')
+            table = table_consumer(tokens)
+            tokens.consume_expected('(')
+            column = tokens.consume_kind(WORD)
+            tokens.consume_expected(')')
+            return CreateIndex(name, table, column)
+        tokens.consume_expected('table')
+        table = table_consumer(tokens)
+        tokens.consume_expected('(')
+        column_defs = consume_list(tokens, column_definition_consumer)
+        tokens.consume_expected(')')
         return CreateTable(table, column_defs)
     elif type == 'update':
-        table = table_consumer(parsed_string)
-        parsed_string.consume_expected('set')
-        columns = consume_list(parsed_string, _update_expr_consumer)
+        table = table_consumer(tokens)
+        tokens.consume_expected('set')
+        columns = consume_list(tokens, _update_expr_consumer)
         map = {k: v for k, v in columns}
-        token = parsed_string.peek_token(NOT_WHITESPACE).lower()
-        if token == 'where':
-            parsed_string.consume_expected('where')
-            where_clause = _where(parsed_string).simplify()
-        elif token:
-            raise ParseException(expected='where', actual=token,
-                                 index=parsed_string.index)
-        else:
-            where_clause = None
-        return Update(table, map, where_clause)
+        return Update(table, map, _optional_where(tokens))
+    elif type == 'explain':
+        analyze = tokens.accept('analyze')
+        tokens.consume_expected('select')
+        return Explain(_select(tokens), analyze)
+    elif type == 'analyze':
+        if tokens.peek().kind == WORD:
+            return Analyze(table_consumer(tokens))
+        return Analyze(None)
+    elif type == 'copy':
+        return _copy(tokens)
     elif type == 'delete':
-        parsed_string.consume_expected('from')
-        table = table_consumer(parsed_string)
-        token = parsed_string.peek_token(NOT_WHITESPACE).lower()
-        if token == 'where':
-            parsed_string.consume_expected('where')
-            where_clause = _where(parsed_string).simplify()
-        elif token:
-            raise ParseException(expected='where', actual=token,
-                                 index=parsed_string.index)
-        else:
-            where_clause = None
-        return Delete(table, where_clause)
+        tokens.consume_expected('from')
+        table = table_consumer(tokens)
+        return Delete(table, _optional_where(tokens))
 
 
 if __name__ == '__main__':
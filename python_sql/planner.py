@@ -0,0 +1,543 @@
+import logging
+from collections import namedtuple
+
+from python_sql.executor import CrossJoin, Filter, HashJoin, IndexJoin, \
+    Limit, MergeJoin, Operator, Project, Scan, Sort
+from python_sql.logic import *
+from python_sql.statistics import selectivity
+
+logger = logging.getLogger(__name__)
+
+RANGE_OPERATIONS = (Equals, GreaterThan, GreaterThanEquals, LessThan,
+                    LessThanEquals)
+NEGATIONS = {Equals: NotEquals,
+             NotEquals: Equals,
+             GreaterThan: LessThanEquals,
+             GreaterThanEquals: LessThan,
+             LessThan: GreaterThanEquals,
+             LessThanEquals: GreaterThan}
+# Paths of other conjuncts finding up to this many times the rows of the most
+# selective one are intersected with it, index entries being cheaper to read
+# than rows
+INTERSECT_RATIO = 4
+# Fewest left rows for a merge join to be worth more than primary key lookups
+MERGE_JOIN_MIN_ROWS = 64
+# Most tables whose join order is chosen by dynamic programming, larger
+# queries join in the order written
+MAX_JOIN_ORDER_TABLES = 8
+# Estimated rows touched per left row by a primary key or index lookup
+LOOKUP_COST = 2
+# Range of values of a column with no known bounds
+UNBOUNDED = (None, None, True, True)
+
+
+def column_range(column_ref, where_clause):
+    """Tightest (start, stop, include_start, include_stop) range of
+    column_ref implied by the conjuncts of where_clause, or None"""
+    start = stop = None
+    include_start = include_stop = True
+    found = False
+    for op in conjuncts(where_clause):
+        if type(op) not in RANGE_OPERATIONS or op.left != column_ref or \
+                not isinstance(op.right, Literal):
+            continue
+        found = True
+        value = op.right.value
+        if type(op) in (Equals, GreaterThan, GreaterThanEquals):
+            inclusive = type(op) != GreaterThan
+            if start is None or value > start or (
+                    value == start and not inclusive):
+                start, include_start = value, inclusive
+        if type(op) in (Equals, LessThan, LessThanEquals):
+            inclusive = type(op) != LessThan
+            if stop is None or value < stop or (
+                    value == stop and not inclusive):
+                stop, include_stop = value, inclusive
+    if not found:
+        return None
+    return start, stop, include_start, include_stop
+
+
+class IndexPath(namedtuple('IndexPath',
+                             ['data_indexes', 'estimate', 'ordering',
+                              'description'])):
+    # data_indexes: function returning a fresh iterable of the data indexes
+    #   of the rows that may match
+    # estimate: int, upper bound on their number
+    # ordering: Dict[ColumnReference, tuple], as for operators
+    # description: str, how the rows are found, for EXPLAIN
+    pass
+
+
+def describe_range(column, value_range):
+    """column's range of values as a condition, such as a >= 1 AND a < 5"""
+    start, stop, include_start, include_stop = value_range
+    if start is not None and start == stop and include_start and \
+            include_stop:
+        return '{} = {!r}'.format(column, start)
+    conditions = []
+    if start is not None:
+        conditions.append('{} {} {!r}'.format(
+            column, '>=' if include_start else '>', start))
+    if stop is not None:
+        conditions.append('{} {} {!r}'.format(
+            column, '<=' if include_stop else '<', stop))
+    return ' AND '.join(conditions)
+
+
+def negate(op):
+    """An operation matching the rows op does not, or None"""
+    if type(op) in NEGATIONS:
+        return NEGATIONS[type(op)](op.left, op.right)
+    elif type(op) == Not:
+        return op.operation
+    elif type(op) in (And, Or):
+        left, right = negate(op.left), negate(op.right)
+        if left is None or right is None:
+            return None
+        return Or(left, right) if type(op) == And else And(left, right)
+    return None
+
+
+def _range_path(table, column, value_range):
+    if column == table.primary_key_ref:
+        return IndexPath(
+            lambda: (data_index for _, data_index in
+                     table.pk_range(*value_range)),
+            table.count_range(*value_range), {column: value_range},
+            'primary key {}'.format(describe_range(column, value_range)))
+    index = table.index_for(column)
+    if index is None:
+        return None
+    description = 'index {} {}'.format(index.name,
+                                       describe_range(column, value_range))
+    start, stop, include_start, include_stop = value_range
+    if start is not None and start == stop and include_start and \
+            include_stop:
+        return IndexPath(lambda: index.lookup(start), index.count(start),
+                         {column: value_range}, description)
+    # Spread the rows evenly over the distinct values held
+    values = index.tree.count_range(*value_range)
+    estimate = values * len(table) // max(1, len(index.tree))
+    return IndexPath(lambda: index.range(*value_range),
+                     min(len(table), estimate), {column: value_range},
+                     description)
+
+
+def _in_path(table, op):
+    if not all(isinstance(value, Literal) for value in op.values):
+        return None
+    try:
+        # Sorted, a single walk of the leaves finds every value
+        values = sorted({value.value for value in op.values})
+    except TypeError:
+        return None
+    if not values or None in values:
+        return None
+    if op.left == table.primary_key_ref:
+        return IndexPath(lambda: table.lookup_pks(values), len(values),
+                         {op.left: (values[0], values[-1], True, True)},
+                         'primary key {}'.format(op))
+    index = table.index_for(op.left)
+    if index is None:
+        return None
+    return IndexPath(lambda: index.lookup_many(values),
+                     sum(index.count(value) for value in values), {},
+                     'index {} {}'.format(index.name, op))
+
+
+def _and_path(table, ops):
+    """The most selective path of the conjuncts ops, intersected with the
+    paths of the others when they are nearly as selective"""
+    paths = []
+    where = conjoin(ops)
+    columns = []
+    for op in ops:
+        if type(op) in RANGE_OPERATIONS and \
+                isinstance(op.left, ColumnReference) and \
+                isinstance(op.right, Literal) and op.left not in columns:
+            columns.append(op.left)
+    for column in columns:
+        paths.append(_range_path(table, column, column_range(column, where)))
+    for op in ops:
+        if type(op) == InFunc:
+            paths.append(_in_path(table, op))
+        elif type(op) in (Or, Not):
+            paths.append(index_path(table, op))
+    paths = sorted((path for path in paths if path is not None),
+                   key=lambda path: path.estimate)
+    if not paths:
+        return None
+    best = paths[0]
+    others = [path for path in paths[1:]
+              if path.estimate <= best.estimate * INTERSECT_RATIO]
+    if not others:
+        return best
+
+    def data_indexes():
+        found = set(best.data_indexes())
+        for path in others:
+            found.intersection_update(path.data_indexes())
+        return sorted(found)
+
+    return IndexPath(data_indexes, best.estimate, {},
+                     ' intersected with '.join(
+                         path.description for path in [best] + others))
+
+
+def index_path(table, op):
+    """IndexPath finding the rows of table that may match op through its
+    primary key and indexes, or None if some of them can only be found by
+    a full scan"""
+    if type(op) == Or:
+        left, right = index_path(table, op.left), index_path(table, op.right)
+        if left is None or right is None:
+            return None
+
+        def data_indexes():
+            found = set(left.data_indexes())
+            found.update(right.data_indexes())
+            return sorted(found)
+
+        return IndexPath(data_indexes, left.estimate + right.estimate, {},
+                         '({}) or ({})'.format(left.description,
+                                               right.description))
+    elif type(op) == Not:
+        negated = negate(op.operation)
+        return None if negated is None else index_path(table, negated)
+    return _and_path(table, conjuncts(op))
+
+
+def columns_needed(select: Select):
+    """ColumnReferences whose values select reads"""
+    needed = set(select.columns) | columns_read(select.where)
+    for joined_table in select.from_clause.joins:
+        if joined_table.left is not None:
+            needed.update((joined_table.left, joined_table.right))
+    if select.order_by:
+        needed.update(select.order_by.columns)
+    return needed
+
+
+def scan_columns(table, needed):
+    """Columns of table in needed, in table order, or None when every one
+    is"""
+    columns = [column for column in table.column_references
+               if column in needed]
+    if len(columns) == len(table.column_defs):
+        return None
+    return columns
+
+
+def _column_indexes(table, columns):
+    if columns is None:
+        return None
+    return [table.column_index(column.column) for column in columns]
+
+
+def access_path(table, where_clause, columns=None) -> Scan:
+    """Scan of the rows of table that may match where_clause, through the
+    primary key or indexes when they find fewer rows than a full scan.
+    Only the values of columns are read if given."""
+    path = index_path(table, where_clause)
+    column_indexes = _column_indexes(table, columns)
+    if uses_parameters(where_clause):
+        # The best path depends on the values bound, so it is found again
+        # each run, and no ordering holds for all of them
+        return Scan(table,
+                    lambda: _path_rows(table, index_path(table,
+                                                         where_clause),
+                                       column_indexes),
+                    len(table) if path is None else min(len(table),
+                                                        path.estimate),
+                    {}, 'the path best for the values bound', columns)
+    if path is None or path.estimate >= len(table):
+        return Scan(table,
+                    lambda: table.scan(column_indexes=column_indexes),
+                    len(table), {table.primary_key_ref: UNBOUNDED},
+                    columns=columns)
+    # The rest of the where clause is left to the filter
+    logger.debug('Can use indexes of %s for %s, about %s rows', table.name,
+                 where_clause, path.estimate)
+    return Scan(table,
+                lambda: table.read_rows(path.data_indexes(), column_indexes),
+                path.estimate, path.ordering, path.description, columns)
+
+
+def _path_rows(table, path, column_indexes=None):
+    """Rows of table read through path, or all of them when a full scan is
+    cheaper"""
+    if path is None or path.estimate >= len(table):
+        return table.scan(column_indexes=column_indexes)
+    return table.read_rows(path.data_indexes(), column_indexes)
+
+
+def filtered(plan, ops, estimated_rows=None):
+    """plan keeping only the rows matching all of ops"""
+    return Filter(plan, conjoin(ops), estimated_rows) if ops else plan
+
+
+def _joins_by_lookup(table, ops):
+    """Whether one of the equalities ops can look rows of table up"""
+    for op in ops:
+        if type(op) == Equals:
+            for column in (op.left, op.right):
+                if isinstance(column, ColumnReference) and \
+                        column.table == table.name and (
+                        column == table.primary_key_ref or
+                        table.index_for(column) is not None):
+                    return True
+    return False
+
+
+def join_cost(left_rows, table, table_rows, ops, rows):
+    """Estimated rows touched joining left_rows rows to table, which has
+    table_rows rows matching its own conjuncts, on ops giving rows rows"""
+    if not ops:
+        return left_rows * table_rows + rows
+    cost = left_rows + len(table) + rows
+    if _joins_by_lookup(table, ops):
+        cost = min(cost, left_rows * LOOKUP_COST + rows)
+    return cost
+
+
+def order_joins(tables, ops, statistics):
+    """tables in the order joining them left to right is estimated to be
+    cheapest, ops being the conjuncts of the query.
+
+    The cheapest order of every set of tables is found by dynamic
+    programming, from the cheapest orders of its subsets one table smaller.
+    Tables joined by a conjunct to those already joined are preferred to
+    cross joins.
+    """
+    rows = {}
+    for table in tables:
+        own = [op for op in ops if tables_used(op) == {table.name}]
+        rows[table.name] = len(table) * selectivity(conjoin(own), statistics)
+    joins = [(tables_used(op), op) for op in ops if len(tables_used(op)) > 1]
+    # Maps sets of table names to (cost, rows, order) of their best order
+    level = {frozenset([table.name]): (rows[table.name], rows[table.name],
+                                       [table])
+             for table in tables}
+    for _ in range(len(tables) - 1):
+        next_level = {}
+        for joined, (cost, joined_rows, order) in level.items():
+            remaining = [table for table in tables
+                         if table.name not in joined]
+            connected = [table for table in remaining
+                         if any(table.name in used and
+                                used <= joined | {table.name}
+                                for used, _ in joins)]
+            for table in connected or remaining:
+                names = joined | {table.name}
+                join_ops = [op for used, op in joins
+                            if table.name in used and used <= names]
+                result_rows = joined_rows * rows[table.name] * selectivity(
+                    conjoin(join_ops), statistics)
+                total = cost + join_cost(joined_rows, table, rows[table.name],
+                                         join_ops, result_rows)
+                if names not in next_level or total < next_level[names][0]:
+                    next_level[names] = (total, result_rows, order + [table])
+        level = next_level
+    return level[frozenset(table.name for table in tables)][2]
+
+
+def use_merge_join(child, left_column, right_table):
+    """Whether a merge join of child, ascending on left_column, with
+    right_table on its primary key beats a primary key lookup per row.
+
+    The merge join walks every right entry within the range of the left
+    values once, lookups descend the primary key index once per left row.
+    """
+    if left_column not in child.ordering or \
+            child.estimated_rows < MERGE_JOIN_MIN_ROWS:
+        return False
+    right_size = right_table.count_range(*child.ordering[left_column])
+    return right_size <= child.estimated_rows * right_table.pk_height
+
+
+class Planner:
+    """Turns statements into trees of executor operators"""
+
+    def __init__(self, database):
+        self.database = database
+
+    def plan_select(self, select: Select):
+        database = self.database
+        from_clause = select.from_clause
+        main_table = database._get_table(from_clause.table)
+        joins = from_clause.joins
+        tables = [main_table] + [database._get_table(joined_table.table)
+                                 for joined_table in joins]
+        statistics = self._statistics(tables)
+        # Each conjunct of the where clause is applied as soon as every table
+        # it reads is available: single table conjuncts at their table's
+        # scan, the others straight after the join bringing in their last
+        # table
+        pending = [op for op in conjuncts(select.where)
+                   if type(op) != TrueOp]
+        if statistics is not None and \
+                1 < len(tables) <= MAX_JOIN_ORDER_TABLES:
+            # Inner joins give the same rows in any order, with their ON
+            # conditions applied like WHERE equalities
+            pending += [Equals(joined_table.left, joined_table.right)
+                        for joined_table in joins
+                        if joined_table.left is not None]
+            order = order_joins(tables, pending, statistics)
+            logger.debug('Joining in order %s',
+                         ', '.join(table.name for table in order))
+            main_table = order[0]
+            joins = [JoinTable(TableReference(table.name), None, None)
+                     for table in order[1:]]
+        # Scans only read the columns the query does
+        needed = columns_needed(select)
+        main_ops = self._take(pending, {main_table.name})
+        plan = filtered(access_path(main_table, conjoin(main_ops),
+                                    scan_columns(main_table, needed)),
+                        main_ops,
+                        self._estimate(main_table, main_ops, statistics))
+        available = {main_table.name}
+        for joined_table in joins:
+            plan = self._plan_join(plan, joined_table, pending, available,
+                                   statistics, needed)
+            available.add(joined_table.table.name)
+            ops = self._take(pending, available)
+            plan = filtered(plan, ops, self._estimate(plan, ops, statistics))
+        # Conjuncts on tables not in the query, which fail on evaluation
+        plan = filtered(plan, pending)
+        limit = select.limit
+        offset = select.offset or 0
+        if select.order_by and select.order_by.columns:
+            order_by = select.order_by
+            if len(order_by.columns) == 1 and not order_by.reverse and \
+                    order_by.columns[0] in plan.ordering:
+                logger.debug('Rows already ordered by %s',
+                             order_by.columns[0])
+            else:
+                plan = Sort(plan, order_by,
+                            None if limit is None else offset + limit)
+        elif offset and not joins and type(plan) == Scan and \
+                main_table.primary_key_ref in plan.ordering and \
+                plan.ordering[main_table.primary_key_ref] == UNBOUNDED:
+            # Position straight on the first row wanted
+            columns = scan_columns(main_table, needed)
+            column_indexes = _column_indexes(main_table, columns)
+            plan = Scan(main_table,
+                        lambda start=offset: main_table.scan_from(
+                            start, column_indexes),
+                        max(0, len(main_table) - offset),
+                        plan.ordering,
+                        'primary key from position {}'.format(offset),
+                        columns)
+            offset = 0
+        if limit is not None or offset:
+            plan = Limit(plan, limit, offset)
+        return Project(plan, select.columns)
+
+    def _statistics(self, tables):
+        """TableStatistics of tables by name, or None unless all of them
+        have been analyzed"""
+        statistics = {}
+        for table in tables:
+            if table.statistics is None:
+                return None
+            statistics[table.name] = table.statistics
+        return statistics
+
+    @staticmethod
+    def _estimate(source, ops, statistics):
+        """Rows of source, a table or operator, matching ops, or None
+        without statistics"""
+        if statistics is None or not ops:
+            return None
+        rows = len(source) if not isinstance(source, Operator) else \
+            source.estimated_rows
+        return max(1, round(rows * selectivity(conjoin(ops), statistics)))
+
+    @staticmethod
+    def _take(pending, tables):
+        """Remove and return the pending conjuncts reading only tables"""
+        taken = [op for op in pending if tables_used(op) <= tables]
+        pending[:] = [op for op in pending if op not in taken]
+        return taken
+
+    @staticmethod
+    def _join_condition(pending, right_table, available):
+        """Remove and return the (left, right) columns and operation of a
+        pending equality between an available table and right_table, or
+        None. Equalities on the primary key or an index of right_table
+        come first."""
+        conditions = []
+        for op in pending:
+            if type(op) != Equals or \
+                    not isinstance(op.left, ColumnReference) or \
+                    not isinstance(op.right, ColumnReference):
+                continue
+            left, right = op.left, op.right
+            if left.table == right_table.name:
+                left, right = right, left
+            if right.table == right_table.name and left.table in available:
+                rank = 0 if right == right_table.primary_key_ref else \
+                    1 if right_table.index_for(right) is not None else 2
+                conditions.append((rank, len(conditions), left, right, op))
+        if not conditions:
+            return None
+        _, _, left, right, op = min(conditions)
+        pending.remove(op)
+        return left, right, op
+
+    def _plan_join(self, plan, joined_table: JoinTable, pending, available,
+                   statistics=None, needed=None):
+        right_table = self.database._get_table(joined_table.table)
+        right_ops = self._take(pending, {right_table.name})
+        right_path = access_path(right_table, conjoin(right_ops),
+                                 None if needed is None else
+                                 scan_columns(right_table, needed))
+        right_scan = filtered(right_path, right_ops,
+                              self._estimate(right_table, right_ops,
+                                             statistics))
+        left, right = joined_table.left, joined_table.right
+        if left is None:
+            condition = self._join_condition(pending, right_table, available)
+            if condition is None:
+                return CrossJoin(plan, right_scan)
+            logger.debug('Using where clause %s = %s to join %s',
+                         condition[0], condition[1], right_table.name)
+            left, right, op = condition
+        else:
+            op = Equals(left, right)
+        join = self._join_operator(plan, right_table, right_path, right_scan,
+                                   right_ops, left, right)
+        if statistics is not None:
+            join.estimated_rows = max(1, round(
+                plan.estimated_rows * right_scan.estimated_rows *
+                selectivity(op, statistics)))
+        return join
+
+    def _join_operator(self, plan, right_table, right_path, right_scan,
+                       right_ops, left, right):
+        """Operator joining plan to right_table, whose rows matching its own
+        conjuncts right_ops are right_scan, read through right_path"""
+        right_where = conjoin(right_ops) if right_ops else None
+        index = right_table.index_for(right)
+        is_pk_join = right == right_table.primary_key_ref
+        narrowed = right_ops and \
+            right_path.estimated_rows < plan.estimated_rows
+        if (is_pk_join or index is not None) and not narrowed:
+            if is_pk_join and use_merge_join(plan, left, right_table):
+                logger.debug('Using merge join on %s', right_table.name)
+                return MergeJoin(plan, right_table, left, right, right_where)
+            if is_pk_join:
+                logger.debug('Using primary key index for join on %s',
+                             right_table.name)
+                index = None
+            else:
+                logger.debug('Using index %s for join on %s', index.name,
+                             right_table.name)
+            return IndexJoin(plan, right_table, left, right, index,
+                             right_where)
+        # The right table's own conjuncts narrow it down to fewer rows than
+        # there are lookups to make, or it has no index to look up at all
+        logger.debug('Using hash join on %s', right_table.name)
+        return HashJoin(plan, right_scan, left, right,
+                        self.database.join_memory_limit)
@@ -0,0 +1,160 @@
+"""Prepared statements and the cache of them reused by Database.execute.
+
+Parsing and planning a statement often takes longer than running it, so a
+statement prepared once is kept parsed, and a SELECT keeps its plan, to run
+again with new values bound to its ? parameters:
+
+    insert = db.prepare('INSERT INTO t VALUES(?, ?)')
+    for row in rows:
+        insert.execute(row)
+    db.execute('SELECT t.b FROM t WHERE t.a = ?', (1,))
+
+Plans are made again once the tables or indexes they may use change, or a
+table they read has grown or shrunk too far for their estimates to hold.
+"""
+import re
+import weakref
+from collections import OrderedDict
+
+from python_sql.logic import Insert
+from python_sql.parser import parse
+
+# Statements kept by the cache of each Database
+DEFAULT_STATEMENT_CACHE_SIZE = 256
+# Factor a table may grow or shrink by before plans reading it are redone
+REPLAN_GROWTH = 2
+# String literals, kept as they are, or runs of whitespace
+_LAYOUT = re.compile(r"('(?:[^']|'')*')|\s+")
+# Whitespace that may need normalizing
+_UNUSUAL_LAYOUT = re.compile(r"\s\s|[^\S ]|^\s|\s$")
+
+
+def normalize(sql):
+    """sql with the whitespace between tokens made single spaces, so that
+    statements only laid out differently share a cache entry"""
+    if _UNUSUAL_LAYOUT.search(sql) is None:
+        return sql
+    return _LAYOUT.sub(lambda match: match.group(1) or ' ', sql).strip()
+
+
+class PreparedStatement:
+    """A statement parsed once, run any number of times by execute or
+    stream with values bound to its ? parameters"""
+
+    def __init__(self, database, command, bindings=None, sql=None):
+        self.database = database
+        self.command = command
+        # Values of the parameters, read by the statement as it runs
+        self.bindings = [] if bindings is None else bindings
+        self.sql = sql
+        self._plan = None
+        # (schema version, [(table, rows)]) when the plan was made
+        self._planned = None
+        # Streams of the statement, made when first streamed
+        self._streams = None
+
+    @classmethod
+    def parse(cls, database, sql):
+        bindings = []
+        return cls(database, parse(sql, bindings), bindings, sql)
+
+    def execute(self, parameters=()):
+        return self.database.execute(self, parameters)
+
+    def stream(self, parameters=()):
+        return self.database.stream(self, parameters)
+
+    @property
+    def streaming(self):
+        """Whether rows are still to be pulled from a stream of the
+        statement, which binding other values would change"""
+        return self._streams is not None and any(
+            rows.gi_frame is not None for rows in self._streams)
+
+    def bind(self, parameters):
+        if len(parameters) != len(self.bindings):
+            raise Exception('Expected {} parameters but got {}'.format(
+                len(self.bindings), len(parameters)))
+        if self.bindings and self.streaming:
+            raise Exception(
+                'Cannot bind parameters while the statement is streamed')
+        self.bindings[:] = parameters
+
+    def plan(self):
+        """The plan of the SELECT, made again when stale"""
+        if self._plan is None or self._stale():
+            database = self.database
+            self._plan = database.planner.plan_select(self.command)
+            from_clause = self.command.from_clause
+            tables = [database._get_table(from_clause.table)] + \
+                [database._get_table(joined_table.table)
+                 for joined_table in from_clause.joins]
+            self._planned = (database.schema_version,
+                             [(table, len(table)) for table in tables])
+        return self._plan
+
+    def _stale(self):
+        version, sizes = self._planned
+        if version != self.database.schema_version:
+            return True
+        for table, rows in sizes:
+            if not rows // REPLAN_GROWTH <= len(table) <= \
+                    max(1, rows) * REPLAN_GROWTH:
+                return True
+        return False
+
+    def rows(self, rows):
+        """Pass on rows of a stream of the statement, which keeps the values
+        bound until they run out or are no longer wanted"""
+        if not self.bindings:
+            return iter(rows)
+        rows = self._pass_on(rows)
+        if self._streams is None:
+            self._streams = weakref.WeakSet()
+        self._streams.add(rows)
+        return rows
+
+    @staticmethod
+    def _pass_on(rows):
+        yield from rows
+
+    def __repr__(self):
+        return self.sql if self.sql is not None else repr(self.command)
+
+
+class StatementCache:
+    """The statements most recently prepared from SQL, by normalized SQL"""
+
+    def __init__(self, size=DEFAULT_STATEMENT_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._statements = OrderedDict()
+
+    def get(self, database, sql) -> PreparedStatement:
+        """The statement cached for sql, or a new one. The statement cached
+        is not shared while it is being streamed."""
+        key = normalize(sql)
+        statement = self._statements.get(key)
+        if statement is not None and not (statement.bindings and
+                                          statement.streaming):
+            self.hits += 1
+            self._statements.move_to_end(key)
+            return statement
+        self.misses += 1
+        statement = PreparedStatement.parse(database, sql)
+        # INSERTs of literal values are rarely run again, and may hold a lot
+        # of them
+        if self.size > 0 and (statement.bindings or
+                              type(statement.command) != Insert):
+            self._statements[key] = statement
+            self._statements.move_to_end(key)
+            if len(self._statements) > self.size:
+                self._statements.popitem(last=False)
+        return statement
+
+    def clear(self):
+        self._statements.clear()
+
+    def __len__(self):
+        return len(self._statements)
@@ -0,0 +1,203 @@
+"""Table statistics collected by ANALYZE and the selectivity estimates the
+planner derives from them."""
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from python_sql.logic import *
+
+# Buckets in each equi-depth histogram
+HISTOGRAM_BUCKETS = 32
+# Fraction of rows assumed to match a predicate nothing is known about
+DEFAULT_SELECTIVITY = 1 / 3
+LOWER_BOUNDS = (GreaterThan, GreaterThanEquals)
+UPPER_BOUNDS = (LessThan, LessThanEquals)
+
+
+class ColumnStatistics(
+    namedtuple('ColumnStatistics',
+               ['rows', 'nulls', 'distinct', 'min', 'max', 'histogram'])):
+    # rows: int, including NULLs
+    # nulls: int
+    # distinct: int, distinct non NULL values
+    # min, max: smallest and largest non NULL values
+    # histogram: List, upper bounds of buckets each holding about the same
+    #   number of non NULL values, the first starting at min
+
+    @classmethod
+    def from_values(cls, values, buckets=HISTOGRAM_BUCKETS):
+        rows = len(values)
+        values = sorted(value for value in values if value is not None)
+        nulls = rows - len(values)
+        if not values:
+            return cls(rows, nulls, 0, None, None, [])
+        distinct = 1 + sum(1 for previous, value in zip(values, values[1:])
+                           if value != previous)
+        buckets = min(buckets, len(values))
+        histogram = [values[-(-(i + 1) * len(values) // buckets) - 1]
+                     for i in range(buckets)]
+        return cls(rows, nulls, distinct, values[0], values[-1], histogram)
+
+    @property
+    def non_null(self):
+        """Fraction of rows that are not NULL"""
+        return (self.rows - self.nulls) / self.rows if self.rows else 0.0
+
+    def equals(self, value):
+        """Fraction of rows equal to value"""
+        if value is None or not self.distinct or \
+                not self._comparable(value) or \
+                not self.min <= value <= self.max:
+            return 0.0
+        # A value ending several buckets is frequent enough to estimate from
+        # the histogram, others are assumed as frequent as the average
+        bounds = bisect_right(self.histogram, value) - \
+            bisect_left(self.histogram, value)
+        if bounds > 1:
+            return self.non_null * bounds / len(self.histogram)
+        return self.non_null / self.distinct
+
+    def at_most(self, value):
+        """Fraction of rows less than or equal to value"""
+        if not self.distinct or not self._comparable(value):
+            return DEFAULT_SELECTIVITY
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return self.non_null
+        buckets = len(self.histogram)
+        full = bisect_right(self.histogram, value)
+        low = self.histogram[full - 1] if full else self.min
+        high = self.histogram[full]
+        if value == low:
+            partial = 0.0
+        elif isinstance(value, (int, float)) and high > low:
+            # Interpolate within the bucket holding value
+            partial = (value - low) / (high - low)
+        else:
+            partial = 0.5
+        return min(1.0, (full + partial) / buckets) * self.non_null
+
+    def range(self, start=None, stop=None, include_start=True,
+              include_stop=False):
+        """Fraction of rows between start and stop"""
+        high = self.non_null if stop is None else self.at_most(stop)
+        if stop is not None and not include_stop:
+            high -= self.equals(stop)
+        low = 0.0 if start is None else self.at_most(start)
+        if start is not None and include_start:
+            low -= self.equals(start)
+        return min(1.0, max(0.0, high - low))
+
+    def _comparable(self, value):
+        try:
+            self.min < value
+            return True
+        except TypeError:
+            return False
+
+
+class TableStatistics(namedtuple('TableStatistics', ['rows', 'columns'])):
+    # rows: int
+    # columns: Dict[str, ColumnStatistics]
+    pass
+
+
+def analyze(table) -> TableStatistics:
+    """Statistics of every column of table, from a scan of each column in
+    turn so that only one column's values are held at a time"""
+    columns = {}
+    for i, column_def in enumerate(table.column_defs):
+        columns[column_def.name] = ColumnStatistics.from_values(
+            [value for value, in table.scan(column_indexes=[i])])
+    return TableStatistics(len(table), columns)
+
+
+def _column_statistics(column_ref, statistics):
+    if not isinstance(column_ref, ColumnReference):
+        return None
+    table_statistics = statistics.get(column_ref.table)
+    if table_statistics is None:
+        return None
+    return table_statistics.columns.get(column_ref.column)
+
+
+def selectivity(op, statistics):
+    """Estimated fraction of rows matching op, statistics mapping table
+    names to their TableStatistics"""
+    op_type = type(op)
+    if op is TrueOp or op_type == TrueOp:
+        return 1.0
+    elif op is FalseOp or op_type == FalseOp:
+        return 0.0
+    elif op_type == And:
+        bounded = _bounded_range(op, statistics)
+        if bounded is not None:
+            return bounded
+        return selectivity(op.left, statistics) * \
+            selectivity(op.right, statistics)
+    elif op_type == Or:
+        left = selectivity(op.left, statistics)
+        right = selectivity(op.right, statistics)
+        return left + right - left * right
+    elif op_type == Not:
+        return 1.0 - selectivity(op.operation, statistics)
+    elif op_type == InFunc:
+        column = _column_statistics(op.left, statistics)
+        if column is None or not all(isinstance(value, Literal)
+                                     for value in op.values):
+            return DEFAULT_SELECTIVITY
+        values = {value.value for value in op.values}
+        return min(1.0, sum(column.equals(value) for value in values))
+    elif not isinstance(op, Terminal):
+        return DEFAULT_SELECTIVITY
+    left = _column_statistics(op.left, statistics)
+    right = _column_statistics(op.right, statistics)
+    if left is not None and right is not None:
+        if op_type == Equals:
+            return join_selectivity(left, right)
+        return DEFAULT_SELECTIVITY
+    if left is None or not isinstance(op.right, Literal):
+        return DEFAULT_SELECTIVITY
+    value = op.right.value
+    if op_type == Equals:
+        return left.equals(value)
+    elif op_type == NotEquals:
+        return max(0.0, left.non_null - left.equals(value))
+    elif op_type == GreaterThan:
+        return left.range(value, None, False)
+    elif op_type == GreaterThanEquals:
+        return left.range(value, None, True)
+    elif op_type == LessThan:
+        return left.range(None, value, True, False)
+    elif op_type == LessThanEquals:
+        return left.range(None, value, True, True)
+    return DEFAULT_SELECTIVITY
+
+
+def _bounded_range(op: And, statistics):
+    """Selectivity of a lower and an upper bound on the same column, such
+    as a BETWEEN, which are far from independent of each other"""
+    bounds = {}
+    for side in (op.left, op.right):
+        if type(side) not in LOWER_BOUNDS + UPPER_BOUNDS or \
+                not isinstance(side.right, Literal):
+            return None
+        bounds[type(side) in LOWER_BOUNDS] = side
+    lower, upper = bounds.get(True), bounds.get(False)
+    if lower is None or upper is None or lower.left != upper.left:
+        return None
+    column = _column_statistics(lower.left, statistics)
+    if column is None:
+        return None
+    return column.range(lower.right.value, upper.right.value,
+                        type(lower) == GreaterThanEquals,
+                        type(upper) == LessThanEquals)
+
+
+def join_selectivity(left: ColumnStatistics, right: ColumnStatistics):
+    """Fraction of the pairs of rows with equal values in both columns,
+    assuming the values of the column with fewer are all in the other"""
+    distinct = max(left.distinct, right.distinct)
+    if not distinct:
+        return 0.0
+    return left.non_null * right.non_null / distinct
@@ -0,0 +1,211 @@
+"""Counters and timers for finding out what statements cost.
+
+Nothing is counted unless something asks for it. While instrumented, the
+methods doing the counted work are shadowed on the instances of the storage
+driver and B-trees by counting wrappers, which are removed again afterwards,
+so code running untraced pays nothing for any of this.
+
+    tracer = Tracer(RingBuffer(100))
+    db = Database(tracer=tracer)
+    db.execute(...)
+    for trace in tracer.exporter:
+        print(trace.statement, trace.phases, trace.counters)
+"""
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+COUNTERS = ('rows_scanned', 'index_probes', 'node_visits')
+PHASES = ('parse', 'plan', 'execute')
+
+
+class Counters:
+    """Running totals of the work counted while instrumented, measured by
+    taking the difference of snapshots"""
+
+    def __init__(self):
+        self.rows_scanned = 0
+        self.index_probes = 0
+        self.node_visits = 0
+
+    def snapshot(self):
+        return {name: getattr(self, name) for name in COUNTERS}
+
+    def since(self, snapshot):
+        """Counts since snapshot was taken"""
+        return {name: getattr(self, name) - snapshot[name]
+                for name in COUNTERS}
+
+
+# Everything counted by instrumented code, whoever asked for it. Overlapping
+# measurements each see all of the work done while they run.
+totals = Counters()
+# Maps id of each patched object to [object, names patched, users]
+_patched = {}
+
+
+def _count_read_row(read_row):
+    def counted(*args, **kwargs):
+        totals.rows_scanned += 1
+        return read_row(*args, **kwargs)
+
+    return counted
+
+
+def _count_read_columns(read_columns):
+    def counted(*args, **kwargs):
+        for row in read_columns(*args, **kwargs):
+            totals.rows_scanned += 1
+            yield row
+
+    return counted
+
+
+def _count_search(tree, search):
+    def counted(*args, **kwargs):
+        totals.index_probes += 1
+        totals.node_visits += tree.height
+        return search(*args, **kwargs)
+
+    return counted
+
+
+def _visit(count):
+    totals.node_visits += count
+
+
+def _count_search_many(search_many):
+    def counted(keys):
+        totals.index_probes += 1
+        return search_many(keys, visited=_visit)
+
+    return counted
+
+
+def _count_range(tree, range_):
+    def counted(*args, **kwargs):
+        totals.index_probes += 1
+        totals.node_visits += tree.height
+        return range_(*args, visited=_visit, **kwargs)
+
+    return counted
+
+
+def _patch(owner, wrappers):
+    entry = _patched.get(id(owner))
+    if entry is not None:
+        entry[2] += 1
+        return
+    for name, wrap in wrappers.items():
+        setattr(owner, name, wrap(getattr(owner, name)))
+    _patched[id(owner)] = [owner, list(wrappers), 1]
+
+
+def _unpatch(owner):
+    entry = _patched[id(owner)]
+    entry[2] -= 1
+    if entry[2] == 0:
+        for name in entry[1]:
+            delattr(owner, name)
+        del _patched[id(owner)]
+
+
+@contextmanager
+def instrumented(tables, storage):
+    """Count the rows read from storage and the searches and nodes visited
+    in the primary key and indexes of tables into totals, until the block
+    exits"""
+    owners = [(storage, {'read_row': _count_read_row,
+                         'read_columns': _count_read_columns})]
+    for table in tables:
+        trees = [table._pk_index] + [index.tree for index in
+                                     table._indexes.values()]
+        for tree in trees:
+            owners.append((tree, {
+                'search': lambda method, tree=tree: _count_search(tree,
+                                                                  method),
+                'search_many': _count_search_many,
+                'range': lambda method, tree=tree: _count_range(tree,
+                                                                method)}))
+    for owner, wrappers in owners:
+        _patch(owner, wrappers)
+    try:
+        yield totals
+    finally:
+        for owner, _ in owners:
+            _unpatch(owner)
+
+
+class Trace(namedtuple('Trace', ['statement', 'phases', 'counters'])):
+    # statement: str or the parsed statement
+    # phases: Dict[str, float], seconds spent parsing, planning and executing
+    # counters: Dict[str, int], work done, named as in COUNTERS
+    pass
+
+
+class RingBuffer:
+    """Exporter keeping the last size traces in memory, oldest first"""
+
+    def __init__(self, size=1000):
+        self.traces = deque(maxlen=size)
+
+    def __call__(self, trace: Trace):
+        self.traces.append(trace)
+
+    def __iter__(self):
+        return iter(self.traces)
+
+    def __len__(self):
+        return len(self.traces)
+
+
+class Tracer:
+    """Traces every statement a Database runs, passing each Trace to
+    exporter, any function of one, and adding its counts to the tracer's
+    totals"""
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def start(self, statement, database):
+        return StatementTrace(self, statement, database)
+
+    def _finish(self, trace: Trace):
+        for name, seconds in trace.phases.items():
+            self.phases[name] += seconds
+        for name, count in trace.counters.items():
+            self.counters[name] += count
+        if self.exporter is not None:
+            self.exporter(trace)
+
+
+class StatementTrace:
+    """Measures one statement from start until finish"""
+
+    def __init__(self, tracer: Tracer, statement, database):
+        self.tracer = tracer
+        self.statement = statement
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self._instrumented = instrumented(list(database.tables.values()),
+                                          database.storage)
+        self._instrumented.__enter__()
+        self._snapshot = totals.snapshot()
+        self._finished = False
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        counters = totals.since(self._snapshot)
+        self._instrumented.__exit__(None, None, None)
+        self.tracer._finish(Trace(self.statement, self.phases, counters))
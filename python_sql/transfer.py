@@ -0,0 +1,199 @@
+"""Bulk loading of tables from, and export of query results to, CSV, TSV
+and JSON lines files.
+
+Files are streamed in batches of rows, each converted to the types of the
+table's columns and inserted with Table.insert_many, so no SQL is parsed
+and memory use does not grow with the file:
+
+    db.copy_from('main', 'main.csv', header=True)
+    db.execute("COPY main FROM 'main.jsonl'")
+
+Results are written the same way, in batches pulled from the plan as they
+are computed, so they are never held in memory as a whole:
+
+    db.export('SELECT main.id, main.cola FROM main', 'main.csv')
+    db.execute("COPY (SELECT main.id FROM main) TO 'ids.jsonl'")
+"""
+import csv
+import itertools
+import json
+import os
+
+# Rows read and inserted at a time
+BATCH_SIZE = 10000
+EXTENSIONS = {'.csv': 'csv', '.tsv': 'tsv', '.tab': 'tsv', '.jsonl': 'jsonl',
+              '.ndjson': 'jsonl'}
+
+
+def _to_int(value):
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError('{} is not an integer'.format(value))
+    return int(value)
+
+
+CONVERSIONS = {'int': _to_int, 'double': float, 'varchar': str}
+# Conversions of the strings of delimited files, None keeping them as they are
+TEXT_CONVERSIONS = {'int': int, 'double': float, 'varchar': None}
+
+
+def file_format(path, format=None):
+    """format, or the one told by the extension of path"""
+    if format is None:
+        format = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if format is None:
+            raise Exception(
+                'Cannot tell the format of {}, give one with FORMAT'.format(
+                    path))
+    if format not in READERS or format not in WRITERS:
+        raise Exception('Unsupported format: {}'.format(format))
+    return format
+
+
+def _read_delimited(file, names, header, delimiter):
+    """Lists of the values of each line, in the order of names when the
+    header names the fields"""
+    reader = csv.reader(file, delimiter=delimiter)
+    order = None
+    if header:
+        fields = next(reader, [])
+        missing = set(names) - set(fields)
+        if missing:
+            raise Exception('No field for columns {} in header'.format(
+                ', '.join(sorted(missing))))
+        order = [fields.index(name) for name in names]
+    for row in reader:
+        if order is not None:
+            if len(row) != len(fields):
+                raise ValueError('Expected {} fields but got {}'.format(
+                    len(fields), len(row)))
+            row = [row[i] for i in order]
+        yield row
+
+
+def read_csv(file, names, header):
+    return _read_delimited(file, names, header, ',')
+
+
+def read_tsv(file, names, header):
+    return _read_delimited(file, names, header, '\t')
+
+
+def read_jsonl(file, names, header):
+    """Lists of values from objects keyed by column name, their missing
+    keys NULL, or from arrays of every column's value"""
+    for line in file:
+        if not line.strip():
+            continue
+        value = json.loads(line)
+        if isinstance(value, dict):
+            yield [value.get(name) for name in names]
+        elif isinstance(value, list):
+            yield value
+        else:
+            raise ValueError('Expected an object or an array')
+
+
+READERS = {'csv': read_csv, 'tsv': read_tsv, 'jsonl': read_jsonl}
+
+
+def copy_from(table, path, format=None, header=False, batch_size=BATCH_SIZE):
+    """Insert the rows of the file at path into table, returning how many.
+
+    Every batch is checked and inserted as a whole by Table.insert_many,
+    the batches before one failing stay inserted.
+    """
+    format = file_format(path, format)
+    column_defs = table.column_defs[1:] if table.auto_pk else \
+        table.column_defs
+    names = [column_def.name for column_def in column_defs]
+    if format == 'jsonl':
+        conversions = [CONVERSIONS[column_def.type]
+                       for column_def in column_defs]
+
+        def convert_row(row):
+            return [None if value is None else convert(value)
+                    for convert, value in zip(conversions, row)]
+    else:
+        conversions = [TEXT_CONVERSIONS[column_def.type]
+                       for column_def in column_defs]
+
+        # Empty fields are NULL, but for varchar columns
+        def convert_row(row):
+            return [value if convert is None else
+                    None if value == '' else convert(value)
+                    for convert, value in zip(conversions, row)]
+    count = 0
+    with open(path, newline='' if format != 'jsonl' else None) as file:
+        rows = READERS[format](file, names, header)
+        number = 1
+        while True:
+            batch = []
+            try:
+                for row in itertools.islice(rows, batch_size):
+                    if len(row) != len(names):
+                        raise ValueError('Expected {} values but got '
+                                         '{}'.format(len(names), len(row)))
+                    batch.append(convert_row(row))
+                    number += 1
+            except (TypeError, ValueError, csv.Error) as e:
+                raise Exception('Cannot load row {} of {}: {}'.format(
+                    number, path, e))
+            if not batch:
+                return count
+            count += table.insert_many(batch)
+
+
+def field_names(columns):
+    """Names of the fields of the ColumnReferences selected, the names of
+    their columns unless those of two tables are the same"""
+    names = [column.as_name or column.column for column in columns]
+    if len(set(names)) < len(names):
+        names = [column.reference_name for column in columns]
+    return names
+
+
+def _write_delimited(file, names, header, batches, delimiter):
+    writer = csv.writer(file, delimiter=delimiter, lineterminator='\n')
+    if header:
+        writer.writerow(names)
+    for batch in batches:
+        writer.writerows(batch)
+
+
+def write_csv(file, names, header, batches):
+    _write_delimited(file, names, header, batches, ',')
+
+
+def write_tsv(file, names, header, batches):
+    _write_delimited(file, names, header, batches, '\t')
+
+
+def write_jsonl(file, names, header, batches):
+    """Objects keyed by field name, NULL values null"""
+    for batch in batches:
+        file.write(''.join([json.dumps(dict(zip(names, row))) + '\n'
+                            for row in batch]))
+
+
+WRITERS = {'csv': write_csv, 'tsv': write_tsv, 'jsonl': write_jsonl}
+
+
+def export(rows, names, path, format=None, header=False,
+           batch_size=BATCH_SIZE):
+    """Write rows, pulled batch_size at a time, to the file at path with
+    fields named names, returning how many. NULL values are written as
+    empty fields to CSV and TSV files."""
+    format = file_format(path, format)
+    count = 0
+
+    def batches():
+        nonlocal count
+        while True:
+            batch = [row.data for row in itertools.islice(rows, batch_size)]
+            if not batch:
+                return
+            count += len(batch)
+            yield batch
+    with open(path, 'w', newline='' if format != 'jsonl' else None) as file:
+        WRITERS[format](file, names, header, batches())
+    return count
@@ -0,0 +1,431 @@
+import random
+from array import array
+import unittest
+
+from python_sql.b_tree import BTree
+
+
+def leaves(tree):
+    node = tree._first_leaf()
+    while node is not None:
+        yield node
+        node = node.next_sibling
+
+
+def check_invariants(test, tree):
+    """Occupancy, ordering, counts and leaf depth of every node"""
+    degree = tree.degree
+    leaf_depths = set()
+
+    def visit(node, depth, low, high):
+        test.assertTrue(all(a < b for a, b in zip(node.keys, node.keys[1:])))
+        if node.keys:
+            test.assertTrue(low is None or low <= node.keys[0])
+            test.assertTrue(high is None or node.keys[-1] < high)
+        if node.is_leaf:
+            leaf_depths.add(depth)
+            test.assertLessEqual(len(node.keys), degree - 1)
+            if node is not tree.root:
+                test.assertGreaterEqual(len(node.keys), degree // 2)
+            return len(node.keys)
+        test.assertEqual(len(node.keys) + 1, len(node.children))
+        test.assertLessEqual(len(node.children), degree)
+        if node is not tree.root:
+            test.assertGreaterEqual(len(node.children), (degree + 1) // 2)
+        else:
+            test.assertGreaterEqual(len(node.children), 2)
+        bounds = [low] + list(node.keys) + [high]
+        counts = [visit(child, depth + 1, bounds[i], bounds[i + 1])
+                  for i, child in enumerate(node.children)]
+        test.assertEqual(counts, list(node.counts))
+        test.assertEqual(sum(counts), node.size)
+        return node.size
+
+    test.assertEqual(len(tree), visit(tree.root, 0, None, None))
+    test.assertEqual(1, len(leaf_depths))
+
+
+class TestBTree(unittest.TestCase):
+    def test_degree_too_small(self):
+        with self.assertRaises(Exception):
+            BTree(2)
+
+    def test_random_insert(self):
+        keys = list(range(2000))
+        random.Random(1).shuffle(keys)
+        for degree in (3, 4, 5, 64):
+            tree = BTree(degree)
+            for k in keys:
+                tree[k] = 'v{}'.format(k)
+            self.assertEqual(list(range(2000)), list(tree))
+            self.assertEqual(list(reversed(range(2000))), list(reversed(tree)))
+            for k in keys:
+                self.assertEqual('v{}'.format(k), tree[k])
+            self.assertNotIn(2000, tree)
+            self.assertNotIn(-1, tree)
+
+    def test_replace(self):
+        tree = BTree(4)
+        for k in range(100):
+            tree[k] = k
+        tree[50] = 'fifty'
+        self.assertEqual('fifty', tree[50])
+        self.assertEqual(100, len(tree))
+
+    def test_sibling_links(self):
+        keys = list(range(500))
+        random.Random(2).shuffle(keys)
+        tree = BTree(4)
+        for k in keys:
+            tree[k] = k
+        prev = None
+        for leaf in leaves(tree):
+            self.assertIs(prev, leaf.prev_sibling)
+            prev = leaf
+
+    def test_fanout_height(self):
+        small = BTree(4)
+        large = BTree(128)
+        for k in range(10000):
+            small[k] = k
+            large[k] = k
+        self.assertGreater(small.height, large.height)
+        self.assertLessEqual(large.height, 3)
+
+    def test_slice(self):
+        tree = BTree(4)
+        for k in range(0, 100, 2):
+            tree[k] = k
+        self.assertEqual(list(range(10, 20, 2)), list(tree[10:20]))
+        self.assertEqual(list(range(11 + 1, 20, 2)), list(tree[11:20]))
+        self.assertEqual(list(range(90, 100, 2)), list(tree[90:]))
+
+    def test_len(self):
+        tree = BTree(4)
+        self.assertEqual(0, len(tree))
+        keys = list(range(1000))
+        random.Random(3).shuffle(keys)
+        for i, k in enumerate(keys):
+            tree[k] = k
+            self.assertEqual(i + 1, len(tree))
+        tree[5] = 'replaced'
+        self.assertEqual(1000, len(tree))
+
+    def test_rank_select(self):
+        keys = list(range(0, 3000, 3))
+        random.Random(4).shuffle(keys)
+        tree = BTree(5)
+        for k in keys:
+            tree[k] = 'v{}'.format(k)
+        for i, k in enumerate(range(0, 3000, 3)):
+            self.assertEqual((k, 'v{}'.format(k)), tree.select(i))
+            self.assertEqual(i, tree.rank(k))
+            self.assertEqual(i + 1, tree.rank(k + 1))
+        self.assertEqual((2997, 'v2997'), tree.select(-1))
+        self.assertEqual(0, tree.rank(-10))
+        self.assertEqual(1000, tree.rank(5000))
+        with self.assertRaises(IndexError):
+            tree.select(1000)
+
+    def test_count_range(self):
+        tree = BTree(4)
+        for k in range(0, 300, 3):
+            tree[k] = k
+        for start, stop in ((None, None), (0, 299), (3, 3), (4, 50), (50, 4),
+                            (-5, 400), (None, 30), (30, None)):
+            for include_start in (True, False):
+                for include_stop in (True, False):
+                    expected = len(list(tree.range(start, stop, include_start,
+                                                   include_stop)))
+                    self.assertEqual(expected, tree.count_range(
+                        start, stop, include_start, include_stop))
+
+    def test_insert_invariants(self):
+        keys = list(range(3000))
+        random.Random(5).shuffle(keys)
+        for degree in (3, 4, 7):
+            tree = BTree(degree)
+            for k in keys:
+                tree[k] = k
+            check_invariants(self, tree)
+
+
+class TestBulkLoad(unittest.TestCase):
+    def test_sizes(self):
+        for degree in (3, 4, 5, 16):
+            for size in list(range(0, 60)) + [500, 1001]:
+                for fill_factor in (1.0, 0.7, 0.1):
+                    tree = BTree.from_sorted(
+                        ((k, 'v{}'.format(k)) for k in range(size)), degree,
+                        fill_factor)
+                    check_invariants(self, tree)
+                    self.assertEqual(list(range(size)), list(tree))
+                    self.assertEqual(size, len(tree))
+                    for k in range(size):
+                        self.assertEqual('v{}'.format(k), tree[k])
+                    prev = None
+                    for leaf in leaves(tree):
+                        self.assertIs(prev, leaf.prev_sibling)
+                        prev = leaf
+
+    def test_insert_after_load(self):
+        tree = BTree.from_sorted(((k, k) for k in range(0, 2000, 2)), 8, 0.75)
+        for k in range(1, 2000, 2):
+            tree[k] = k
+        check_invariants(self, tree)
+        self.assertEqual(list(range(2000)), list(tree))
+
+    def test_fill_factor(self):
+        full = BTree.from_sorted(((k, k) for k in range(10000)), 64)
+        sparse = BTree.from_sorted(((k, k) for k in range(10000)), 64, 0.5)
+        self.assertLess(sum(1 for _ in leaves(full)),
+                        sum(1 for _ in leaves(sparse)))
+        with self.assertRaises(Exception):
+            BTree.from_sorted([], 64, 0)
+
+    def test_unsorted(self):
+        with self.assertRaises(Exception):
+            BTree.from_sorted([(1, 1), (3, 3), (2, 2)], 4)
+        with self.assertRaises(Exception):
+            BTree.from_sorted(((k // 2, k) for k in range(100)), 4)
+
+
+class TestUpdateSorted(unittest.TestCase):
+    def check(self, tree, expected):
+        check_invariants(self, tree)
+        self.assertEqual(sorted(expected.items()), list(tree.items()))
+        prev = None
+        for leaf in leaves(tree):
+            self.assertIs(prev, leaf.prev_sibling)
+            prev = leaf
+
+    def test_random_batches(self):
+        rng = random.Random(3)
+        for degree in (3, 4, 7, 32):
+            tree = BTree(degree)
+            expected = {}
+            for size in (1, 5, 200, 3, 1000, 40, 2000, 1):
+                batch = {rng.randrange(5000): rng.random()
+                         for _ in range(size)}
+                tree.update_sorted(sorted(batch.items()))
+                expected.update(batch)
+                self.check(tree, expected)
+
+    def test_appending(self):
+        tree = BTree(5, 'q', 'q')
+        for start in range(0, 1000, 100):
+            tree.update_sorted((k, -k) for k in range(start, start + 100))
+        self.check(tree, {k: -k for k in range(1000)})
+        tree.update_sorted([])
+        self.assertEqual(1000, len(tree))
+
+    def test_unsorted(self):
+        tree = BTree(4)
+        with self.assertRaises(Exception):
+            tree.update_sorted([(1, 1), (3, 3), (2, 2)])
+        with self.assertRaises(Exception):
+            tree.update_sorted([(1, 1), (1, 2)])
+        self.assertEqual(0, len(tree))
+
+
+class TestDelete(unittest.TestCase):
+    def test_delete_random(self):
+        for degree in (3, 4, 5, 8):
+            rng = random.Random(degree)
+            keys = list(range(1500))
+            rng.shuffle(keys)
+            tree = BTree(degree)
+            for k in keys:
+                tree[k] = k
+            rng.shuffle(keys)
+            remaining = set(keys)
+            for i, k in enumerate(keys):
+                del tree[k]
+                remaining.discard(k)
+                if i % 97 == 0:
+                    check_invariants(self, tree)
+                    self.assertEqual(sorted(remaining), list(tree))
+                    self.assertEqual(sorted(remaining, reverse=True),
+                                     list(reversed(tree)))
+            self.assertEqual(0, len(tree))
+            self.assertEqual(1, tree.height)
+            self.assertEqual([], list(tree))
+
+    def test_delete_missing(self):
+        tree = BTree(4)
+        for k in range(0, 100, 2):
+            tree[k] = k
+        with self.assertRaises(KeyError):
+            del tree[3]
+        check_invariants(self, tree)
+        self.assertEqual(50, len(tree))
+        self.assertEqual(4, tree.pop(4))
+        self.assertIsNone(tree.search(4))
+
+    def test_churn(self):
+        rng = random.Random(6)
+        tree = BTree(6)
+        expected = {}
+        for i in range(20000):
+            k = rng.randrange(500)
+            if k in expected and rng.random() < 0.5:
+                del tree[k]
+                del expected[k]
+            else:
+                tree[k] = i
+                expected[k] = i
+        check_invariants(self, tree)
+        self.assertEqual(sorted(expected.items()), list(tree.items()))
+        for i, k in enumerate(sorted(expected)):
+            self.assertEqual(i, tree.rank(k))
+
+
+class TestCompactNodes(unittest.TestCase):
+    def test_no_instance_dict(self):
+        tree = BTree(4)
+        for k in range(20):
+            tree[k] = k
+        self.assertFalse(hasattr(tree.root, '__dict__'))
+        self.assertFalse(hasattr(tree._first_leaf(), '__dict__'))
+
+    def test_typed_arrays(self):
+        keys = list(range(3000))
+        random.Random(7).shuffle(keys)
+        tree = BTree(5, 'q', 'q')
+        for k in keys:
+            tree[k] = k * 2
+        check_invariants(self, tree)
+        self.assertEqual([(k, k * 2) for k in range(3000)], list(tree.items()))
+        self.assertIsInstance(tree.root.keys, array)
+        self.assertIsInstance(tree._first_leaf().values, array)
+        for k in keys[:2500]:
+            del tree[k]
+        check_invariants(self, tree)
+        self.assertEqual(sorted(keys[2500:]), list(tree))
+        with self.assertRaises(TypeError):
+            tree['a'] = 1
+
+    def test_typed_bulk_load(self):
+        tree = BTree.from_sorted(((k, k) for k in range(1000)), 8, 1.0,
+                                 'q', 'q')
+        check_invariants(self, tree)
+        self.assertIsInstance(tree.root.keys, array)
+        self.assertIsInstance(tree._first_leaf().keys, array)
+        tree[1000] = 1000
+        self.assertEqual(1000, tree[1000])
+
+    def test_memory_usage(self):
+        boxed = BTree.from_sorted(((k, k) for k in range(10000)), 128)
+        typed = BTree.from_sorted(((k, k) for k in range(10000)), 128, 1.0,
+                                  'q', 'q')
+        usage = typed.memory_usage()
+        self.assertEqual(10000, usage.keys)
+        self.assertEqual(usage.nodes - usage.leaves, 1)
+        self.assertLess(usage.bytes_per_key * 2,
+                        boxed.memory_usage().bytes_per_key)
+
+
+class TestSearchMany(unittest.TestCase):
+    def test_search_many(self):
+        tree = BTree(4)
+        for k in range(0, 1000, 2):
+            tree[k] = 'v{}'.format(k)
+        rng = random.Random(6)
+        for count in (0, 1, 5, 50, 700):
+            keys = sorted(set(rng.randrange(-10, 1010) for _ in range(count)))
+            expected = [(k, 'v{}'.format(k)) for k in keys
+                        if 0 <= k < 1000 and k % 2 == 0]
+            self.assertEqual(expected, list(tree.search_many(keys)))
+
+    def test_empty(self):
+        self.assertEqual([], list(BTree(4).search_many([1, 2])))
+
+    def test_visited(self):
+        tree = BTree.from_sorted(((i, i) for i in range(0, 2000, 2)), 8)
+        visits = []
+        found = tree.search_many([2, 4, 16, 1998], visited=visits.append)
+        self.assertEqual([], visits)
+        self.assertEqual((2, 2), next(found))
+        self.assertEqual([tree.height], visits)
+        list(found)
+        # 16 is in the next leaf, 1998 is found from the root again
+        self.assertEqual([tree.height, 1, tree.height], visits)
+        visits = []
+        self.assertEqual(14, len(list(tree.range(0, 28,
+                                                 visited=visits.append))))
+        # Two leaves of seven keys, then the third to find the stop in
+        self.assertEqual([1, 1], visits)
+        visits = []
+        list(tree.range(0, 28, reverse=True, visited=visits.append))
+        self.assertEqual([1], visits)
+
+
+class TestCursor(unittest.TestCase):
+    def setUp(self):
+        self.tree = BTree(4)
+        for k in range(0, 200, 2):
+            self.tree[k] = 'v{}'.format(k)
+
+    def keys(self, pairs):
+        return [k for k, _ in pairs]
+
+    def test_seek(self):
+        cursor = self.tree.cursor()
+        self.assertFalse(cursor.valid)
+        self.assertTrue(cursor.seek(10))
+        self.assertEqual((10, 'v10'), (cursor.key, cursor.value))
+        self.assertTrue(cursor.seek(10, inclusive=False))
+        self.assertEqual(12, cursor.key)
+        self.assertTrue(cursor.seek(11))
+        self.assertEqual(12, cursor.key)
+        self.assertFalse(cursor.seek(199))
+        self.assertTrue(cursor.seek_before(11))
+        self.assertEqual(10, cursor.key)
+        self.assertTrue(cursor.seek_before(10, inclusive=False))
+        self.assertEqual(8, cursor.key)
+        self.assertFalse(cursor.seek_before(0, inclusive=False))
+        self.assertTrue(cursor.seek_position(50))
+        self.assertEqual(100, cursor.key)
+        self.assertFalse(cursor.seek_position(100))
+
+    def test_next_prev(self):
+        cursor = self.tree.cursor()
+        cursor.seek_first()
+        keys = [cursor.key]
+        while cursor.next():
+            keys.append(cursor.key)
+        self.assertEqual(list(range(0, 200, 2)), keys)
+        cursor.seek_last()
+        keys = [cursor.key]
+        while cursor.prev():
+            keys.append(cursor.key)
+        self.assertEqual(list(range(198, -1, -2)), keys)
+
+    def test_range(self):
+        tree = self.tree
+        self.assertEqual(list(range(10, 20, 2)), self.keys(tree.range(10, 20)))
+        self.assertEqual(list(range(10, 21, 2)),
+                         self.keys(tree.range(10, 20, include_stop=True)))
+        self.assertEqual(list(range(12, 20, 2)),
+                         self.keys(tree.range(10, 20, include_start=False)))
+        self.assertEqual(list(range(0, 7, 2)),
+                         self.keys(tree.range(stop=6, include_stop=True)))
+        self.assertEqual(list(range(190, 200, 2)), self.keys(tree.range(189)))
+        self.assertEqual([], self.keys(tree.range(20, 10)))
+        self.assertEqual([], self.keys(tree.range(10, 10)))
+        self.assertEqual([10], self.keys(tree.range(10, 10, True, True)))
+        self.assertEqual([(4, 'v4')], list(tree.range(3, 5)))
+
+    def test_range_reverse(self):
+        tree = self.tree
+        self.assertEqual(list(range(18, 9, -2)),
+                         self.keys(tree.range(10, 20, reverse=True)))
+        self.assertEqual(list(range(20, 11, -2)),
+                         self.keys(tree.range(10, 20, False, True, True)))
+        self.assertEqual(list(range(198, -1, -2)),
+                         self.keys(tree.range(reverse=True)))
+        self.assertEqual(list(range(4, -1, -2)),
+                         self.keys(tree.range(stop=5, reverse=True)))
+
+    def test_slice_ascending(self):
+        self.assertEqual(['v0', 'v2', 'v4'], list(self.tree[:6]))
@@ -0,0 +1,141 @@
+import unittest
+
+from python_sql.columnar import ColumnarStorageDriver
+from python_sql.database import Database, MemoryStorageDriver
+from python_sql.executor import Scan
+from python_sql.parser import parse
+
+
+class CountingColumnarStorageDriver(ColumnarStorageDriver):
+    def __init__(self):
+        super().__init__()
+        self.columns_read = []
+
+    def read_columns(self, table_name, data_indexes, column_indexes):
+        self.columns_read.append(list(column_indexes))
+        return super().read_columns(table_name, data_indexes, column_indexes)
+
+
+class TestColumnarStorageDriver(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingColumnarStorageDriver()
+        self.db = Database(self.storage)
+        self.db.execute('CREATE TABLE main(id int primary key, x double, '
+                        'name varchar(8), n int)')
+        self.table = self.db.tables['main']
+        self.table.insert_many([[i, i / 2, 'v{}'.format(i % 3), i % 5]
+                                for i in range(100)])
+        self.table.insert_many([[100, None, None, None]])
+
+    def test_read_row(self):
+        self.assertEqual((7, 3.5, 'v1', 2), self.table.get_row_by_pk(7))
+        self.assertEqual((100, None, None, None),
+                         self.table.get_row_by_pk(100))
+        columns = self.storage._columns['main']
+        self.assertEqual(['v0', 'v1', 'v2'], sorted(columns[2].dictionary[1:]))
+        self.assertEqual('B', columns[2].values.typecode)
+
+    def test_column_pruning(self):
+        rows = self.db.execute('SELECT main.name FROM main WHERE main.n = 4 '
+                               'AND main.id < 20')
+        self.assertEqual([('v1',), ('v0',), ('v2',), ('v1',)], rows)
+        self.assertEqual([[0, 2, 3]], self.storage.columns_read)
+        plan = self.db.planner.plan_select(parse(
+            'SELECT main.x FROM main ORDER BY main.id'))
+        scan = plan
+        while not isinstance(scan, Scan):
+            scan = scan.children[0]
+        self.assertEqual(['main.id', 'main.x'], list(map(str, scan.columns)))
+
+    def test_analyze(self):
+        self.db.execute('ANALYZE main')
+        self.assertEqual([[0], [1], [2], [3]], self.storage.columns_read)
+        statistics = self.table.statistics
+        self.assertEqual(101, statistics.rows)
+        self.assertEqual(3, statistics.columns['name'].distinct)
+        self.assertEqual(1, statistics.columns['n'].nulls)
+
+    def test_update_delete(self):
+        self.db.execute("UPDATE main SET main.name = 'new', main.x = 0 "
+                        "WHERE main.id = 4")
+        self.db.execute('DELETE FROM main WHERE main.n = 0')
+        self.assertEqual((4, 0.0, 'new', 4), self.table.get_row_by_pk(4))
+        self.assertIsNone(self.table.get_row_by_pk(5))
+        self.assertEqual(81, len(self.db.execute('SELECT main.id FROM main')))
+
+    def test_wide_dictionary(self):
+        self.table.insert_many([[i, 0, str(i), 0]
+                                for i in range(1000, 1400)])
+        self.assertEqual('H', self.storage._columns['main'][2].values.typecode)
+        self.assertEqual([('1399',)], self.db.execute(
+            'SELECT main.name FROM main WHERE main.id = 1399'))
+
+    def test_bad_values(self):
+        with self.assertRaisesRegex(Exception, 'column n'):
+            self.table.insert_many([[200, 1.5, 'a', 1], [201, 1, 'b', 'x']])
+        with self.assertRaisesRegex(Exception, 'column n'):
+            self.db.execute("INSERT INTO main VALUES(300, 1, 'a', 'one')")
+        # Nothing stored for the rows refused
+        self.assertEqual(101, len(self.storage._columns['main'][0].values))
+        self.assertEqual(101, len(self.db.execute(
+            'SELECT main.id, main.n FROM main')))
+
+
+    def test_refused_update(self):
+        self.db.execute('CREATE INDEX main_n ON main(n)')
+        with self.assertRaisesRegex(Exception, 'column n'):
+            self.db.execute('UPDATE main SET main.n = 99999999999999999999 '
+                            'WHERE main.id = 4')
+        self.assertEqual([], self.db.execute(
+            'SELECT main.id FROM main WHERE main.n > 4'))
+        self.assertIn((4,), self.db.execute(
+            'SELECT main.id FROM main WHERE main.n = 4'))
+
+
+class TestSameResults(unittest.TestCase):
+    """Queries give the same rows whichever driver stores the tables"""
+    QUERIES = (
+        'SELECT main.id, main.name FROM main',
+        'SELECT main.name FROM main WHERE main.k < 3 OR main.id = 40',
+        'SELECT main.id FROM main WHERE main.name IN (\'n2\', \'n5\')',
+        'SELECT main.k FROM main ORDER BY main.name DESC LIMIT 5',
+        'SELECT main.id FROM main OFFSET 95',
+        'SELECT main.name, other.label FROM main JOIN other ON '
+        'main.k = other.id WHERE other.label != \'l2\'',
+        'SELECT other.label FROM main JOIN other ON other.id = main.id',
+        'SELECT main.id, other.id FROM main JOIN other WHERE main.id < 2',
+    )
+
+    def database(self, storage):
+        db = Database(storage)
+        db.execute('CREATE TABLE main(id int primary key, k int, '
+                   'name varchar(8), pad varchar(8))')
+        db.execute('CREATE TABLE other(id int primary key, label varchar(8))')
+        db.execute('CREATE INDEX main_name ON main(name)')
+        db.tables['main'].insert_many([[i, i % 7, 'n{}'.format(i % 9), '']
+                                       for i in range(100)])
+        db.tables['other'].insert_many([[i, 'l{}'.format(i)]
+                                        for i in range(5)])
+        db.execute('DELETE FROM main WHERE main.id = 50')
+        return db
+
+    def test_queries(self):
+        memory = self.database(MemoryStorageDriver())
+        columnar = self.database(ColumnarStorageDriver())
+        for sql in self.QUERIES:
+            with self.subTest(sql=sql):
+                self.assertEqual(memory.execute(sql), columnar.execute(sql))
+        memory.execute('ANALYZE')
+        columnar.execute('ANALYZE')
+        for sql in self.QUERIES:
+            with self.subTest(sql=sql, analyzed=True):
+                self.assertEqual(memory.execute(sql), columnar.execute(sql))
+
+
+class TestDefaultStorage(unittest.TestCase):
+    def test_not_shared(self):
+        first = Database()
+        first.execute('CREATE TABLE t(id int primary key)')
+        second = Database()
+        second.execute('CREATE TABLE t(id int primary key)')
+        self.assertIsNot(first.storage, second.storage)
@@ -0,0 +1,66 @@
+import itertools
+import unittest
+
+from python_sql.logic import *
+from python_sql.logic.compiler import compile_expression, compile_predicate
+from python_sql.parser import parse
+
+COLUMNS = [ColumnReference('t', 'a', None), ColumnReference('t', 'b', None),
+           ColumnReference('t', 'c', None)]
+ROWS = [(a, b, c) for a, b, c in itertools.product(range(4), range(4),
+                                                    ('x', 'y'))]
+WHERES = [
+    't.a = 1',
+    't.a != t.b',
+    't.a > 1 and t.b <= 2',
+    't.a < 1 or t.b >= 3',
+    "not (t.c = 'x')",
+    't.a in (1, 3, t.b)',
+    't.a between 1 and 2',
+    "(t.a = 1 or t.a = 2) and not (t.b = 0 or t.c = 'y')",
+    '1 < t.a',
+    '2 >= t.b',
+]
+
+
+def where(clause):
+    return parse('SELECT t.a FROM t WHERE ' + clause).where
+
+
+class TestCompiler(unittest.TestCase):
+    def test_matches_evaluate(self):
+        for clause in WHERES:
+            op = where(clause)
+            predicate = compile_predicate(op, COLUMNS)
+            for row in ROWS:
+                expected = bool(op.evaluate(Context(row, COLUMNS)))
+                self.assertEqual(expected, bool(predicate(row)),
+                                 '{} on {}'.format(clause, row))
+
+    def test_constant_folding(self):
+        self.assertIs(True, compile_predicate(where('1 = 1'), [])(None))
+        self.assertIs(False, compile_predicate(where("'a' > 'b'"), [])(None))
+        # Only the column comparison is left
+        predicate = compile_predicate(where('1 < 2 and t.a = 3'), COLUMNS)
+        self.assertTrue(predicate((3, 0, 'x')))
+        self.assertFalse(predicate((2, 0, 'x')))
+        predicate = compile_predicate(where('1 > 2 and t.a = 3'), COLUMNS)
+        self.assertFalse(predicate((3, 0, 'x')))
+        predicate = compile_predicate(where('t.a = 3 or 2 = 2'), COLUMNS)
+        self.assertTrue(predicate((0, 0, 'x')))
+
+    def test_simplify_instances(self):
+        self.assertIsInstance(Equals(IntegerLiteral(1), IntegerLiteral(1))
+                              .simplify(), TrueOp)
+        self.assertIsInstance(NotEquals(IntegerLiteral(1), IntegerLiteral(1))
+                              .simplify(), FalseOp)
+
+    def test_expression(self):
+        self.assertEqual('x', compile_expression(COLUMNS[2], COLUMNS)(
+            (1, 2, 'x')))
+        self.assertEqual(7, compile_expression(IntegerLiteral(7), COLUMNS)(
+            (1, 2, 'x')))
+
+    def test_unknown_column(self):
+        with self.assertRaises(Exception):
+            compile_predicate(where('t.d = 1'), COLUMNS)
@@ -1,6 +1,7 @@
+import re
 import unittest
 
-from python_sql.database import Database
+from python_sql.database import Database, MemoryStorageDriver
 from python_sql.logic import *
 
 MAIN_DATA = [
@@ -20,6 +21,16 @@ THIRD_DATA = [
 ]
 
 
+class CountingStorageDriver(MemoryStorageDriver):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def read_row(self, table_name, pk):
+        self.reads += 1
+        return super().read_row(table_name, pk)
+
+
 class TestCreateTable(unittest.TestCase):
     def test_create(self):
         db = Database()
@@ -82,6 +93,15 @@ class TestSelect(unittest.TestCase):
     def test_basic(self):
         self.assert_select('SELECT main.id, main.cola, main.colb FROM main', MAIN_DATA)
 
+    def test_row_count(self):
+        self.assertEqual(len(MAIN_DATA), len(self.db.tables['main']))
+        self.assertEqual(len(OTHER_DATA), len(self.db.tables['other']))
+
+    def test_rebuild_indexes(self):
+        self.db.tables['main'].rebuild_indexes()
+        self.assert_select('SELECT main.id, main.cola, main.colb FROM main', MAIN_DATA)
+        self.assert_select('SELECT main.id, main.cola, main.colb FROM main where main.rowid = 1', [MAIN_DATA[1]])
+
     def test_row_by_name(self):
         row = self.db.execute('SELECT main.id, main.cola, main.colb FROM main where main.id = 1')[0]
         self.assertEqual(MAIN_DATA[0][0], row['main.id'])
@@ -217,6 +237,623 @@ class TestSelect(unittest.TestCase):
         self.assert_select(query, expected)
 
 
+class TestRangeScan(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingStorageDriver()
+        self.db = Database(self.storage, index_degree=4)
+        self.db.execute('CREATE TABLE main(id int primary key, cola int)')
+        for i in range(100):
+            self.db.execute('INSERT INTO main VALUES({}, {})'.format(i, i * 2))
+        self.storage.reads = 0
+
+    def assert_ids(self, where, expected, reads=None):
+        rows = self.db.execute('SELECT main.id FROM main WHERE ' + where)
+        self.assertEqual([(i,) for i in expected], rows)
+        if reads is not None:
+            self.assertEqual(reads, self.storage.reads)
+        self.storage.reads = 0
+
+    def test_two_sided(self):
+        self.assert_ids('main.id >= 10 AND main.id < 20', range(10, 20), 10)
+        self.assert_ids('main.id > 10 AND main.id <= 20', range(11, 21), 10)
+        self.assert_ids('main.id < 20 AND main.id > 10 AND main.id >= 5', range(11, 20), 9)
+
+    def test_between(self):
+        self.assert_ids('main.id BETWEEN 10 AND 20', range(10, 21), 11)
+        self.assert_ids('main.id between 10 and 20 and main.cola > 30', range(16, 21), 11)
+
+    def test_one_sided(self):
+        self.assert_ids('main.id <= 5', range(0, 6), 6)
+        self.assert_ids('main.id < 5', range(0, 5), 5)
+        self.assert_ids('main.id > 94', range(95, 100), 5)
+
+    def test_literal_first(self):
+        self.assert_ids('10 < main.id AND 20 >= main.id', range(11, 21), 10)
+
+    def test_empty(self):
+        self.assert_ids('main.id > 20 AND main.id < 10', [], 0)
+        self.assert_ids('main.id = 5 AND main.id > 5', [], 0)
+
+    def test_equals_with_filter(self):
+        self.assert_ids('main.id = 5 AND main.cola = 10', [5], 1)
+        self.assert_ids('main.id = 5 AND main.cola = 11', [], 1)
+
+
+class TestSecondaryIndex(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingStorageDriver()
+        self.db = Database(self.storage, index_degree=4)
+        self.db.execute('CREATE TABLE main(id int primary key, cola int, colb varchar(16))')
+        for i in range(100):
+            self.db.execute("INSERT INTO main VALUES({}, {}, 'b{}')".format(i, i % 10, i))
+        self.db.execute('CREATE INDEX main_cola ON main(cola)')
+        self.db.execute('CREATE TABLE other(id int primary key, mainid int)')
+        for i in range(20):
+            self.db.execute('INSERT INTO other VALUES({}, {})'.format(i, i % 4))
+        self.db.execute('CREATE INDEX other_main ON other(mainid)')
+        self.storage.reads = 0
+
+    def assert_ids(self, query, expected, reads=None):
+        rows = self.db.execute(query)
+        self.assertEqual(expected, [row[0] for row in rows])
+        if reads is not None:
+            self.assertEqual(reads, self.storage.reads)
+        self.storage.reads = 0
+
+    def test_duplicate_name(self):
+        with self.assertRaises(Exception):
+            self.db.execute('CREATE INDEX main_cola ON main(colb)')
+        with self.assertRaises(Exception):
+            self.db.execute('CREATE INDEX missing ON main(nope)')
+
+    def test_equals(self):
+        self.assert_ids('SELECT main.id FROM main WHERE main.cola = 3',
+                        list(range(3, 100, 10)), 10)
+        self.assert_ids("SELECT main.id FROM main WHERE 3 = main.cola AND main.colb = 'b53'",
+                        [53], 10)
+
+    def test_in(self):
+        self.assert_ids('SELECT main.id FROM main WHERE main.cola in (1, 2) order by main.id',
+                        sorted(list(range(1, 100, 10)) + list(range(2, 100, 10))), 20)
+
+    def test_range(self):
+        self.assert_ids('SELECT main.id FROM main WHERE main.cola >= 8 order by main.id',
+                        sorted(list(range(8, 100, 10)) + list(range(9, 100, 10))), 20)
+
+    def test_maintained_on_insert(self):
+        self.db.execute("INSERT INTO main VALUES(100, 3, 'b100')")
+        self.assert_ids('SELECT main.id FROM main WHERE main.cola = 3',
+                        list(range(3, 101, 10)) + [100], 11)
+
+    def test_maintained_on_update(self):
+        count = self.db.execute('UPDATE main SET main.cola=3 WHERE main.cola=4')
+        self.assertEqual(10, count)
+        self.assert_ids('SELECT main.id FROM main WHERE main.cola = 4', [])
+        self.assert_ids('SELECT main.id FROM main WHERE main.cola = 3',
+                        sorted(list(range(3, 100, 10)) + list(range(4, 100, 10))))
+
+    def test_failed_update(self):
+        self.db.execute('CREATE INDEX main_colb ON main(colb)')
+        with self.assertRaises(Exception):
+            # main_cola takes 7, then main_colb cannot compare 5 with
+            # its strings
+            self.db.execute('UPDATE main SET main.cola = 7, main.colb = 5 '
+                            'WHERE main.id = 13')
+        self.assert_ids('SELECT main.id FROM main WHERE main.cola = 3',
+                        list(range(3, 100, 10)))
+        self.assert_ids('SELECT main.id FROM main WHERE main.cola = 7',
+                        list(range(7, 100, 10)))
+        self.assert_ids("SELECT main.id FROM main WHERE main.colb = 'b13'",
+                        [13])
+
+    def test_maintained_on_delete(self):
+        self.db.execute('DELETE FROM main WHERE main.id < 50')
+        self.storage.reads = 0
+        self.assert_ids('SELECT main.id FROM main WHERE main.cola = 3',
+                        [53, 63, 73, 83, 93], 5)
+        self.db.execute('DELETE FROM main WHERE main.cola = 3')
+        self.storage.reads = 0
+        self.assert_ids('SELECT main.id FROM main WHERE main.cola = 3', [], 0)
+        self.assertEqual(45, len(self.db.tables['main']))
+
+    def test_join(self):
+        rows = self.db.execute("""
+            SELECT main.id, other.id
+            FROM main
+              JOIN other ON main.id = other.mainid
+            WHERE main.id < 2""")
+        self.assertEqual([(0, 0), (0, 4), (0, 8), (0, 12), (0, 16),
+                          (1, 1), (1, 5), (1, 9), (1, 13), (1, 17)], rows)
+        self.assertEqual(12, self.storage.reads)
+
+
+class TestUniqueIndex(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingStorageDriver()
+        self.db = Database(self.storage, index_degree=4)
+        self.db.execute('CREATE TABLE users(id int primary key, email varchar(32) unique, age int)')
+        for i in range(50):
+            self.db.execute("INSERT INTO users VALUES({}, 'u{}@x', {})".format(i, i, i % 5))
+        self.db.execute('CREATE TABLE orders(id int primary key, email varchar(32))')
+        for i in range(10):
+            self.db.execute("INSERT INTO orders VALUES({}, 'u{}@x')".format(i, i * 3))
+        self.storage.reads = 0
+
+    def test_duplicate_insert(self):
+        with self.assertRaises(Exception):
+            self.db.execute("INSERT INTO users VALUES(50, 'u3@x', 1)")
+        self.assertEqual(50, len(self.db.tables['users']))
+        self.db.execute("INSERT INTO users VALUES(50, 'u50@x', 1)")
+        self.assertEqual(51, len(self.db.tables['users']))
+
+    def test_duplicate_update(self):
+        with self.assertRaises(Exception):
+            self.db.execute("UPDATE users SET users.email='u3@x' WHERE users.id=4")
+        self.db.execute("UPDATE users SET users.email='new@x' WHERE users.id=4")
+        self.db.execute("UPDATE users SET users.email='u4@x' WHERE users.id=5")
+        rows = self.db.execute("SELECT users.id FROM users WHERE users.email='u4@x'")
+        self.assertEqual([(5,)], rows)
+
+    def test_reuse_after_delete(self):
+        self.db.execute("DELETE FROM users WHERE users.email='u3@x'")
+        self.db.execute("INSERT INTO users VALUES(50, 'u3@x', 1)")
+        rows = self.db.execute("SELECT users.id FROM users WHERE users.email='u3@x'")
+        self.assertEqual([(50,)], rows)
+
+    def test_lookup(self):
+        rows = self.db.execute("SELECT users.id, users.age FROM users WHERE users.email='u7@x'")
+        self.assertEqual([(7, 2)], rows)
+        self.assertEqual(1, self.storage.reads)
+
+    def test_join(self):
+        rows = self.db.execute("""
+            SELECT orders.id, users.id
+            FROM orders
+              JOIN users ON orders.email = users.email""")
+        self.assertEqual([(i, i * 3) for i in range(10)], rows)
+        self.assertEqual(20, self.storage.reads)
+
+
+class TestHashJoin(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(join_memory_limit=5)
+        self.db.execute('CREATE TABLE main(id int primary key, cola int)')
+        for i in range(30):
+            self.db.execute('INSERT INTO main VALUES({}, {})'.format(i, i % 7))
+        self.db.execute('CREATE TABLE other(id int primary key, colb int)')
+        for i in range(20):
+            self.db.execute('INSERT INTO other VALUES({}, {})'.format(i, i % 5))
+
+    def test_non_key_join(self):
+        query = """
+            SELECT main.id, other.id
+            FROM main
+              JOIN other ON main.cola = other.colb
+            ORDER BY main.id, other.id"""
+        expected = [(m, o) for m in range(30) for o in range(20) if m % 7 == o % 5]
+        self.assertEqual(expected, self.db.execute(query))
+        self.db.join_memory_limit = 1000
+        self.assertEqual(expected, self.db.execute(query))
+
+    def test_non_key_join_where(self):
+        query = """
+            SELECT main.id, other.id
+            FROM main
+              JOIN other ON other.colb = main.cola
+            WHERE main.id < 3 AND other.id > 10
+            ORDER BY main.id, other.id"""
+        expected = [(m, o) for m in range(3) for o in range(11, 20) if m % 7 == o % 5]
+        self.assertEqual(expected, self.db.execute(query))
+
+
+class TestMergeJoin(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingStorageDriver()
+        self.db = Database(self.storage, index_degree=4)
+        self.db.execute('CREATE TABLE main(id int primary key, cola int)')
+        for i in range(200):
+            self.db.execute('INSERT INTO main VALUES({}, {})'.format(i, i * 2))
+        self.db.execute('CREATE TABLE other(id int primary key, colb int)')
+        for i in range(0, 300, 2):
+            self.db.execute('INSERT INTO other VALUES({}, {})'.format(i, i + 1))
+        self.storage.reads = 0
+
+    def test_pk_merge_join(self):
+        rows = self.db.execute("""
+            SELECT main.id, other.colb
+            FROM main
+              JOIN other ON main.id = other.id""")
+        self.assertEqual([(i, i + 1) for i in range(0, 200, 2)], rows)
+        # Both primary key ranges are walked once, without a lookup per row
+        self.assertEqual(200 + 100, self.storage.reads)
+
+    def test_merge_join_range(self):
+        rows = self.db.execute("""
+            SELECT main.id, other.colb
+            FROM main
+              JOIN other ON main.id = other.id
+            WHERE main.id >= 100""")
+        self.assertEqual([(i, i + 1) for i in range(100, 200, 2)], rows)
+        self.assertEqual(100 + 50, self.storage.reads)
+
+    def test_small_input_uses_lookups(self):
+        rows = self.db.execute("""
+            SELECT main.id, other.colb
+            FROM main
+              JOIN other ON main.id = other.id
+            WHERE main.id < 10""")
+        self.assertEqual([(i, i + 1) for i in range(0, 10, 2)], rows)
+        self.assertEqual(10 + 5, self.storage.reads)
+
+    def test_unordered_left(self):
+        rows = self.db.execute("""
+            SELECT main.id, other.colb
+            FROM main
+              JOIN other ON main.cola = other.id
+            ORDER BY main.id""")
+        self.assertEqual([(i, i * 2 + 1) for i in range(150)], rows)
+
+    def test_chained_merge_join(self):
+        self.db.execute('CREATE TABLE third(id int primary key, colc int)')
+        for i in range(0, 300, 3):
+            self.db.execute('INSERT INTO third VALUES({}, {})'.format(i, i * 10))
+        rows = self.db.execute("""
+            SELECT main.id, third.colc
+            FROM main
+              JOIN other ON main.id = other.id
+              JOIN third ON other.id = third.id""")
+        self.assertEqual([(i, i * 10) for i in range(0, 200, 6)], rows)
+
+
+class TestLimit(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingStorageDriver()
+        self.db = Database(self.storage)
+        self.db.execute('CREATE TABLE main(id int primary key, cola int)')
+        for i in range(1000):
+            self.db.execute('INSERT INTO main VALUES({}, {})'.format(i, i % 10))
+        self.db.execute('CREATE TABLE other(id int primary key, colb int)')
+        for i in range(1000):
+            self.db.execute('INSERT INTO other VALUES({}, {})'.format(i, i * 2))
+        self.storage.reads = 0
+
+    def test_limit(self):
+        rows = self.db.execute('SELECT main.id FROM main LIMIT 10')
+        self.assertEqual([(i,) for i in range(10)], rows)
+        self.assertEqual(10, self.storage.reads)
+
+    def test_limit_where(self):
+        rows = self.db.execute(
+            'SELECT main.id FROM main WHERE main.cola = 3 LIMIT 2')
+        self.assertEqual([(3,), (13,)], rows)
+        self.assertEqual(14, self.storage.reads)
+
+    def test_offset(self):
+        rows = self.db.execute('SELECT main.id FROM main LIMIT 3 OFFSET 500')
+        self.assertEqual([(500,), (501,), (502,)], rows)
+        # The offset rows are skipped in the primary key index
+        self.assertEqual(3, self.storage.reads)
+        rows = self.db.execute('SELECT main.id FROM main OFFSET 998')
+        self.assertEqual([(998,), (999,)], rows)
+        self.assertEqual([], self.db.execute(
+            'SELECT main.id FROM main OFFSET 1000'))
+
+    def test_offset_where(self):
+        rows = self.db.execute("""
+            SELECT main.id FROM main
+            WHERE main.cola = 3 LIMIT 2 OFFSET 1""")
+        self.assertEqual([(13,), (23,)], rows)
+
+    def test_order_by_limit(self):
+        rows = self.db.execute("""
+            SELECT main.id, main.cola FROM main
+            ORDER BY main.cola DESC LIMIT 3 OFFSET 1""")
+        self.assertEqual([(19, 9), (29, 9), (39, 9)], rows)
+
+    def test_order_by_pk_limit(self):
+        rows = self.db.execute(
+            'SELECT main.id FROM main WHERE main.id > 100 ORDER BY main.id LIMIT 2')
+        self.assertEqual([(101,), (102,)], rows)
+        # Already in primary key order, so no sort reads every row
+        self.assertEqual(2, self.storage.reads)
+
+    def test_join_limit(self):
+        rows = self.db.execute("""
+            SELECT main.id, other.colb
+            FROM main
+              JOIN other ON main.id = other.id
+            LIMIT 5""")
+        self.assertEqual([(i, i * 2) for i in range(5)], rows)
+        self.assertEqual(10, self.storage.reads)
+
+    def test_stream(self):
+        rows = self.db.stream('SELECT main.id FROM main')
+        self.assertEqual(0, self.storage.reads)
+        self.assertEqual((0,), next(rows))
+        self.assertEqual(1, self.storage.reads)
+        self.assertEqual(999, len(list(rows)))
+
+    def test_select_order(self):
+        rows = self.db.execute(
+            'SELECT main.cola, main.id FROM main WHERE main.id = 12')
+        self.assertEqual([(2, 12)], rows)
+        self.assertEqual(2, rows[0]['main.cola'])
+
+
+class TestPredicatePushdown(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingStorageDriver()
+        self.db = Database(self.storage)
+        self.db.execute('CREATE TABLE main(id int primary key, cola int)')
+        for i in range(500):
+            self.db.execute('INSERT INTO main VALUES({}, {})'.format(i, i % 50))
+        self.db.execute('CREATE TABLE other(id int primary key, colb int)')
+        for i in range(500):
+            self.db.execute('INSERT INTO other VALUES({}, {})'.format(i, i % 7))
+        self.db.execute('CREATE INDEX other_colb ON other(colb)')
+        self.db.execute('CREATE TABLE third(id int primary key, colc int)')
+        for i in range(50):
+            self.db.execute('INSERT INTO third VALUES({}, {})'.format(i, i * 3))
+        self.storage.reads = 0
+
+    def test_joined_table_index(self):
+        rows = self.db.execute("""
+            SELECT main.id, other.colb
+            FROM main
+              JOIN other ON main.id = other.id
+            WHERE other.colb = 3""")
+        self.assertEqual([(i, 3) for i in range(3, 500, 7)], rows)
+        # other is read through its index and hashed, main is scanned once
+        # instead of looking up every main row in other
+        self.assertEqual(500 + 71, self.storage.reads)
+
+    def test_joined_table_filter(self):
+        rows = self.db.execute("""
+            SELECT main.id, third.colc
+            FROM main
+              JOIN third ON main.cola = third.id
+            WHERE third.colc > 140 AND main.id < 100""")
+        self.assertEqual([(i, (i % 50) * 3) for i in range(100)
+                          if (i % 50) * 3 > 140], rows)
+
+    def test_cross_join_equality(self):
+        rows = self.db.execute("""
+            SELECT main.id, third.colc
+            FROM main
+              JOIN third
+            WHERE main.cola = third.id AND main.id < 10""")
+        self.assertEqual([(i, i * 3) for i in range(10)], rows)
+        # Joined on the primary key of third rather than the cross product
+        self.assertEqual(10 + 10, self.storage.reads)
+
+    def test_cross_table_conjunct(self):
+        rows = self.db.execute("""
+            SELECT main.id, other.id
+            FROM main
+              JOIN other ON main.cola = other.colb
+            WHERE main.id < 3 AND (main.id = other.id OR other.id = 400)""")
+        self.assertEqual([(0, 0), (1, 1), (1, 400), (2, 2)], rows)
+
+    def test_unknown_table(self):
+        with self.assertRaises(Exception):
+            self.db.execute('SELECT main.id FROM main WHERE nope.id = 1')
+
+
+class TestJoinOrder(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingStorageDriver()
+        self.db = Database(self.storage)
+        self.db.execute('CREATE TABLE main(id int primary key, cola int)')
+        for i in range(500):
+            self.db.execute('INSERT INTO main VALUES({}, {})'.format(i, i % 50))
+        self.db.execute('CREATE TABLE other(id int primary key, colb int)')
+        for i in range(500):
+            self.db.execute('INSERT INTO other VALUES({}, {})'.format(i, i % 7))
+        self.db.execute('CREATE INDEX other_colb ON other(colb)')
+        self.db.execute('CREATE TABLE third(id int primary key, colc int)')
+        for i in range(50):
+            self.db.execute('INSERT INTO third VALUES({}, {})'.format(i, i * 3))
+        self.query = """
+            SELECT main.id, other.id, third.id
+            FROM main
+              JOIN other ON main.cola = other.colb
+              JOIN third ON other.id = third.id
+            WHERE third.colc = 9"""
+        self.expected = [(i, 3, 3) for i in range(3, 500, 50)]
+
+    def test_written_order(self):
+        self.storage.reads = 0
+        self.assertEqual(self.expected, self.db.execute(self.query))
+        self.assertEqual(5550, self.storage.reads)
+
+    def test_analyzed_order(self):
+        self.db.execute('ANALYZE')
+        self.storage.reads = 0
+        self.assertEqual(self.expected, self.db.execute(self.query))
+        # Starts from the single matching third row instead of every main row
+        self.assertEqual(551, self.storage.reads)
+
+    def test_partly_analyzed(self):
+        self.db.execute('ANALYZE third')
+        self.storage.reads = 0
+        self.assertEqual(self.expected, self.db.execute(self.query))
+        self.assertEqual(5550, self.storage.reads)
+
+
+class TestExplain(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingStorageDriver()
+        self.db = Database(self.storage)
+        self.db.execute('CREATE TABLE main(id int primary key, cola int)')
+        for i in range(500):
+            self.db.execute('INSERT INTO main VALUES({}, {})'.format(i, i % 50))
+        self.db.execute('CREATE TABLE other(id int primary key, colb int)')
+        for i in range(500):
+            self.db.execute('INSERT INTO other VALUES({}, {})'.format(i, i % 7))
+        self.db.execute('CREATE INDEX other_colb ON other(colb)')
+        self.query = """
+            SELECT main.id, other.colb
+            FROM main
+              JOIN other ON main.id = other.id
+            WHERE other.colb = 3"""
+
+    def test_explain(self):
+        self.storage.reads = 0
+        lines = self.db.execute('EXPLAIN' + self.query)
+        self.assertEqual([
+            'Project main.id, other.colb (estimated rows=500)',
+            '  Hash join on main.id = other.id building on the right rows '
+            '(estimated rows=500)',
+            '    Scan main (estimated rows=500)',
+            '    Filter other.colb = 3 (estimated rows=71)',
+            '      Scan other using index other_colb other.colb = 3 '
+            '(estimated rows=71)'], lines)
+        # Planned but not run
+        self.assertEqual(0, self.storage.reads)
+
+    def test_explain_analyze(self):
+        self.storage.reads = 0
+        lines = self.db.execute('EXPLAIN ANALYZE' + self.query)
+        self.assertEqual(500 + 71, self.storage.reads)
+        metrics = [re.search(r'actual rows=(\d+) time=[\d.]+ms '
+                             r'lookups=(\d+) reads=(\d+)', line).groups()
+                   for line in lines]
+        # Counts include those of the operators below
+        self.assertEqual([('71', '2', '571'),
+                          ('71', '2', '571'),
+                          ('500', '1', '500'),
+                          ('71', '1', '71'),
+                          ('71', '1', '71')], metrics)
+        # Counting stops with the query
+        self.assertEqual(71, len(self.db.execute(self.query)))
+        self.assertNotIn('read_row', vars(self.storage))
+
+    def test_index_join_lookups(self):
+        lines = self.db.execute("""
+            EXPLAIN ANALYZE SELECT main.id, other.id
+            FROM main
+              JOIN other ON main.cola = other.id
+            WHERE main.id < 10""")
+        self.assertIn('Index join other on main.cola = other.id using '
+                      'primary key', lines[1])
+        self.assertIn('lookups=11 reads=20', lines[1])
+        self.assertIn('Scan main using primary key main.id < 10', lines[3])
+
+    def test_explain_limit(self):
+        lines = self.db.execute(
+            'EXPLAIN SELECT main.id FROM main ORDER BY main.cola LIMIT 5')
+        self.assertEqual('  Limit 5 (estimated rows=5)', lines[1])
+        self.assertEqual('    Sort by main.cola keeping the first 5 '
+                         '(estimated rows=5)', lines[2])
+
+    def test_explain_requires_select(self):
+        with self.assertRaises(Exception):
+            self.db.execute('EXPLAIN DELETE FROM main')
+
+
+class TestCompoundPredicates(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingStorageDriver()
+        self.db = Database(self.storage)
+        self.db.execute(
+            'CREATE TABLE main(id int primary key, cola int, colb int, colc int)')
+        for i in range(1000):
+            self.db.execute('INSERT INTO main VALUES({}, {}, {}, {})'.format(
+                i, i % 3, i % 10, i % 7))
+        self.db.execute('CREATE INDEX main_colb ON main(colb)')
+        self.db.execute('CREATE INDEX main_colc ON main(colc)')
+        self.storage.reads = 0
+
+    def assert_select(self, where, expected_ids, reads):
+        rows = self.db.execute(
+            'SELECT main.id FROM main WHERE {} ORDER BY main.id'.format(where))
+        self.assertEqual([(i,) for i in expected_ids], rows)
+        self.assertEqual(reads, self.storage.reads)
+        self.storage.reads = 0
+
+    def test_pk_and_residual(self):
+        self.assert_select('main.id = 5 AND main.cola = 2', [5], 1)
+        self.assert_select('main.cola = 2 AND main.id = 5', [5], 1)
+
+    def test_or_of_ranges(self):
+        self.assert_select('main.id < 5 OR main.id > 995',
+                           [0, 1, 2, 3, 4, 996, 997, 998, 999], 9)
+
+    def test_or_of_indexes(self):
+        expected = sorted({3} | set(range(7, 1000, 10)))
+        self.assert_select('main.id = 3 OR main.colb = 7', expected,
+                           len(expected))
+
+    def test_intersection(self):
+        expected = [i for i in range(1000) if i % 10 == 7 and i % 7 == 2]
+        self.assert_select('main.colb = 7 AND main.colc = 2', expected,
+                           len(expected))
+
+    def test_most_selective(self):
+        # The primary key range is wider than the index lookup
+        expected = [i for i in range(100, 1000) if i % 10 == 7]
+        self.assert_select('main.id >= 100 AND main.colb = 7', expected, 100)
+
+    def test_not(self):
+        self.assert_select('not (main.id >= 10)', range(10), 10)
+        self.assert_select('not (main.id < 990 or main.colb = 9)',
+                           range(990, 999), 10)
+
+    def test_unindexed_or(self):
+        expected = [i for i in range(1000) if i == 3 or i % 3 == 1]
+        self.assert_select('main.id = 3 OR main.cola = 1', expected, 1000)
+
+
+class TestInList(unittest.TestCase):
+    def setUp(self):
+        self.storage = CountingStorageDriver()
+        self.db = Database(self.storage, index_degree=4)
+        self.db.execute(
+            'CREATE TABLE main(id int primary key, cola int, colb int unique)')
+        for i in range(300):
+            self.db.execute('INSERT INTO main VALUES({}, {}, {})'.format(
+                i, i % 10, i * 2))
+        self.db.execute('CREATE INDEX main_cola ON main(cola)')
+        self.storage.reads = 0
+
+    def test_pk_in(self):
+        rows = self.db.execute(
+            'SELECT main.id FROM main WHERE main.id in (250, 7, 1000, 7, 3)')
+        # Probed in primary key order
+        self.assertEqual([(3,), (7,), (250,)], rows)
+        self.assertEqual(3, self.storage.reads)
+
+    def test_index_in(self):
+        rows = self.db.execute(
+            'SELECT main.id FROM main WHERE main.cola in (9, 2, 11)')
+        self.assertEqual(sorted([(i,) for i in range(300) if i % 10 in (2, 9)]),
+                         rows)
+        self.assertEqual(60, self.storage.reads)
+        self.storage.reads = 0
+        rows = self.db.execute(
+            'SELECT main.id FROM main WHERE main.colb in (8, 4, 5)')
+        self.assertEqual([(2,), (4,)], rows)
+        self.assertEqual(2, self.storage.reads)
+
+    def test_large_in(self):
+        ids = list(range(0, 300, 3))
+        query = 'SELECT main.id FROM main WHERE main.id in ({})'.format(
+            ', '.join(map(str, reversed(ids))))
+        self.assertEqual([(i,) for i in ids], self.db.execute(query))
+
+    def test_mixed_types(self):
+        rows = self.db.execute(
+            "SELECT main.id FROM main WHERE main.id in (4, 'a')")
+        self.assertEqual([(4,)], rows)
+
+    def test_column_values(self):
+        rows = self.db.execute(
+            'SELECT main.id FROM main WHERE main.cola in (1, main.id) '
+            'AND main.id < 12')
+        self.assertEqual([(0,), (1,), (2,), (3,), (4,), (5,), (6,), (7,),
+                          (8,), (9,), (11,)], rows)
+
+
 class TestUpdate(unittest.TestCase):
     def setUp(self):
         self.db = Database()
@@ -242,3 +879,183 @@ class TestUpdate(unittest.TestCase):
         count = self.db.execute('UPDATE main SET main.cola=1 WHERE main.id=1')
         self.assertEqual(1, count)
         self.assert_select('SELECT main.cola FROM main', [(1,), (9,), (8,)])
+
+
+class TestDelete(unittest.TestCase):
+    def setUp(self):
+        self.db = Database()
+        self.db.execute('CREATE TABLE main(id int, cola int, colb varchar(16))')
+        for d in MAIN_DATA:
+            self.db.execute("INSERT INTO main VALUES({}, {}, '{}')".format(*d))
+
+    def assert_select(self, query, expected):
+        rows = self.db.execute(query)
+        self.assertEqual(expected, rows)
+
+    def test_delete_all(self):
+        count = self.db.execute('DELETE FROM main')
+        self.assertEqual(3, count)
+        self.assert_select('SELECT main.id FROM main', [])
+        self.assertEqual(0, len(self.db.tables['main']))
+
+    def test_delete_pk(self):
+        count = self.db.execute('DELETE FROM main WHERE main.rowid=1')
+        self.assertEqual(1, count)
+        self.assert_select('SELECT main.id FROM main', [(1,), (3,)])
+        self.assert_select('SELECT main.id FROM main WHERE main.rowid=1', [])
+
+    def test_delete_pk_range(self):
+        count = self.db.execute('DELETE FROM main WHERE main.rowid>=1')
+        self.assertEqual(2, count)
+        self.assert_select('SELECT main.id FROM main', [(1,)])
+
+    def test_delete_where(self):
+        count = self.db.execute('DELETE FROM main WHERE main.cola=9 OR main.colb=\'a3\'')
+        self.assertEqual(2, count)
+        self.assert_select('SELECT main.id FROM main', [(1,)])
+
+    def test_insert_after_delete(self):
+        self.db.execute('DELETE FROM main WHERE main.rowid=0')
+        self.db.execute("INSERT INTO main VALUES(4, 7, 'a4')")
+        self.assert_select('SELECT main.rowid, main.id FROM main', [(1, 2), (2, 3), (3, 4)])
+
+    def test_delete_churn(self):
+        db = Database(index_degree=4)
+        db.execute('CREATE TABLE main(id int primary key, cola int)')
+        for i in range(200):
+            db.execute('INSERT INTO main VALUES({}, {})'.format(i, i))
+        height = db.tables['main']._pk_index.height
+        count = db.execute('DELETE FROM main WHERE main.id >= 20')
+        self.assertEqual(180, count)
+        self.assertLess(db.tables['main']._pk_index.height, height)
+        rows = db.execute('SELECT main.id FROM main')
+        self.assertEqual([(i,) for i in range(20)], rows)
+
+
+class TestInsertMany(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(index_degree=4)
+        self.db.execute('CREATE TABLE main(id int primary key, '
+                        'email varchar(16) unique, k int)')
+        self.db.execute('CREATE INDEX main_k ON main(k)')
+        self.table = self.db.tables['main']
+
+    def assert_select(self, query, expected):
+        self.assertEqual(expected, self.db.execute(query))
+
+    def test_multi_row_insert(self):
+        self.db.execute("INSERT INTO main VALUES(3, 'c', 1), (1, 'a', 2), "
+                        "(2, 'b', 1)")
+        self.db.execute("INSERT INTO main VALUES (4, 'd', 2)")
+        self.assert_select('SELECT main.id, main.email FROM main',
+                           [(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd')])
+        self.assert_select('SELECT main.id FROM main WHERE main.k = 1',
+                           [(3,), (2,)])
+        self.assert_select("SELECT main.id FROM main WHERE main.email = 'b'",
+                           [(2,)])
+
+    def test_batches(self):
+        for start in range(0, 1000, 250):
+            self.assertEqual(250, self.table.insert_many(
+                (i, 'e{}'.format(i), i % 7) for i in range(start, start + 250)))
+        # Keys before, between and after those held
+        self.table.insert_many([(-1, 'x', 0), (2000, 'y', 0)])
+        self.assertEqual(1002, len(self.table))
+        self.assert_select('SELECT main.id FROM main WHERE main.id > 997',
+                           [(998,), (999,), (2000,)])
+        rows = self.db.execute('SELECT main.id FROM main WHERE main.k = 3')
+        self.assertEqual(sorted(i for i in range(1000) if i % 7 == 3),
+                         sorted(row[0] for row in rows))
+        self.assert_select("SELECT main.k FROM main WHERE main.email = 'e500'",
+                           [(500 % 7,)])
+
+    def test_invalid_batch(self):
+        self.table.insert_many([(1, 'a', 1), (2, 'b', 1)])
+        for rows in ([(3, 'c', 1), (3, 'd', 1)],
+                     [(3, 'c', 1), (2, 'd', 1)],
+                     [(3, 'c', 1), (4, 'c', 1)],
+                     [(3, 'c', 1), (4, 'a', 1)],
+                     [(3, 'c', 1), (4, 'd')]):
+            with self.assertRaises(Exception):
+                self.table.insert_many(rows)
+        with self.assertRaises(Exception):
+            self.db.execute("INSERT INTO main VALUES(3, 'c', 1), (1, 'z', 1)")
+        # Nothing of a rejected batch was inserted
+        self.assertEqual(2, len(self.table))
+        self.assert_select('SELECT main.id FROM main WHERE main.k = 1',
+                           [(1,), (2,)])
+        self.table.insert_many([(3, 'c', 1)])
+        self.assertEqual(3, len(self.table))
+
+    def test_invalid_primary_key(self):
+        self.table.insert_many([(1, 'a', 1), (2, 'b', 1)])
+        for sql in ("INSERT INTO main VALUES(3, 'c', 1), "
+                    "(99999999999999999999, 'd', 1)",
+                    "INSERT INTO main VALUES(3, 'c', 1), ('x', 'd', 1)"):
+            with self.assertRaisesRegex(Exception, 'Cannot store primary'):
+                self.db.execute(sql)
+        self.assertEqual(2, len(self.table))
+        self.assertEqual(2, self.table._data_size)
+        self.db.execute("INSERT INTO main VALUES(3, 'c', 2), (4, 'd', 2)")
+        self.assert_select('SELECT main.id, main.email FROM main',
+                           [(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd')])
+        self.assert_select('SELECT main.id FROM main WHERE main.k = 2',
+                           [(3,), (4,)])
+
+    def test_invalid_primary_key_single_row(self):
+        self.db.execute('CREATE TABLE t(id int primary key, v int)')
+        for sql in ("INSERT INTO t VALUES('a', 1)",
+                    'INSERT INTO t VALUES(99999999999999999999, 1)'):
+            with self.assertRaisesRegex(Exception, 'Cannot store primary'):
+                self.db.execute(sql)
+        self.db.execute('INSERT INTO t VALUES(2, 20)')
+        self.assert_select('SELECT t.id, t.v FROM t', [(2, 20)])
+        self.assert_select('SELECT t.id, t.v FROM t WHERE t.id = 2',
+                           [(2, 20)])
+
+    def test_index_refusing_row(self):
+        self.table.insert_many([(1, 'a', 1)])
+        with self.assertRaises(Exception):
+            self.db.execute("INSERT INTO main VALUES(2, 'b', 'x')")
+        self.assertEqual(1, len(self.table))
+        self.assert_select("SELECT main.id FROM main WHERE main.email = 'b'",
+                           [])
+        self.db.execute("INSERT INTO main VALUES(2, 'b', 1)")
+        self.assert_select('SELECT main.id, main.email FROM main '
+                           'WHERE main.k = 1', [(1, 'a'), (2, 'b')])
+
+    def test_index_refusing_batch(self):
+        self.table.insert_many([(1, 'a', 1)])
+        for rows in ([(2, 'b', 2), (3, 'c', 'x')],
+                     [(2, 'b', 'x'), (3, 'c', 'y')]):
+            with self.assertRaises(Exception):
+                self.table.insert_many(rows)
+        with self.assertRaises(Exception):
+            self.db.execute("INSERT INTO main VALUES(2, 'b', 2), (3, 'c', 'x')")
+        # Refused before anything was stored or indexed
+        self.assertEqual(1, len(self.table))
+        self.assertEqual(1, self.table._data_size)
+        self.assert_select('SELECT main.id FROM main', [(1,)])
+        self.assert_select("SELECT main.id FROM main WHERE main.email = 'b'",
+                           [])
+        self.db.execute("INSERT INTO main VALUES(2, 'b', 2), (3, 'c', 1)")
+        self.assert_select('SELECT main.id FROM main WHERE main.k = 1',
+                           [(1,), (3,)])
+
+    def test_auto_primary_key(self):
+        self.db.execute('CREATE TABLE auto(a int, b varchar(4))')
+        self.db.execute("INSERT INTO auto VALUES(1, 'x'), (2, 'y')")
+        self.db.execute("INSERT INTO auto VALUES(3, 'z')")
+        self.db.tables['auto'].insert_many([(4, 'w')])
+        self.assert_select('SELECT auto.rowid, auto.a FROM auto',
+                           [(0, 1), (1, 2), (2, 3), (3, 4)])
+
+    def test_refused_auto_primary_key(self):
+        self.db.execute('CREATE TABLE auto(a int unique, b varchar(4))')
+        self.db.execute("INSERT INTO auto VALUES(1, 'x')")
+        with self.assertRaisesRegex(Exception, 'unique column a'):
+            self.db.execute("INSERT INTO auto VALUES(1, 'y')")
+        self.db.execute("INSERT INTO auto VALUES(2, 'z')")
+        # The refused row took no rowid, as with insert_many
+        self.assert_select('SELECT auto.rowid, auto.a FROM auto',
+                           [(0, 1), (1, 2)])
@@ -0,0 +1,83 @@
+import random
+import unittest
+
+from python_sql.join import MAX_PARTITIONS, grace_hash_join, hash_join, \
+    merge_join, plan_hash_join
+
+
+def nested_loop(left_rows, left_key, right_rows, right_key):
+    return [l + r for l in left_rows for r in right_rows
+            if l[left_key] == r[right_key]]
+
+
+class TestHashJoin(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(8)
+        self.left = [(i, rng.randrange(50)) for i in range(300)]
+        self.right = [(rng.randrange(60), 'r{}'.format(i)) for i in range(200)]
+        self.expected = nested_loop(self.left, 1, self.right, 0)
+
+    def test_build_right(self):
+        result = list(hash_join(self.left, 1, self.right, 0))
+        # Probing with the left rows keeps their order
+        self.assertEqual(self.expected, result)
+
+    def test_build_left(self):
+        result = list(hash_join(self.left, 1, self.right, 0, build_left=True))
+        self.assertEqual(sorted(self.expected), sorted(result))
+
+    def test_grace(self):
+        for build_left in (False, True):
+            result = list(grace_hash_join(iter(self.left), 1, iter(self.right),
+                                          0, 7, build_left))
+            self.assertEqual(sorted(self.expected), sorted(result))
+
+    def test_planned_spill(self):
+        build_left, partitions = plan_hash_join(len(self.left),
+                                                len(self.right),
+                                                memory_limit=10)
+        self.assertFalse(build_left)
+        self.assertEqual(40, partitions)
+        result = list(grace_hash_join(self.left, 1, self.right, 0,
+                                      partitions, build_left, 10))
+        self.assertEqual(sorted(self.expected), sorted(result))
+
+    def test_partitions_capped(self):
+        self.assertEqual((False, MAX_PARTITIONS),
+                         plan_hash_join(30000, 30000, memory_limit=1))
+        self.assertEqual((True, 4), plan_hash_join(20, 30, memory_limit=10))
+
+    def test_grace_repartitions(self):
+        # Two partitions leave ~1500 build rows each, over both the limit
+        # and a spill batch, so each is partitioned again
+        left = [(i, i % 2000) for i in range(4000)]
+        right = [(i % 2000, i) for i in range(3000)]
+        result = list(grace_hash_join(iter(left), 1, iter(right), 0, 2,
+                                      memory_limit=10))
+        self.assertEqual(sorted(nested_loop(left, 1, right, 0)),
+                         sorted(result))
+
+    def test_no_matches(self):
+        self.assertEqual([], list(hash_join([(1,)], 0, [(2,)], 0)))
+        self.assertEqual([], list(hash_join([], 0, [(2,)], 0)))
+
+
+class TestMergeJoin(unittest.TestCase):
+    def test_duplicates(self):
+        rng = random.Random(9)
+        left = sorted((rng.randrange(40), i) for i in range(200))
+        right = sorted((rng.randrange(50), 'r{}'.format(i)) for i in range(100))
+        result = list(merge_join(left, 0, right, 0))
+        # Output follows the order of the left rows
+        self.assertEqual(nested_loop(left, 0, right, 0), result)
+
+    def test_unique_right(self):
+        left = [(i, i // 3) for i in range(30)]
+        right = [(k, 'r{}'.format(k)) for k in range(2, 20, 2)]
+        self.assertEqual(nested_loop(left, 1, right, 0),
+                         list(merge_join(left, 1, iter(right), 0)))
+
+    def test_no_matches(self):
+        self.assertEqual([], list(merge_join([(1,), (3,)], 0, [(2,)], 0)))
+        self.assertEqual([], list(merge_join([(1,)], 0, [], 0)))
+        self.assertEqual([], list(merge_join([], 0, [(2,)], 0)))
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from python_sql.database import Database, MemoryStorageDriver
+from python_sql.mmap_storage import INITIAL_CAPACITY, MmapStorageDriver
+
+
+class TestMmapStorageDriver(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db = self.open()
+        self.db.execute('CREATE TABLE main(id int primary key, x double, '
+                        'name varchar(8), n int)')
+        self.db.execute('CREATE TABLE log(message varchar(16))')
+        self.table = self.db.tables['main']
+        self.table.insert_many([[i, i / 2, 'v{}'.format(i % 3), i % 5]
+                                for i in range(100)])
+        self.table.insert_many([[100, None, None, None]])
+        self.db.execute("INSERT INTO log VALUES('first'), ('second')")
+
+    def tearDown(self):
+        self.db.storage.close()
+        shutil.rmtree(self.directory)
+
+    def open(self):
+        return Database(MmapStorageDriver(self.directory))
+
+    def reopen(self):
+        self.db.storage.close()
+        self.db = self.open()
+        self.table = self.db.tables['main']
+
+    def test_read_row(self):
+        self.assertEqual((7, 3.5, 'v1', 2), self.table.get_row_by_pk(7))
+        self.assertEqual((100, None, None, None),
+                         self.table.get_row_by_pk(100))
+        storage = self.db.storage
+        self.assertEqual([(2, 7), (None, 100)], list(storage.read_columns(
+            'main', [7, 100], [3, 0])))
+        self.assertEqual([()], list(storage.read_columns('main', [7], [])))
+
+    def test_reopen(self):
+        self.db.execute('CREATE INDEX main_n ON main(n)')
+        self.db.execute("UPDATE main SET main.name = 'new' WHERE main.id = 4")
+        self.db.execute('DELETE FROM main WHERE main.id >= 90')
+        self.db.execute('DELETE FROM log WHERE log.rowid = 1')
+        query = 'SELECT main.id, main.x, main.name FROM main WHERE main.n = 4'
+        before = self.db.execute(query)
+        self.reopen()
+        self.assertEqual(['log', 'main'], sorted(self.db.tables))
+        self.assertEqual(before, self.db.execute(query))
+        self.assertEqual(90, len(self.table))
+        self.assertIn('index main_n', '\n'.join(self.db.execute(
+            'EXPLAIN ' + query)))
+        self.assertEqual((4, 2.0, 'new', 4), self.table.get_row_by_pk(4))
+        # Rows go on after those stored, rowids after the last left
+        self.db.execute("INSERT INTO log VALUES('third')")
+        self.assertEqual([(0, 'first'), (1, 'third')], self.db.execute(
+            'SELECT log.rowid, log.message FROM log'))
+        with self.assertRaisesRegex(Exception, 'duplicate'):
+            self.db.execute("INSERT INTO main VALUES(3, 1, 'a', 1)")
+
+    def test_growth(self):
+        rows = self.db.stream('SELECT main.id, main.n FROM main')
+        self.assertEqual((0, 0), next(rows).data)
+        # The file grows while it is being scanned
+        self.table.insert_many([[i, 0, 'g', i] for i in range(
+            1000, 1000 + 2 * INITIAL_CAPACITY)])
+        self.assertEqual(list(range(1, 101)), [row[0] for row in rows][:100])
+        self.assertEqual([(2999, 'g')], self.db.execute(
+            'SELECT main.id, main.name FROM main WHERE main.id = 2999'))
+        self.reopen()
+        self.assertEqual(101 + 2 * INITIAL_CAPACITY, len(self.table))
+
+    def test_bad_values(self):
+        with self.assertRaisesRegex(Exception, 'varchar\\(8\\) column name'):
+            self.table.insert_many([[200, 1, 'a', 1],
+                                    [201, 1, 'far too long', 1]])
+        with self.assertRaisesRegex(Exception, 'Cannot store row'):
+            self.db.execute("INSERT INTO main VALUES(300, 1, 'a', 'one')")
+        # Stored as given or not at all, as by the other drivers
+        with self.assertRaisesRegex(Exception, "Cannot store 7 in varchar"):
+            self.db.execute('INSERT INTO main VALUES(301, 1, 7, 1)')
+        self.assertEqual(101, len(self.db.execute('SELECT main.id FROM main')))
+        self.reopen()
+        self.assertEqual(101, len(self.table))
+
+    def test_non_ascii(self):
+        # Eight characters, more than eight bytes
+        name = 'héllo ñ€'
+        self.db.execute("INSERT INTO main VALUES(200, 1, '{}', 1)".format(
+            name))
+        self.reopen()
+        self.assertEqual((200, 1, name, 1), self.table.get_row_by_pk(200))
+        with self.assertRaisesRegex(Exception, 'varchar\\(8\\) column name'):
+            self.db.execute("INSERT INTO main VALUES(201, 1, 'ééééééééé', 1)")
+
+    def test_scan(self):
+        self.db.execute('DELETE FROM main WHERE main.id < 95')
+        self.assertEqual([(95, 47.5, 'v2', 0), (96, 48.0, 'v0', 1)],
+                         list(self.db.storage.scan('main', 0, 97)))
+        self.assertEqual(list(self.table.scan()),
+                         list(self.db.storage.scan('main')))
+
+    def test_refused_update(self):
+        self.db.execute('CREATE INDEX main_name ON main(name)')
+        with self.assertRaisesRegex(Exception, 'varchar\\(8\\) column name'):
+            self.db.execute("UPDATE main SET main.name = 'far too long' "
+                            "WHERE main.id = 4")
+        self.assertEqual([], self.db.execute(
+            "SELECT main.id FROM main WHERE main.name = 'far too long'"))
+        self.assertIn((4,), self.db.execute(
+            "SELECT main.id FROM main WHERE main.name = 'v1'"))
+
+    def test_other_columns(self):
+        directory = os.path.join(self.directory, 'other')
+        first = Database(MmapStorageDriver(directory))
+        # Opened before the table is created, so not knowing of it
+        second = Database(MmapStorageDriver(directory))
+        first.execute('CREATE TABLE t(id int primary key)')
+        with self.assertRaisesRegex(Exception, 'stored with other columns'):
+            second.execute('CREATE TABLE t(id int primary key, n int)')
+        first.storage.close()
+        second.storage.close()
+
+    def test_same_results(self):
+        memory = Database(MemoryStorageDriver())
+        memory.execute('CREATE TABLE main(id int primary key, x double, '
+                       'name varchar(8), n int)')
+        memory.tables['main'].insert_many(
+            [[i, i / 2, 'v{}'.format(i % 3), i % 5] for i in range(100)] +
+            [[100, None, None, None]])
+        for sql in ('SELECT main.name, main.x FROM main WHERE main.id < 50 '
+                    'AND main.n < 2',
+                    "SELECT main.id FROM main WHERE main.name = 'v2' "
+                    "ORDER BY main.x DESC LIMIT 4",
+                    'SELECT main.id, main.n FROM main OFFSET 98'):
+            with self.subTest(sql=sql):
+                self.assertEqual(memory.execute(sql), self.db.execute(sql))
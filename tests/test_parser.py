@@ -0,0 +1,147 @@
+import unittest
+
+from python_sql.logic import *
+from python_sql.parser import END, INTEGER, OPERATOR, STRING, SYMBOL, WORD, \
+    ParseException, parse, tokenize
+
+
+class TestTokenize(unittest.TestCase):
+    def test_tokens(self):
+        tokens = tokenize("SELECT t.a FROM t WHERE t.b >= 12 AND t.c = 'x'")
+        self.assertEqual(
+            [(WORD, 'SELECT'), (WORD, 't'), (SYMBOL, '.'), (WORD, 'a'),
+             (WORD, 'FROM'), (WORD, 't'), (WORD, 'WHERE'), (WORD, 't'),
+             (SYMBOL, '.'), (WORD, 'b'), (OPERATOR, '>='), (INTEGER, '12'),
+             (WORD, 'AND'), (WORD, 't'), (SYMBOL, '.'), (WORD, 'c'),
+             (OPERATOR, '='), (STRING, "'x'"), (END, '')],
+            [(token.kind, token.value) for token in tokens])
+
+    def test_positions(self):
+        tokens = tokenize('a  !=\n 3')
+        self.assertEqual([0, 3, 7, 8], [token.index for token in tokens])
+
+    def test_strings(self):
+        tokens = tokenize("'it''s' '' 'a b'")
+        self.assertEqual(["'it''s'", "''", "'a b'"],
+                         [token.value for token in tokens[:-1]])
+
+    def test_words_with_digits(self):
+        tokens = tokenize('col_b2 2nd 12')
+        self.assertEqual([WORD, WORD, INTEGER, END],
+                         [token.kind for token in tokens])
+
+
+class TestParse(unittest.TestCase):
+    def test_select(self):
+        select = parse("select t.a AS x, t.b from t join u on u.id = t.a "
+                       "where t.a = 'it''s' or t.b in (1, 'y', t.c) "
+                       "order by t.a desc limit 3 offset 2")
+        self.assertEqual([ColumnReference('t', 'a', 'x'),
+                          ColumnReference('t', 'b', None)], select.columns)
+        self.assertEqual('x', select.columns[0].as_name)
+        self.assertEqual(
+            "FROM t JOIN u ON t.a = u.id", str(select.from_clause))
+        self.assertEqual("(t.a = 'it's' or t.b in [1, 'y', t.c])",
+                         str(select.where))
+        self.assertEqual(' ORDER BY t.a DESC', str(select.order_by))
+        self.assertEqual((3, 2), (select.limit, select.offset))
+
+    def test_keywords_ignore_case(self):
+        self.assertEqual(str(parse('select t.a from t where t.a between 1 '
+                                   'and 5')),
+                         str(parse('SELECT t.a FROM t WHERE t.a BETWEEN 1 '
+                                   'AND 5')))
+
+    def test_where_grouping(self):
+        select = parse('select t.a from t where not (t.a = 1) and '
+                       '(t.b < 2 or t.b > 3)')
+        self.assertEqual(And, type(select.where))
+        self.assertEqual(NotEquals, type(select.where.left))
+        self.assertEqual(Or, type(select.where.right))
+
+    def test_insert(self):
+        insert = parse("insert into t values('', 'a''b', 12)")
+        self.assertEqual(['', "a'b", 12],
+                         [value.value for value in insert.rows[0]])
+        insert = parse('INSERT INTO t VALUES (1, ?), (2, 3),(4, 5)')
+        self.assertEqual([[1, None], [2, 3], [4, 5]],
+                         [[value.value for value in row]
+                          for row in insert.rows])
+        self.assertEqual('INSERT INTO t VALUES(1, ?), (2, 3), (4, 5)',
+                         str(insert))
+
+    def test_create_table(self):
+        create = parse('create table q(id int primary key, '
+                       'n varchar(12) unique not null, d double)')
+        self.assertEqual(['id', 'n', 'd'],
+                         [column.name for column in create.columns])
+        self.assertEqual(12, create.columns[1].size)
+        self.assertEqual(ColumnConstraint.UNIQUE | ColumnConstraint.NOT_NULL,
+                         create.columns[1].constraints)
+
+    def test_update_delete(self):
+        update = parse("update t set t.a = 'x', t.b = t.c where t.a >= 3")
+        self.assertEqual(2, len(update.columns))
+        self.assertEqual('t.a >= 3', str(update.where))
+        self.assertIsNone(parse('delete from t').where)
+
+    def test_explain(self):
+        explain = parse('explain analyze select t.a from t limit 1')
+        self.assertTrue(explain.analyze)
+        self.assertEqual(1, explain.select.limit)
+
+    def test_copy(self):
+        copy = parse("COPY t FROM '/data/t.txt' format TSV header")
+        self.assertEqual(CopyFrom(TableReference('t'), '/data/t.txt', 'tsv',
+                                  True), copy)
+        self.assertEqual("COPY t FROM 'x.csv'",
+                         str(parse("copy t from 'x.csv'")))
+        with self.assertRaises(ParseException):
+            parse("COPY t FROM 'x' FORMAT xml")
+        copy = parse("COPY (SELECT t.a FROM t WHERE t.a > 1 LIMIT 5) TO "
+                     "'t.csv' HEADER")
+        self.assertIsInstance(copy, CopyTo)
+        self.assertEqual('SELECT t.a FROM t WHERE t.a > 1 LIMIT 5',
+                         str(copy.select))
+        self.assertEqual(('t.csv', None, True), copy[1:])
+        self.assertEqual("COPY (SELECT t.a FROM t) TO 'x' FORMAT jsonl",
+                         str(parse("copy (select t.a from t) to 'x' "
+                                   "format jsonl")))
+        with self.assertRaisesRegex(ParseException, 'Expected "\\)"'):
+            parse("COPY (SELECT t.a FROM t LIMIT 1 OFFSET 1 t) TO 'x'")
+        with self.assertRaisesRegex(ParseException, 'end of query'):
+            parse('SELECT t.a FROM t OFFSET 1)')
+
+    def test_errors(self):
+        with self.assertRaisesRegex(ParseException,
+                                    'Expected "into" but got "us" at index 7'):
+            parse('insert us')
+        with self.assertRaisesRegex(ParseException, 'but got "ORDER" at '
+                                                    'index 33'):
+            parse('SELECT main.id FROM main WHERE 0 ORDER BY main.id')
+        with self.assertRaisesRegex(ParseException, 'end of query'):
+            parse('SELECT t.a FROM t OFFSET 1 LIMIT 1')
+        with self.assertRaisesRegex(ParseException, 'at index 24'):
+            parse('SELECT t.a FROM t WHERE ')
+        with self.assertRaises(ParseException):
+            parse("insert into t values('unterminated)")
+
+    def test_parameters(self):
+        bindings = []
+        select = parse('SELECT t.a FROM t WHERE t.a = ? AND t.b IN (1, ?)',
+                       bindings)
+        self.assertEqual([None, None], bindings)
+        self.assertEqual('SELECT t.a FROM t WHERE (t.a = ? and t.b in [1, ?])',
+                         str(select))
+        bindings[:] = [5, 6]
+        self.assertEqual(5, select.where.left.right.value)
+        self.assertEqual(6, select.where.right.values[1].value)
+        # Not folded into a constant before a value is bound
+        self.assertIsInstance(parse('SELECT t.a FROM t WHERE ? = 1').where,
+                              Equals)
+
+    def test_long_statement(self):
+        values = ', '.join("'v{}'".format(i) for i in range(20000))
+        insert = parse('insert into t values({})'.format(values))
+        self.assertEqual(20000, len(insert.rows[0]))
+        self.assertEqual('v19999', insert.rows[0][-1].value)
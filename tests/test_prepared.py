@@ -0,0 +1,137 @@
+import unittest
+
+from python_sql.database import Database
+from python_sql.prepared import normalize
+
+
+class TestPrepared(unittest.TestCase):
+    def setUp(self):
+        self.db = Database()
+        self.db.execute('CREATE TABLE t(id int primary key, k int, '
+                        's varchar(8))')
+        insert = self.db.prepare('INSERT INTO t VALUES(?, ?, ?)')
+        for i in range(200):
+            insert.execute((i, i % 10, 'v{}'.format(i)))
+
+    def ids(self, sql, parameters=()):
+        return [row[0] for row in self.db.execute(sql, parameters)]
+
+    def test_select(self):
+        select = self.db.prepare('SELECT t.id FROM t WHERE t.id = ?')
+        for i in (3, 150, 500):
+            self.assertEqual([i] if i < 200 else [],
+                             [row[0] for row in select.execute((i,))])
+        self.assertEqual([12, 13], self.ids(
+            'SELECT t.id FROM t WHERE t.id BETWEEN ? AND ? AND t.s != ?',
+            (11, 13, 'v11')))
+        self.assertEqual([1, 7], self.ids(
+            'SELECT t.id FROM t WHERE t.id IN (?, ?, 300)', (7, 1)))
+        self.assertEqual(200, len(self.ids(
+            'SELECT t.id FROM t WHERE ? = 1', (1,))))
+        self.assertEqual([], self.ids('SELECT t.id FROM t WHERE ? = 1', (2,)))
+
+    def test_index(self):
+        self.db.execute('CREATE INDEX t_k ON t(k)')
+        select = self.db.prepare('SELECT t.id FROM t WHERE t.k >= ? '
+                                 'ORDER BY t.id')
+        self.assertEqual(20, len(select.execute((9,))))
+        # Nearly all the rows now, read by a full scan
+        rows = select.execute((1,))
+        self.assertEqual(180, len(rows))
+        self.assertEqual(sorted(rows, key=lambda row: row.data),
+                         rows)
+
+    def test_update_delete(self):
+        self.assertEqual(1, self.db.execute(
+            'UPDATE t SET t.s = ? WHERE t.id = ?', ('new', 4)))
+        self.assertEqual([4], self.ids('SELECT t.id FROM t WHERE t.s = ?',
+                                       ('new',)))
+        self.assertEqual(20, self.db.execute('DELETE FROM t WHERE t.k = ?',
+                                             (3,)))
+        self.assertEqual(180, len(self.db.execute('SELECT t.id FROM t')))
+
+    def test_parameter_count(self):
+        with self.assertRaisesRegex(Exception, 'Expected 2 parameters'):
+            self.db.execute('SELECT t.id FROM t WHERE t.id = ? OR t.k = ?',
+                            (1,))
+        with self.assertRaisesRegex(Exception, 'Expected 0 parameters'):
+            self.db.execute('SELECT t.id FROM t', (1,))
+
+    def test_auto_primary_key(self):
+        self.db.execute('CREATE TABLE u(a int)')
+        for _ in range(2):
+            self.db.execute('INSERT INTO u VALUES(7)')
+        self.assertEqual([(0, 7), (1, 7)],
+                         [row.data for row in self.db.execute(
+                             'SELECT u.rowid, u.a FROM u')])
+
+    def test_streams(self):
+        sql = 'SELECT t.id FROM t WHERE t.k = ?'
+        rows = self.db.stream(sql, (1,))
+        self.assertEqual((1,), next(rows).data)
+        # Another statement runs while the first is being streamed
+        self.assertEqual(20, len(self.db.execute(sql, (2,))))
+        self.assertEqual([11, 21], [next(rows)[0] for _ in range(2)])
+        statement = self.db.prepare('SELECT t.id FROM t WHERE t.id < ?')
+        rows = statement.stream((5,))
+        with self.assertRaisesRegex(Exception, 'streamed'):
+            statement.execute((6,))
+        self.assertEqual(5, len(list(rows)))
+        self.assertEqual(6, len(statement.execute((6,))))
+
+
+class TestStatementCache(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(statement_cache_size=2)
+        self.db.execute('CREATE TABLE t(id int primary key, k int)')
+        for i in range(100):
+            self.db.execute('INSERT INTO t VALUES(?, ?)', (i, i % 10))
+
+    def test_normalize(self):
+        self.assertEqual(
+            "SELECT t.a FROM t WHERE t.b = 'a  b'",
+            normalize(" SELECT t.a\n  FROM t\tWHERE t.b = 'a  b'"))
+
+    def test_lru(self):
+        statements = self.db.statements
+        first = self.db.prepare('SELECT t.id FROM t')
+        self.assertIs(first, self.db.prepare('SELECT t.id\n FROM t'))
+        self.db.prepare('SELECT t.k FROM t')
+        self.db.prepare('SELECT t.id FROM t')
+        self.db.prepare('SELECT t.id, t.k FROM t')
+        self.assertEqual(2, len(statements))
+        # The least recently used was dropped
+        self.assertIsNot(self.db.prepare('SELECT t.k FROM t'),
+                         self.db.prepare('SELECT t.id, t.k FROM t'))
+        self.assertIsNot(first, self.db.prepare('SELECT t.id FROM t'))
+        uncached = Database(statement_cache_size=0)
+        self.assertIsNot(uncached.prepare('ANALYZE'),
+                         uncached.prepare('ANALYZE'))
+        self.assertEqual(0, len(uncached.statements))
+
+    def test_plan_reused(self):
+        select = self.db.prepare('SELECT t.id FROM t WHERE t.k = ?')
+        select.execute((1,))
+        plan = select.plan()
+        self.assertEqual(10, len(select.execute((2,))))
+        self.assertIs(plan, select.plan())
+
+    def test_invalidation(self):
+        select = self.db.prepare('SELECT t.id FROM t WHERE t.k = 3')
+        for statement in ('CREATE INDEX t_k ON t(k)', 'ANALYZE t',
+                          'CREATE TABLE u(a int)'):
+            plan = select.plan()
+            self.db.execute(statement)
+            self.assertIsNot(plan, select.plan(), statement)
+        self.assertIn('index t_k', '\n'.join(
+            self.db.execute('EXPLAIN SELECT t.id FROM t WHERE t.k = 3')))
+        self.assertEqual(10, len(select.execute()))
+
+    def test_growth(self):
+        select = self.db.prepare('SELECT t.id FROM t WHERE t.id = 5')
+        plan = select.plan()
+        self.db.execute('INSERT INTO t VALUES(100, 0)')
+        self.assertIs(plan, select.plan())
+        for i in range(101, 300):
+            self.db.execute('INSERT INTO t VALUES(?, ?)', (i, 0))
+        self.assertIsNot(plan, select.plan())
@@ -0,0 +1,96 @@
+import random
+import unittest
+
+from python_sql.database import Database
+from python_sql.logic import *
+from python_sql.parser import parse
+from python_sql.statistics import ColumnStatistics, analyze, selectivity
+
+
+def where(clause):
+    return parse('SELECT t.a FROM t WHERE ' + clause).where
+
+
+class TestColumnStatistics(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(2)
+        self.values = [rng.randrange(1000) for _ in range(5000)] + [None] * 500
+        self.stats = ColumnStatistics.from_values(self.values)
+
+    def test_summary(self):
+        non_null = [v for v in self.values if v is not None]
+        self.assertEqual(5500, self.stats.rows)
+        self.assertEqual(500, self.stats.nulls)
+        self.assertEqual(len(set(non_null)), self.stats.distinct)
+        self.assertEqual(min(non_null), self.stats.min)
+        self.assertEqual(max(non_null), self.stats.max)
+        self.assertEqual(max(non_null), self.stats.histogram[-1])
+        self.assertEqual(sorted(self.stats.histogram), self.stats.histogram)
+
+    def test_range(self):
+        for start, stop in ((None, 100), (250, 260), (500, None), (0, 1000),
+                            (-50, 20), (990, 2000)):
+            actual = sum(1 for v in self.values if v is not None and
+                         (start is None or v >= start) and
+                         (stop is None or v < stop)) / len(self.values)
+            self.assertAlmostEqual(actual, self.stats.range(start, stop),
+                                   delta=0.02)
+        self.assertEqual(0.0, self.stats.range(2000, None))
+
+    def test_equals(self):
+        self.assertAlmostEqual(5000 / 5500 / self.stats.distinct,
+                               self.stats.equals(10))
+        self.assertEqual(0.0, self.stats.equals(-1))
+        self.assertEqual(0.0, self.stats.equals(None))
+        self.assertEqual(0.0, self.stats.equals('text'))
+
+    def test_strings(self):
+        stats = ColumnStatistics.from_values(['a', 'b', 'c', 'd'])
+        self.assertEqual(4, stats.distinct)
+        self.assertEqual(0.5, stats.range('b', 'd'))
+
+    def test_empty(self):
+        stats = ColumnStatistics.from_values([None, None])
+        self.assertEqual(0, stats.distinct)
+        self.assertEqual(0.0, stats.equals(1))
+
+
+class TestSelectivity(unittest.TestCase):
+    def setUp(self):
+        db = Database()
+        db.execute('CREATE TABLE t(a int primary key, b int, c varchar(4))')
+        for i in range(1000):
+            db.execute("INSERT INTO t VALUES({}, {}, '{}')".format(
+                i, i % 10, 'x' if i % 4 else 'y'))
+        self.statistics = {'t': analyze(db.tables['t'])}
+
+    def assert_selectivity(self, expected, clause):
+        self.assertAlmostEqual(expected,
+                               selectivity(where(clause), self.statistics),
+                               delta=0.02)
+
+    def test_selectivity(self):
+        self.assert_selectivity(0.001, 't.a = 5')
+        self.assert_selectivity(0.1, 't.b = 5')
+        self.assert_selectivity(0.25, "t.c = 'y'")
+        self.assert_selectivity(0.25, 't.a < 250')
+        self.assert_selectivity(0.1, 't.a between 100 and 199')
+        self.assert_selectivity(0.3, 't.b in (1, 2, 3)')
+        self.assert_selectivity(0.1 * 0.25, "t.b = 5 and t.c = 'y'")
+        self.assert_selectivity(0.19, 't.b = 5 or t.b = 6')
+        self.assert_selectivity(0.9, 'not (t.b = 5)')
+        self.assert_selectivity(0.0, 't.b = 50')
+
+    def test_analyze_command(self):
+        db = Database()
+        db.execute('CREATE TABLE t(a int primary key, b int)')
+        db.execute('CREATE TABLE u(a int primary key)')
+        db.execute('INSERT INTO t VALUES(1, 2)')
+        self.assertIsNone(db.tables['t'].statistics)
+        db.execute('ANALYZE t')
+        self.assertEqual(1, db.tables['t'].statistics.rows)
+        self.assertIsNone(db.tables['u'].statistics)
+        db.execute('ANALYZE')
+        self.assertEqual(0, db.tables['u'].statistics.rows)
+        with self.assertRaises(Exception):
+            db.execute('ANALYZE nope')
@@ -0,0 +1,130 @@
+import unittest
+
+from python_sql.b_tree import BTree
+from python_sql.database import Database
+from python_sql.tracing import RingBuffer, Tracer, instrumented, totals
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.traces = RingBuffer(3)
+        self.db = Database(tracer=Tracer(self.traces))
+        self.db.execute('CREATE TABLE t(id int primary key, k int)')
+        for i in range(500):
+            self.db.execute('INSERT INTO t VALUES({}, {})'.format(i, i % 10))
+        self.db.execute('CREATE INDEX t_k ON t(k)')
+        self.tree = self.db.tables['t']._pk_index
+
+    def last(self):
+        return list(self.traces)[-1]
+
+    def test_ring_buffer(self):
+        self.assertEqual(3, len(self.traces))
+        self.assertEqual('CREATE INDEX t_k ON t(k)', self.last().statement)
+        self.assertEqual(500, self.db.tracer.counters['rows_scanned'])
+
+    def test_full_scan(self):
+        rows = self.db.execute('SELECT t.id FROM t')
+        self.assertEqual(500, len(rows))
+        trace = self.last()
+        self.assertEqual(500, trace.counters['rows_scanned'])
+        self.assertEqual(1, trace.counters['index_probes'])
+        leaves = 0
+        cursor = self.tree.cursor()
+        cursor.seek_first()
+        leaf = cursor.leaf
+        while leaf is not None:
+            leaves += 1
+            leaf = leaf.next_sibling
+        self.assertEqual(self.tree.height - 1 + leaves,
+                         trace.counters['node_visits'])
+        for phase in ('parse', 'plan', 'execute'):
+            self.assertGreater(trace.phases[phase], 0)
+
+    def test_lookup(self):
+        self.db.execute('SELECT t.id FROM t WHERE t.id = 7')
+        trace = self.last()
+        self.assertEqual(1, trace.counters['rows_scanned'])
+        self.assertEqual(self.tree.height, trace.counters['node_visits'])
+
+    def test_index_range(self):
+        rows = self.db.execute('SELECT t.id FROM t WHERE t.k = 3')
+        self.assertEqual(50, len(rows))
+        self.assertEqual(50, self.last().counters['rows_scanned'])
+
+    def test_stream(self):
+        rows = self.db.stream('SELECT t.id FROM t')
+        self.assertEqual((0,), next(rows).data)
+        self.assertEqual('CREATE INDEX t_k ON t(k)', self.last().statement)
+        rows.close()
+        self.assertEqual('SELECT t.id FROM t', self.last().statement)
+        self.assertEqual(1, self.last().counters['rows_scanned'])
+
+    def test_callback(self):
+        statements = []
+        self.db.tracer = Tracer(lambda trace: statements.append(
+            trace.statement))
+        self.db.execute('DELETE FROM t WHERE t.id = 1')
+        self.db.execute('UPDATE t SET t.k = 1 WHERE t.id = 2')
+        self.assertEqual(['DELETE FROM t WHERE t.id = 1',
+                          'UPDATE t SET t.k = 1 WHERE t.id = 2'], statements)
+
+    def test_totals(self):
+        tracer = Tracer()
+        self.db.tracer = tracer
+        self.db.execute('SELECT t.id FROM t WHERE t.id < 10')
+        self.db.execute('SELECT t.id FROM t WHERE t.id < 20')
+        self.assertEqual(30, tracer.counters['rows_scanned'])
+        self.assertEqual(2, tracer.counters['index_probes'])
+
+    def test_error(self):
+        with self.assertRaises(Exception):
+            self.db.execute('SELECT t.id FROM nope')
+        self.assertEqual('SELECT t.id FROM nope', self.last().statement)
+        self.assertFalse({'search', 'search_many', 'range'} &
+                         set(vars(self.tree)))
+
+    def test_disabled(self):
+        self.db.tracer = None
+        before = totals.snapshot()
+        self.db.execute('SELECT t.id FROM t')
+        self.assertEqual(before, totals.snapshot())
+        # Nothing left shadowing the methods of the tree or storage
+        self.assertFalse({'search', 'search_many', 'range'} &
+                         set(vars(self.tree)))
+        self.assertNotIn('read_row', vars(self.db.storage))
+
+
+class TestInstrumented(unittest.TestCase):
+    def test_search_many(self):
+        tree = BTree.from_sorted(((i, i) for i in range(0, 2000, 2)), 8)
+        height = tree.height
+
+        class Table:
+            _pk_index = tree
+            _indexes = {}
+
+        class Storage:
+            def read_row(self):
+                pass
+
+            def read_columns(self):
+                pass
+
+        with instrumented([Table], Storage()):
+            before = totals.snapshot()
+            # Neighbouring keys share leaves, the last one is far away
+            found = list(tree.search_many([2, 4, 6, 8, 1998]))
+            counts = totals.since(before)
+            with instrumented([Table], Storage()):
+                tree.search(4)
+            tree.search(4)
+            counts_nested = totals.since(before)
+        tree.search(4)
+        self.assertEqual([2, 4, 6, 8, 1998], [key for key, _ in found])
+        self.assertEqual(1, counts['index_probes'])
+        self.assertEqual(2 * height, counts['node_visits'])
+        # Not counted twice when nested, and no longer once finished
+        self.assertEqual(3, counts_nested['index_probes'])
+        self.assertFalse({'search', 'search_many', 'range'} &
+                         set(vars(tree)))
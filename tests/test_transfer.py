@@ -0,0 +1,165 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from python_sql.database import Database, MemoryStorageDriver
+
+
+class TestCopyFrom(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db = Database(MemoryStorageDriver())
+        self.db.execute('CREATE TABLE main(id int primary key, x double, '
+                        'name varchar(8))')
+        self.db.execute('CREATE INDEX main_name ON main(name)')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', newline='') as file:
+            file.write(text)
+        return path
+
+    def rows(self):
+        return [row.data for row in self.db.execute(
+            'SELECT main.id, main.x, main.name FROM main')]
+
+    def test_csv(self):
+        path = self.write('main.csv', '2,0.5,b\n1,,"a, quoted"\n3,1,\n')
+        self.assertEqual(3, self.db.execute("COPY main FROM '{}'".format(
+            path)))
+        self.assertEqual([(1, None, 'a, quoted'), (2, 0.5, 'b'),
+                          (3, 1.0, '')], self.rows())
+        self.assertEqual([(2,)], self.db.execute(
+            "SELECT main.id FROM main WHERE main.name = 'b'"))
+
+    def test_header(self):
+        path = self.write('main.txt', 'name\tid\tx\nb\t2\t0.5\na\t1\t2\n')
+        self.db.execute("COPY main FROM '{}' FORMAT tsv HEADER".format(path))
+        self.assertEqual([(1, 2.0, 'a'), (2, 0.5, 'b')], self.rows())
+
+    def test_jsonl(self):
+        path = self.write('main.jsonl', '\n'.join([
+            json.dumps({'id': 1, 'name': 'a'}),
+            json.dumps([2, 1.5, 'b']),
+            '',
+            json.dumps({'id': 3.0, 'x': 2, 'name': None})]))
+        self.assertEqual(3, self.db.copy_from('main', path))
+        self.assertEqual([(1, None, 'a'), (2, 1.5, 'b'), (3, 2.0, None)],
+                         self.rows())
+
+    def test_batches(self):
+        path = self.write('main.csv', ''.join(
+            '{},{},n{}\n'.format(i, i / 2, i % 10) for i in range(1000)))
+        self.assertEqual(1000, self.db.copy_from('main', path,
+                                                 batch_size=64))
+        self.assertEqual(100, len(self.db.execute(
+            "SELECT main.id FROM main WHERE main.name = 'n3'")))
+
+    def test_auto_primary_key(self):
+        self.db.execute('CREATE TABLE auto(a int, b varchar(4))')
+        path = self.write('auto.csv', '1,x\n2,y\n')
+        self.db.copy_from('auto', path)
+        self.assertEqual([(0, 1, 'x'), (1, 2, 'y')], self.db.execute(
+            'SELECT auto.rowid, auto.a, auto.b FROM auto'))
+
+    def test_errors(self):
+        path = self.write('main.csv', '1,0.5,a\n2,x,b\n')
+        with self.assertRaisesRegex(Exception, 'row 2 of'):
+            self.db.copy_from('main', path)
+        path = self.write('short.csv', '1,0.5\n')
+        with self.assertRaisesRegex(Exception, 'Expected 3 values'):
+            self.db.copy_from('main', path)
+        path = self.write('main.jsonl', '{"id": 1.5}\n')
+        with self.assertRaisesRegex(Exception, 'not an integer'):
+            self.db.copy_from('main', path)
+        with self.assertRaisesRegex(Exception, 'format'):
+            self.db.copy_from('main', self.write('main.dat', ''))
+        with self.assertRaisesRegex(Exception, 'No field for columns x'):
+            self.db.copy_from('main', self.write('h.csv', 'id,name\n'),
+                              header=True)
+        self.assertEqual([], self.rows())
+
+    def test_failed_batch(self):
+        path = self.write('main.csv', '1,0,a\n2,0,b\n3,0,c\n1,0,d\n')
+        with self.assertRaisesRegex(Exception, 'duplicate'):
+            self.db.copy_from('main', path, batch_size=2)
+        # The batches before the one failing stay loaded
+        self.assertEqual([1, 2], [row[0] for row in self.rows()])
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db = Database(MemoryStorageDriver())
+        self.db.execute('CREATE TABLE main(id int primary key, x double, '
+                        'name varchar(12))')
+        self.db.execute('CREATE TABLE other(id int primary key, y int)')
+        self.db.tables['main'].insert_many(
+            [[1, 0.5, 'a, quoted'], [2, None, 'b'], [3, 1.25, "it's"]])
+        self.db.execute('INSERT INTO other VALUES(1, 10), (3, 30)')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def read(self, name):
+        with open(self.path(name), newline='') as file:
+            return file.read()
+
+    def test_csv(self):
+        self.assertEqual(3, self.db.export(
+            'SELECT main.id, main.x, main.name FROM main',
+            self.path('main.csv'), header=True))
+        self.assertEqual('id,x,name\n1,0.5,"a, quoted"\n2,,b\n3,1.25,it\'s\n',
+                         self.read('main.csv'))
+
+    def test_jsonl(self):
+        self.db.export('SELECT main.name AS n, main.x FROM main '
+                       'WHERE main.id > ?', self.path('main.jsonl'),
+                       parameters=(1,))
+        self.assertEqual([{'n': 'b', 'x': None}, {'n': "it's", 'x': 1.25}],
+                         [json.loads(line) for line in
+                          self.read('main.jsonl').splitlines()])
+
+    def test_copy_to(self):
+        path = self.path('joined.out')
+        self.assertEqual(2, self.db.execute(
+            "COPY (SELECT main.id, other.id FROM main JOIN other ON "
+            "main.id = other.id WHERE other.y > ?) TO '{}' FORMAT tsv "
+            "HEADER".format(path), (5,)))
+        self.assertEqual('main.id\tother.id\n1\t1\n3\t3\n', self.read(
+            'joined.out'))
+
+    def test_round_trip(self):
+        self.db.execute('CREATE TABLE copy(id int primary key, x double, '
+                        'name varchar(12))')
+        for format in ('csv', 'tsv', 'jsonl'):
+            path = self.path('main.' + format)
+            self.db.export('SELECT main.id, main.x, main.name FROM main '
+                           'ORDER BY main.id DESC', path, batch_size=2)
+            self.db.execute('DELETE FROM copy')
+            self.assertEqual(3, self.db.copy_from('copy', path))
+            self.assertEqual(self.db.execute(
+                'SELECT main.id, main.x, main.name FROM main'),
+                [row.data for row in self.db.execute(
+                    'SELECT copy.id, copy.x, copy.name FROM copy')])
+
+    def test_empty(self):
+        self.assertEqual(0, self.db.export(
+            'SELECT main.id FROM main WHERE main.id > 5',
+            self.path('none.csv'), header=True))
+        self.assertEqual('id\n', self.read('none.csv'))
+
+    def test_errors(self):
+        with self.assertRaisesRegex(Exception, 'Can only stream SELECT'):
+            self.db.export('DELETE FROM main', self.path('x.csv'))
+        with self.assertRaisesRegex(Exception, 'Cannot tell the format'):
+            self.db.export('SELECT main.id FROM main', self.path('x.out'))
+        self.assertFalse(os.path.exists(self.path('x.out')))